@@ -0,0 +1,116 @@
+"""
+Benchmark of filtered and ordered pages of the coffee list api
+
+Every case requests a page of 50 coffees, which should be an index range scan whatever the amount of rows.
+Uses an in-memory database. Run from the root of the repository, for example:
+    PYTHONPATH=src python benchmarks/api_filters.py --rows 1000000
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import date, timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "beans.settings.develop")
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from beans.apps.base.models import User  # noqa: E402
+from beans.apps.coffee.api.views import CoffeeListView  # noqa: E402
+from beans.apps.coffee.models import Coffee, Processing, Roaster  # noqa: E402
+
+COUNTRIES = ["Brazil", "Colombia", "Ethiopia", "Kenya", "Peru", "Rwanda", "Guatemala", "Honduras"]
+
+CASES = [
+    ("no filter", "/api/user/coffees/?page_size=50"),
+    ("country", "/api/user/coffees/?page_size=50&country=Kenya"),
+    ("roaster", "/api/user/coffees/?page_size=50&roaster=Roaster 7"),
+    ("rating range", "/api/user/coffees/?page_size=50&rating_min=4&rating_max=4"),
+    ("roasting date range", "/api/user/coffees/?page_size=50&roasted_after=2021-06-01&roasted_before=2021-06-30"),
+    ("newest first", "/api/user/coffees/?page_size=50&ordering=-roasting_date"),
+    ("country, newest first, sparse", "/api/user/coffees/?page_size=50&country=Peru&ordering=-roasting_date&fields=name"),
+]
+
+
+def setup_database(rows: int) -> User:
+    settings.DATABASES["default"]["NAME"] = ":memory:"
+    settings.ALLOWED_HOSTS = ["testserver"]
+    connection.close()
+    call_command("migrate", verbosity=0)
+    user = User.objects.create(email="benchmark@example.com")
+    processing = Processing.objects.create(user=user, name="Washed")
+    Roaster.objects.bulk_create([Roaster(user=user, name=f"Roaster {number}") for number in range(100)])
+    roasters = list(Roaster.objects.filter(user=user).order_by("id"))
+    first_day = date(2020, 1, 1)
+
+    for start in range(0, rows, 10_000):
+        Coffee.objects.bulk_create(
+            [
+                Coffee(
+                    user=user,
+                    name=f"Coffee {number}",
+                    country=COUNTRIES[number % len(COUNTRIES)],
+                    processing=processing,
+                    roaster=roasters[number % len(roasters)],
+                    roasting_date=first_day + timedelta(days=number % 1000),
+                    rating=number % 5 + 1,
+                )
+                for number in range(start, min(start + 10_000, rows))
+            ]
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    user = setup_database(args.rows)
+    print(f"created {args.rows:,} coffees in {time.perf_counter() - start:.0f}s")
+    factory = APIRequestFactory()
+    view = CoffeeListView.as_view()
+
+    for name, url in CASES:
+        timings = []
+        query_timings = []
+
+        def time_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            result = execute(sql, params, many, context)
+            query_timings[-1] += time.perf_counter() - start
+            return result
+
+        for _ in range(args.repeat):
+            request = factory.get(url)
+            force_authenticate(request, user=user)
+            query_timings.append(0)
+            start = time.perf_counter()
+
+            with connection.execute_wrapper(time_query):
+                response = view(request)
+
+            timings.append(time.perf_counter() - start)
+
+        assert response.status_code == 200, response.content
+        print(
+            f"{name}: median {statistics.median(timings) * 1000:.1f}ms, best {min(timings) * 1000:.1f}ms, "
+            f"of which executing queries {statistics.median(query_timings) * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
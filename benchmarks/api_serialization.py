@@ -0,0 +1,120 @@
+"""
+Benchmark of the coffee list api, comparing the full serializer with sparse fieldsets, the orjson encoder and MessagePack
+
+Also compares the encode time and size of the serialized coffees as json and as MessagePack (pip install beans[msgpack]).
+
+Uses an in-memory database. Run from the root of the repository, for example:
+    PYTHONPATH=src python benchmarks/api_serialization.py --rows 10000
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "beans.settings.develop")
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.core.serializers.json import DjangoJSONEncoder  # noqa: E402
+from django.db import connection  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from beans.apps.base.models import User  # noqa: E402
+from beans.apps.coffee.api.renderers import msgpack, packb  # noqa: E402
+from beans.apps.coffee.api.responses import orjson  # noqa: E402
+from beans.apps.coffee.api.serializers import CoffeeSerializer  # noqa: E402
+from beans.apps.coffee.api.views import CoffeeListView  # noqa: E402
+from beans.apps.impex.bulk import bulk_create_coffees  # noqa: E402
+
+CASES = [
+    ("full serializer", "/api/user/coffees/", False, "application/json"),
+    ("full serializer, orjson", "/api/user/coffees/", True, "application/json"),
+    ("full serializer, msgpack", "/api/user/coffees/", False, "application/msgpack"),
+    ("fields=name,roasting_date", "/api/user/coffees/?fields=name,roasting_date", False, "application/json"),
+    ("fields=name,roasting_date, orjson", "/api/user/coffees/?fields=name,roasting_date", True, "application/json"),
+    ("fields=name,roasting_date, msgpack", "/api/user/coffees/?fields=name,roasting_date", False, "application/msgpack"),
+]
+
+
+def setup_database(rows: int) -> User:
+    settings.DATABASES["default"]["NAME"] = ":memory:"
+    connection.close()
+    call_command("migrate", verbosity=0)
+    user = User.objects.create(email="benchmark@example.com")
+
+    for start in range(0, rows, 1000):
+        bulk_create_coffees(
+            user,
+            [
+                {
+                    "name": f"Coffee {number}",
+                    "country": "Kenya",
+                    "processing": "Washed",
+                    "roaster": f"Roaster {number % 100}",
+                    "roasting_date": date(2022, number % 12 + 1, number % 28 + 1),
+                    "rating": number % 5 + 1,
+                    "variety": "SL28",
+                    "tasting_notes": ["Blackcurrant", "Tomato"],
+                }
+                for number in range(start, min(start + 1000, rows))
+            ],
+        )
+
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    user = setup_database(args.rows)
+    factory = APIRequestFactory()
+    view = CoffeeListView.as_view()
+
+    for name, url, fast_json, accept in CASES:
+        if accept == "application/msgpack" and msgpack is None:
+            print(f"{name}: skipped, msgpack isn't installed")
+            continue
+
+        settings.API_FAST_JSON = fast_json
+        timings = []
+
+        for _ in range(args.repeat):
+            request = factory.get(url, HTTP_ACCEPT=accept)
+            force_authenticate(request, user=user)
+            start = time.process_time()
+            response = view(request)
+            timings.append(time.process_time() - start)
+
+        best = min(timings)
+        print(f"{name}: {best * 1000:.0f}ms cpu, {args.rows / best:,.0f} rows/s, {len(response.content):,} bytes")
+
+    data = CoffeeSerializer(CoffeeSerializer.setup_eager_loading(user.coffee_set.all()), many=True).data
+    encoders = [("encode json", lambda: json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":")).encode())]
+
+    if orjson is not None:
+        encoders.append(("encode orjson", lambda: orjson.dumps(data)))
+
+    if msgpack is not None:
+        encoders.append(("encode msgpack", lambda: packb(data)))
+
+    for name, encode in encoders:
+        timings = []
+
+        for _ in range(args.repeat):
+            start = time.process_time()
+            content = encode()
+            timings.append(time.process_time() - start)
+
+        print(f"{name}: {min(timings) * 1000:.1f}ms cpu, {len(content):,} bytes")
+
+
+if __name__ == "__main__":
+    main()
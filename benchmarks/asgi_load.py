@@ -0,0 +1,153 @@
+"""
+Load test of the api on the asgi application, comparing the sync views with the async views (ASYNC_VIEWS=1)
+
+Every mode runs in its own process, which sends the requests straight to the asgi application
+with the given amount of concurrent clients, so no server or network is involved.
+Uses a temporary sqlite database. Run from the root of the repository, for example:
+    PYTHONPATH=src python benchmarks/asgi_load.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+PATHS = ["/api/user/stats/", "/api/stats/", "/api/user/coffees/?page_size=50"]
+
+
+def setup_django(database: str, async_views: bool) -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "beans.settings.develop")
+    os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+    os.environ["ASYNC_VIEWS"] = "1" if async_views else "0"
+    # the load test would be throttled otherwise
+    os.environ["THROTTLE_STATS_IP"] = ""
+
+    import django
+    from django.conf import settings
+
+    django.setup()
+    settings.DATABASES["default"]["NAME"] = database
+    settings.ALLOWED_HOSTS = ["testserver"]
+
+
+def create_database(database: str, rows: int) -> None:
+    setup_django(database, False)
+
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from beans.apps.base.models import User
+    from beans.apps.coffee.api.conditional import get_deletion_counters
+    from beans.apps.coffee.stats import rebuild_user_stats, refresh_site_stats
+    from beans.apps.impex.bulk import bulk_create_coffees
+
+    call_command("migrate", verbosity=0)
+    user = User.objects.create(email="benchmark@example.com")
+    Token.objects.create(user=user)
+    rows = [
+        {
+            "name": f"Coffee {number}",
+            "country": ["Kenya", "Peru", "Brazil"][number % 3],
+            "processing": "Washed",
+            "roaster": f"Roaster {number % 20}",
+            "roasting_date": date(2022, number % 12 + 1, number % 28 + 1),
+            "rating": number % 5 + 1,
+            "variety": None,
+            "tasting_notes": ["Cherry"],
+        }
+        for number in range(rows)
+    ]
+    bulk_create_coffees(user, rows)
+    # rows that are created on the first read, sqlite can't create them for many clients at once
+    refresh_site_stats(full=True)
+    rebuild_user_stats(user)
+    get_deletion_counters(user, ["coffee", "processing", "roaster", "tastingnote"])
+
+
+async def send_request(application, path: str, token: str) -> int:
+    url_path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": url_path,
+        "raw_path": url_path.encode(),
+        "query_string": query.encode(),
+        "headers": [(b"host", b"testserver"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]["status"]
+
+
+async def run_clients(application, path: str, token: str, requests: int, concurrency: int) -> list[int]:
+    remaining = iter(range(requests))
+    statuses = []
+
+    async def client():
+        for _ in remaining:
+            statuses.append(await send_request(application, path, token))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return statuses
+
+
+def run_load(database: str, async_views: bool, requests: int, concurrency: int) -> None:
+    setup_django(database, async_views)
+
+    from django.core.asgi import get_asgi_application
+    from rest_framework.authtoken.models import Token
+
+    application = get_asgi_application()
+    token = Token.objects.get().key
+    mode = "async" if async_views else "sync"
+
+    for path in PATHS:
+        asyncio.run(run_clients(application, path, token, concurrency, concurrency))
+        start = time.perf_counter()
+        statuses = asyncio.run(run_clients(application, path, token, requests, concurrency))
+        duration = time.perf_counter() - start
+
+        assert set(statuses) == {200}, set(statuses)
+        print(f"{mode} {path}: {requests / duration:,.0f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--run", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_load(args.database, args.run == "async", args.requests, args.concurrency)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "load.sqlite3")
+        create_database(database, args.rows)
+
+        for mode in ("sync", "async"):
+            command = [sys.executable, __file__, "--database", database, "--run", mode]
+            command += ["--requests", str(args.requests), "--concurrency", str(args.concurrency)]
+            subprocess.run(command, check=True)
+
+
+if __name__ == "__main__":
+    main()
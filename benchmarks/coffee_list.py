@@ -0,0 +1,100 @@
+"""
+Benchmark of the coffee list page, comparing the first page with a page deep into the list
+
+Every page renders the same amount of coffees with the same amount of queries, whatever the amount of rows.
+Uses an in-memory database. Run from the root of the repository, for example:
+    PYTHONPATH=src python benchmarks/coffee_list.py --rows 50000
+"""
+import argparse
+import os
+import statistics
+import time
+from datetime import date, timedelta
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "beans.settings.develop")
+os.environ.setdefault("DJANGO_SECRET_KEY", "benchmark")
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from beans.apps.base.models import User  # noqa: E402
+from beans.apps.base.pagination import get_page_cursor  # noqa: E402
+from beans.apps.coffee.models import Coffee, Processing, Roaster  # noqa: E402
+from beans.apps.coffee.views import COFFEE_LIST_ORDERING, coffee_list_view  # noqa: E402
+
+COUNTRIES = ["Brazil", "Colombia", "Ethiopia", "Kenya", "Peru", "Rwanda", "Guatemala", "Honduras"]
+
+
+def setup_database(rows: int) -> User:
+    settings.DATABASES["default"]["NAME"] = ":memory:"
+    settings.ALLOWED_HOSTS = ["testserver"]
+    connection.close()
+    call_command("migrate", verbosity=0)
+    user = User.objects.create(email="benchmark@example.com")
+    processing = Processing.objects.create(user=user, name="Washed")
+    Roaster.objects.bulk_create([Roaster(user=user, name=f"Roaster {number}") for number in range(100)])
+    roasters = list(Roaster.objects.filter(user=user).order_by("id"))
+    first_day = date(2020, 1, 1)
+
+    for start in range(0, rows, 10_000):
+        Coffee.objects.bulk_create(
+            [
+                Coffee(
+                    user=user,
+                    name=f"Coffee {number}",
+                    country=COUNTRIES[number % len(COUNTRIES)],
+                    processing=processing,
+                    roaster=roasters[number % len(roasters)],
+                    roasting_date=first_day + timedelta(days=number % 1000),
+                )
+                for number in range(start, min(start + 10_000, rows))
+            ]
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    user = setup_database(args.rows)
+    factory = RequestFactory()
+    # the position of the coffee in the middle of the list
+    middle = user.coffee_set.order_by(*COFFEE_LIST_ORDERING)[args.rows // 2]
+    cursor = get_page_cursor(COFFEE_LIST_ORDERING, middle)
+
+    for name, url in [("first page", "/coffees/"), ("middle page", f"/coffees/?cursor={cursor}")]:
+        timings = []
+
+        for _ in range(args.repeat):
+            request = factory.get(url)
+            request.user = user
+            start = time.perf_counter()
+
+            with CaptureQueriesContext(connection) as queries:
+                response = coffee_list_view(request)
+
+            timings.append(time.perf_counter() - start)
+
+        assert response.status_code == 200
+        print(f"{name}: median {statistics.median(timings) * 1000:.1f}ms, {len(queries)} queries")
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {queries[-1]['sql']}")
+        print("plan:", "; ".join(row[-1] for row in cursor.fetchall()))
+
+
+if __name__ == "__main__":
+    main()
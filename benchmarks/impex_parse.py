@@ -0,0 +1,64 @@
+"""
+Benchmark of the parse phase of csv imports, comparing the serial parser with the parallel parser
+
+Run from the root of the repository, for example:
+    PYTHONPATH=src python benchmarks/impex_parse.py --rows 1000000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "beans.settings.develop")
+django.setup()
+
+from beans.apps.impex.parallel import parse_file_parallel  # noqa: E402
+from beans.apps.impex.utils import get_csv_headers, get_row_values, iter_lines, read_csv_rows  # noqa: E402
+
+
+def write_file(path: str, rows: int) -> None:
+    with open(path, "w") as csv_file:
+        csv_file.write(";".join(get_csv_headers()) + "\n")
+
+        for number in range(rows):
+            csv_file.write(
+                f"Coffee {number};Kenya;Washed;Roaster {number % 100};2022-{number % 12 + 1:02d}-{number % 28 + 1:02d};"
+                f"{number % 5 + 1};SL28, SL34;Blackcurrant, Tomato, Brown sugar\n"
+            )
+
+
+def parse_serial(path: str) -> int:
+    with open(path, "rb") as csv_file:
+        return sum(1 for number, row in enumerate(read_csv_rows(iter_lines(csv_file))) if get_row_values(row, number))
+
+
+def parse_parallel(path: str, workers: int) -> int:
+    return sum(1 for _ in parse_file_parallel(path, "csv", workers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "coffees.csv")
+        write_file(path, args.rows)
+
+        start = time.perf_counter()
+        parse_serial(path)
+        serial = time.perf_counter() - start
+        print(f"serial: {serial:.2f}s, {args.rows / serial:,.0f} rows/s")
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            parse_parallel(path, workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers} workers: {elapsed:.2f}s, {args.rows / elapsed:,.0f} rows/s, speedup {serial / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
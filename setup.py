@@ -16,7 +16,7 @@ setup(
     long_description=readme_description,
     zip_safe=False,
     install_requires=[],
-    extras_require={},
+    extras_require={"fast-json": ["orjson"], "msgpack": ["msgpack"]},
     setup_requires=["setuptools_scm==3.1.0"],
     package_dir={"": "src"},
     packages=find_packages("src"),
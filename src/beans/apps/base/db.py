@@ -0,0 +1,27 @@
+import asyncio
+from typing import Any, Callable
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _in_own_connection(function: Callable[[], Any]) -> Callable[[], Any]:
+    def run() -> Any:
+        try:
+            return function()
+        finally:
+            # the thread isn't part of a request, so its connection is closed like at the end of one
+            close_old_connections()
+
+    return run
+
+
+async def run_queries_concurrently(*functions: Callable[[], Any]) -> list[Any]:
+    """
+    Runs independent database reads at the same time, each in a thread of its own with its own connection
+
+    The functions are called without arguments and their results are returned in order. They can't
+    see uncommitted changes of the calling thread, so only use this for reads outside of transactions.
+    """
+    reads = [sync_to_async(_in_own_connection(function), thread_sensitive=False)() for function in functions]
+    return list(await asyncio.gather(*reads))
@@ -0,0 +1,160 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Union
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Model, Q, QuerySet
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    Encodes datetimes with microseconds, DjangoJSONEncoder cuts them to milliseconds and a cursor
+    on a timestamp shared by several rows would return them again
+    """
+
+    def default(self, o: Any) -> Any:
+        if isinstance(o, datetime):
+            return o.isoformat()
+
+        return super().default(o)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encodes the ordering values of the last row of a page into an opaque cursor
+    """
+    data = json.dumps(list(values), cls=CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> list[Any]:
+    """
+    Decodes a cursor created by encode_cursor, raises InvalidCursor for cursors that weren't
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("invalid cursor")
+
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor("invalid cursor")
+
+    return values
+
+
+def get_cursor_values(model: type[Model], ordering: Sequence[str], values: Sequence[Any]) -> list[Any]:
+    """
+    Converts the values of a decoded cursor to the python values of the ordering fields
+
+    Cursors come from the client, a value that isn't valid for its field raises InvalidCursor instead of
+    reaching the database. Ordering fields aren't nullable, so null values are invalid as well.
+    """
+    converted = []
+
+    for field, value in zip(ordering, values):
+        # encode_cursor only writes scalars, text fields would otherwise accept the text of a list or object
+        if isinstance(value, (dict, list)):
+            raise InvalidCursor("invalid cursor")
+
+        try:
+            value = model._meta.get_field(field.lstrip("-")).to_python(value)
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidCursor("invalid cursor")
+
+        # integers wider than 64 bits can't be used as query parameters, sqlite raises an OverflowError for them
+        if value is None or isinstance(value, int) and not -(2**63) <= value < 2**63:
+            raise InvalidCursor("invalid cursor")
+
+        converted.append(value)
+
+    return converted
+
+
+def get_page_cursor(ordering: Sequence[str], row: Union[Model, dict[str, Any]]) -> str:
+    """
+    Returns the cursor of the page that starts after the row, it records the ordering it was created for
+    """
+    fields = [field.lstrip("-") for field in ordering]
+    # rows are model instances, or dicts for querysets narrowed with values()
+    values = [row[field] if isinstance(row, dict) else getattr(row, field) for field in fields]
+    return encode_cursor([",".join(ordering), *values])
+
+
+def decode_page_cursor(model: type[Model], ordering: Sequence[str], cursor: str) -> list[Any]:
+    """
+    Returns the ordering values of a cursor created by get_page_cursor, raises InvalidCursor for other cursors
+
+    A cursor of another ordering would compare its values with the wrong fields, so it is invalid as well.
+    """
+    cursor_ordering, *values = decode_cursor(cursor, len(ordering) + 1)
+
+    if cursor_ordering != ",".join(ordering):
+        raise InvalidCursor("invalid cursor")
+
+    return get_cursor_values(model, ordering, values)
+
+
+def get_keyset_filter(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    """
+    Returns a filter for the rows that come after the provided values in the ordering
+
+    For the ordering (a, b) and values (x, y) this is: a >= x AND (a > x OR (a = x AND b > y)),
+    fields with a "-" prefix are descending and use < instead of >. The redundant a >= x lets the
+    database start its index range at the cursor, instead of skipping the rows of all previous pages.
+    """
+    keyset_filter = Q()
+    fields = [field.lstrip("-") for field in ordering]
+
+    for i, field in enumerate(ordering):
+        lookup = f"{fields[i]}__lt" if field.startswith("-") else f"{fields[i]}__gt"
+        keyset_filter |= Q(**dict(zip(fields[:i], values[:i])), **{lookup: values[i]})
+
+    bound = f"{fields[0]}__lte" if ordering[0].startswith("-") else f"{fields[0]}__gte"
+    return Q(**{bound: values[0]}) & keyset_filter
+
+
+def paginate_queryset(
+    queryset: QuerySet, ordering: Sequence[str], cursor: Optional[str], page_size: int
+) -> tuple[list[Union[Model, dict[str, Any]]], Optional[str]]:
+    """
+    Returns a page of the queryset and the cursor of the next page, or None if it is the last page
+
+    The page starts right after the cursor position instead of at an offset, so every page is
+    a single index range scan and rows inserted while paging don't shift later pages.
+    The last field of the ordering has to be unique, e.g. the primary key, and no field may be null.
+    """
+    queryset = queryset.order_by(*ordering)
+
+    if cursor is not None:
+        values = decode_page_cursor(queryset.model, ordering, cursor)
+        queryset = queryset.filter(get_keyset_filter(ordering, values))
+
+    page = list(queryset[: page_size + 1])
+
+    if len(page) <= page_size:
+        return page, None
+
+    page = page[:page_size]
+    return page, get_page_cursor(ordering, page[-1])
+
+
+def replace_query_param(url: str, key: str, value: Optional[str]) -> str:
+    """
+    Returns the url with the query parameter set to the value, or removed when the value is None
+    """
+    scheme, netloc, path, query, fragment = parse.urlsplit(url)
+    query_dict = parse.parse_qs(query, keep_blank_values=True)
+    query_dict.pop(key, None)
+
+    if value is not None:
+        query_dict[key] = [value]
+
+    return parse.urlunsplit((scheme, netloc, path, parse.urlencode(sorted(query_dict.items()), doseq=True), fragment))
@@ -1,7 +1,9 @@
 from django import template
 from django.db.models import QuerySet, Count, F
 
+from beans.apps.base.models import User
 from beans.apps.coffee.models import Coffee
+from beans.apps.coffee.stats import get_user_stats
 
 register = template.Library()
 
@@ -27,3 +29,8 @@ def get_most_common_roasters(queryset: QuerySet[Coffee], limit: int):
         .annotate(name=F("roaster__name"), count=Count("roaster__name"))
         .order_by("-count", "name")[:limit]
     )
+
+
+@register.simple_tag
+def user_stats(user: User, limit: int = 5):
+    return get_user_stats(user, limit)
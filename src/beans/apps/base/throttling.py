@@ -0,0 +1,174 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+LOCAL_MAX_BUCKETS = 10000
+
+# (tokens left, time of the last update)
+BucketState = tuple[float, float]
+
+
+def parse_rate(rate: str) -> tuple[int, float]:
+    """
+    Parses a rate like "10/m" into the capacity of the bucket and the tokens it regains per second
+
+    The capacity is the amount of requests, so a client can burst all of them at once.
+    """
+    amount, period = rate.split("/")
+    capacity = int(amount)
+    return capacity, capacity / PERIODS[period.strip()[0]]
+
+
+def take_token(state: Optional[BucketState], capacity: int, refill_rate: float, now: float) -> tuple[BucketState, float]:
+    """
+    Refills the bucket for the time passed and takes a token from it
+
+    Returns the new state and the seconds to wait until a token is available, 0 when a token was taken.
+    A missing state is a full bucket.
+    """
+    tokens, updated = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+
+    return (tokens, now), (1 - tokens) / refill_rate
+
+
+class LocalMemoryBucketStore:
+    """
+    Keeps the buckets in the memory of the process, every worker process throttles on its own
+    """
+
+    def __init__(self, max_buckets: int = LOCAL_MAX_BUCKETS) -> None:
+        self.max_buckets = max_buckets
+        self._buckets: OrderedDict[str, BucketState] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, refill_rate: float) -> float:
+        with self._lock:
+            state, wait = take_token(self._buckets.get(key), capacity, refill_rate, time.time())
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+
+            # an evicted bucket is full again, so only the least recently used buckets are dropped
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Keeps the buckets in a django cache that is shared by all worker processes
+
+    Buckets are read and written without a lock, so workers handling requests of the same client
+    at the same moment can let a few requests more through than the rate allows.
+    """
+
+    def __init__(self, alias: str) -> None:
+        self.alias = alias
+
+    def take(self, key: str, capacity: int, refill_rate: float) -> float:
+        cache = caches[self.alias]
+        state, wait = take_token(cache.get(key), capacity, refill_rate, time.time())
+        # the bucket is full again once it expires
+        cache.set(key, state, int(capacity / refill_rate) + 1)
+        return wait
+
+    def clear(self) -> None:
+        pass
+
+
+_local_store = LocalMemoryBucketStore()
+
+
+def get_bucket_store() -> Any:
+    """
+    Returns the cache store when THROTTLE_CACHE_ALIAS is set, the local memory store otherwise
+    """
+    alias = getattr(settings, "THROTTLE_CACHE_ALIAS", None)
+    return CacheBucketStore(alias) if alias else _local_store
+
+
+def get_client_ip(request: HttpRequest) -> str:
+    """
+    Returns the ip address of the client, taking NUM_PROXIES of the rest framework settings into account
+
+    With NUM_PROXIES set to 0 this is REMOTE_ADDR, otherwise the address the last trusted proxy added
+    to X-Forwarded-For. Without NUM_PROXIES the rest framework would use the header as the client sent it.
+    """
+    return BaseThrottle().get_ident(request)
+
+
+def get_throttle_wait(request: HttpRequest, scope: str, account: Optional[str] = None) -> float:
+    """
+    Takes a token from the ip bucket of the scope and, when an account is provided, the account bucket
+
+    Returns the seconds the client has to wait, 0 when the request is allowed. The rates are configured
+    in THROTTLE_RATES as "<scope>_ip" and "<scope>_account", scopes without a rate aren't throttled.
+    """
+    rates = getattr(settings, "THROTTLE_RATES", {})
+    store = get_bucket_store()
+    buckets = [(f"{scope}_ip", get_client_ip(request))]
+
+    if account:
+        # the account is hashed, so submitted emails don't end up in cache keys
+        buckets.append((f"{scope}_account", hashlib.sha256(account.lower().encode()).hexdigest()))
+
+    for name, ident in buckets:
+        if not (rate := rates.get(name)):
+            continue
+
+        capacity, refill_rate = parse_rate(rate)
+
+        if wait := store.take(f"beans:throttle:{name}:{ident}", capacity, refill_rate):
+            return wait
+
+    return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Rest framework throttle that uses the token buckets of its scope
+    """
+
+    scope = ""
+
+    def get_account(self, request) -> Optional[str]:
+        return None
+
+    def allow_request(self, request, view) -> bool:
+        self.wait_seconds = get_throttle_wait(request, self.scope, self.get_account(request))
+        return not self.wait_seconds
+
+    def wait(self) -> Optional[float]:
+        return self.wait_seconds
+
+
+class AuthTokenThrottle(TokenBucketThrottle):
+    """
+    Throttles token requests by ip and by the email they are for, before the password is checked
+    """
+
+    scope = "auth"
+
+    def get_account(self, request) -> Optional[str]:
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        return email if isinstance(email, str) else None
+
+
+class PublicStatsThrottle(TokenBucketThrottle):
+    scope = "stats"
@@ -1,9 +1,10 @@
+from django.conf import settings
 from django.urls import path
 
-from beans.apps.base.views import home_view, login_view, logout_view, register_view
+from beans.apps.base.views import async_home_view, home_view, login_view, logout_view, register_view
 
 urlpatterns = [
-    path("", home_view, name="home"),
+    path("", async_home_view if settings.ASYNC_VIEWS else home_view, name="home"),
     path("login/", login_view, name="login"),
     path("logout/", logout_view, name="logout"),
     path("register/", register_view, name="register"),
@@ -1,12 +1,15 @@
 from beans.apps.base.models import User
+from beans.apps.coffee.stats import get_user_stats
 
 
 def get_aggregated_results(user: User) -> dict[str, int]:
     if user is None or not isinstance(user, User):
         raise ValueError("user must be an instance of User")
 
+    stats = get_user_stats(user, 0)
+
     return {
-        "coffee": user.coffee_set.count(),
-        "origins": user.coffee_set.values("country").distinct().count(),
-        "roasters": user.roaster_set.count(),
+        "coffee": stats["total_coffees"],
+        "origins": stats["total_origins"],
+        "roasters": stats["total_roasters"],
     }
@@ -1,3 +1,6 @@
+import math
+
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
@@ -5,6 +8,8 @@ from django.http import HttpResponse, HttpRequest
 from django.shortcuts import render, redirect
 
 from beans.apps.base.forms import RegistrationForm
+from beans.apps.base.throttling import get_throttle_wait
+from beans.apps.coffee.stats import aget_user_stats
 
 
 def home_view(request: HttpRequest) -> HttpResponse:
@@ -15,6 +20,20 @@ def home_view(request: HttpRequest) -> HttpResponse:
     return render(request, "home.html", context=context)
 
 
+async def async_home_view(request: HttpRequest) -> HttpResponse:
+    """
+    Async version of home_view, the stats of the user are read concurrently before rendering
+    """
+    context = {
+        "page": "home",
+    }
+
+    if await sync_to_async(lambda: request.user.is_authenticated)():
+        context["stats"] = await aget_user_stats(request.user, 5)
+
+    return await sync_to_async(render)(request, "home.html", context=context)
+
+
 def login_view(request: HttpRequest) -> HttpResponse:
     context = {"page": "login"}
 
@@ -22,10 +41,16 @@ def login_view(request: HttpRequest) -> HttpResponse:
         return redirect("home")
 
     if request.method == "POST":
-        # TODO: add rate limiting
         email = request.POST.get("email").lower()
         password = request.POST.get("password")
 
+        # throttled before authenticating, checking the password is the expensive part
+        if wait := get_throttle_wait(request, "login", email):
+            messages.error(request, "Too many login attempts, try again later")
+            response = render(request, "login_register.html", context=context, status=429)
+            response["Retry-After"] = str(math.ceil(wait))
+            return response
+
         if (user := authenticate(request, email=email, password=password)) is not None:
             login(request, user)
             return redirect("home")
@@ -0,0 +1,186 @@
+import asyncio
+import functools
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import APIException, NotAuthenticated
+
+from beans.apps.base.models import User
+from beans.apps.base.throttling import get_throttle_wait
+from beans.apps.coffee.api.authentication import BearerTokenAuthentication
+from beans.apps.coffee.api.conditional import aconditional_get
+from beans.apps.coffee.api.responses import api_response
+from beans.apps.coffee.api.serializers import AuthTokenSerializer
+from beans.apps.coffee.api.views import CoffeeListView, UserStatsView, get_stats_limit
+from beans.apps.coffee.stats import aget_site_stats, aget_user_stats
+
+AsyncView = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+_password_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool that checks passwords, so hashing doesn't block the event loop
+
+    PBKDF2 releases the GIL, so up to ASYNC_PASSWORD_THREADS passwords are hashed in parallel.
+    """
+    global _password_executor
+
+    if _password_executor is None:
+        threads = getattr(settings, "ASYNC_PASSWORD_THREADS", 4)
+        _password_executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="password")
+
+    return _password_executor
+
+
+def _error_response(exc: APIException) -> JsonResponse:
+    detail = exc.detail if isinstance(exc.detail, (dict, list)) else {"detail": exc.detail}
+    response = JsonResponse(detail, status=exc.status_code, safe=False)
+
+    if exc.status_code == 401:
+        response["WWW-Authenticate"] = BearerTokenAuthentication.keyword
+
+    return response
+
+
+def _throttled_response(wait: float) -> JsonResponse:
+    response = JsonResponse({"detail": "Request was throttled."}, status=429)
+    response["Retry-After"] = str(math.ceil(wait))
+    return response
+
+
+def async_api_view(authenticated: bool = True, throttle_scope: Optional[str] = None) -> Callable[[AsyncView], AsyncView]:
+    """
+    Turns a coroutine function into an async api view with bearer token authentication and ip throttling
+
+    Exceptions of the rest framework are turned into the same json responses as the rest framework returns.
+    """
+
+    def decorator(view: AsyncView) -> AsyncView:
+        @functools.wraps(view)
+        async def wrapper(request: HttpRequest) -> HttpResponse:
+            try:
+                if throttle_scope and (wait := await sync_to_async(get_throttle_wait)(request, throttle_scope)):
+                    return _throttled_response(wait)
+
+                if authenticated:
+                    if (result := await sync_to_async(BearerTokenAuthentication().authenticate)(request)) is None:
+                        raise NotAuthenticated()
+
+                    request.user, request.auth = result
+
+                return await view(request)
+            except APIException as exc:
+                return _error_response(exc)
+
+        # the csrf_exempt decorator of django 4.0 hides that the view is a coroutine function
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+_coffee_list_view = CoffeeListView.as_view()
+
+
+async def coffee_list_view(request: HttpRequest) -> HttpResponse:
+    """
+    Async version of CoffeeListView, creating and updating coffees is handed to CoffeeListView
+    """
+    if request.method != "GET":
+        return await sync_to_async(_coffee_list_view)(request)
+
+    return await _get_coffee_list(request)
+
+
+coffee_list_view.csrf_exempt = True
+coffee_list_view.view_class = CoffeeListView
+
+
+@async_api_view()
+async def _get_coffee_list(request: HttpRequest) -> HttpResponse:
+    view = CoffeeListView()
+    return await aconditional_get(request, view.conditional_models, sync_to_async(lambda: view.get_list(request)))
+
+
+@async_api_view()
+async def user_stats_view(request: HttpRequest) -> HttpResponse:
+    """
+    Async version of UserStatsView, the counters are read concurrently
+    """
+    if request.method != "GET":
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+
+    limit = get_stats_limit(request)
+
+    async def get_response() -> HttpResponse:
+        return api_response(request, await aget_user_stats(request.user, limit))
+
+    return await aconditional_get(request, UserStatsView.conditional_models, get_response)
+
+
+user_stats_view.view_class = UserStatsView
+
+
+@async_api_view(authenticated=False, throttle_scope="stats")
+async def public_stats_view(request: HttpRequest) -> HttpResponse:
+    """
+    Async version of PublicStatsView, the rollup tables are read concurrently
+    """
+    if request.method != "GET":
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+
+    return api_response(request, await aget_site_stats(get_stats_limit(request)))
+
+
+@async_api_view(authenticated=False)
+async def obtain_auth_token_view(request: HttpRequest) -> HttpResponse:
+    """
+    Async version of EmailFieldObtainAuth, the password is checked on the password thread pool
+
+    The password is checked against the hash directly, like the ModelBackend does. Unknown emails hash
+    the password as well, so the response time doesn't tell whether an account exists.
+    """
+    if request.method != "POST":
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"detail": "JSON parse error"}, status=400)
+    else:
+        data = request.POST
+
+    serializer = AuthTokenSerializer(data=data)
+
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+
+    email, password = serializer.validated_data["email"], serializer.validated_data["password"]
+
+    if wait := await sync_to_async(get_throttle_wait)(request, "auth", email):
+        return _throttled_response(wait)
+
+    user = await sync_to_async(User.objects.filter(email=email).first)()
+    loop = asyncio.get_running_loop()
+
+    if user is None:
+        await loop.run_in_executor(_get_password_executor(), make_password, password)
+        valid = False
+    else:
+        valid = await loop.run_in_executor(_get_password_executor(), check_password, password, user.password)
+
+    if not valid or not user.is_active:
+        return JsonResponse({"non_field_errors": ["Unable to log in with provided credentials."]}, status=400)
+
+    token, _ = await sync_to_async(Token.objects.get_or_create)(user=user)
+    return JsonResponse({"token": token.key})
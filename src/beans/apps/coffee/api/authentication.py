@@ -1,9 +1,153 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+DEFAULT_TOKEN_CACHE_SIZE = 4096
+DEFAULT_TOKEN_CACHE_TTL = 60
+
+
+class TokenCache:
+    """
+    LRU cache of tokens and their users with a time to live, optionally backed by a django cache
+
+    The in-process LRU is checked first, then the django cache configured with API_TOKEN_CACHE_ALIAS if any.
+    Entries are invalidated by signals when tokens are deleted or users are changed, other processes
+    only drop their in-process entry when its API_TOKEN_CACHE_TTL expires.
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, tuple[float, Token]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self) -> int:
+        return getattr(settings, "API_TOKEN_CACHE_SIZE", DEFAULT_TOKEN_CACHE_SIZE)
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, "API_TOKEN_CACHE_TTL", DEFAULT_TOKEN_CACHE_TTL)
+
+    @property
+    def shared_cache(self) -> Optional[Any]:
+        alias = getattr(settings, "API_TOKEN_CACHE_ALIAS", None)
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def copy_token(token: Token) -> Token:
+        """
+        Returns a copy of the token and its user, so attributes set on request.user don't leak into other requests
+        """
+        user = copy.copy(token.user)
+        token = copy.copy(token)
+        token.user = user
+        return token
+
+    @staticmethod
+    def get_shared_key(key: str) -> str:
+        # tokens are credentials, so they are hashed before they are used as key in a shared cache
+        return f"beans:token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+    def get(self, key: str) -> Optional[Token]:
+        """
+        Returns a copy of the cached token with its user, or None if it isn't cached or expired
+        """
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self.copy_token(entry[1])
+
+            self._entries.pop(key, None)
+
+        if (shared_cache := self.shared_cache) is not None and (token := shared_cache.get(self.get_shared_key(key))):
+            self._set_local(key, token)
+
+            with self._lock:
+                self.hits += 1
+
+            return self.copy_token(token)
+
+        with self._lock:
+            self.misses += 1
+
+        return None
+
+    def set(self, key: str, token: Token) -> None:
+        """
+        Caches a copy of the token, which should have its user loaded
+        """
+        token = self.copy_token(token)
+        self._set_local(key, token)
+
+        if (shared_cache := self.shared_cache) is not None:
+            shared_cache.set(self.get_shared_key(key), token, self.ttl)
+
+    def _set_local(self, key: str, token: Token) -> None:
+        if self.ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, token)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """
+        Removes the tokens from the in-process and the shared cache
+        """
+        keys = list(keys)
+
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+        if keys and (shared_cache := self.shared_cache) is not None:
+            shared_cache.delete_many([self.get_shared_key(key) for key in keys])
+
+    def clear(self) -> None:
+        """
+        Empties the in-process cache and resets the counters, the shared cache is left alone
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+token_cache = TokenCache()
 
 
 class BearerTokenAuthentication(TokenAuthentication):
     """
     Authentication class that uses Bearer instead of Token as keyword
+
+    Tokens are looked up in the token cache before falling back to the database.
     """
 
     keyword = "Bearer"
+
+    def authenticate_credentials(self, key: str) -> tuple[Any, Token]:
+        if (token := token_cache.get(key)) is None:
+            token = super().authenticate_credentials(key)[1]
+            token_cache.set(key, token)
+        elif not token.user.is_active:
+            raise AuthenticationFailed(_("User inactive or deleted."))
+
+        return token.user, token
@@ -3,6 +3,7 @@ from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.response import Response
 
+from beans.apps.base.throttling import AuthTokenThrottle
 from beans.apps.coffee.api.serializers import AuthTokenSerializer
 
 
@@ -11,7 +12,7 @@ class EmailFieldObtainAuth(ObtainAuthToken):
     ObtainAuth class that uses email field instead of username
     """
 
-    throttle_classes = []
+    throttle_classes = [AuthTokenThrottle]
     permission_classes = []
 
     def post(self, request, *args, **kwargs):
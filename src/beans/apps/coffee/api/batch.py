@@ -0,0 +1,97 @@
+import json
+from typing import Any, Iterable, Optional
+from urllib.parse import urlsplit
+
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.urls import Resolver404, resolve
+
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+
+DEFAULT_MAX_BATCH_REQUESTS = 10
+
+# headers of the batch request that shouldn't apply to its sub-requests, they always respond with json
+EXCLUDED_META = ("CONTENT_LENGTH", "CONTENT_TYPE", "HTTP_ACCEPT", "HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")
+
+
+def get_batch_paths(data: Any, max_requests: int) -> list[str]:
+    """
+    Returns the paths of the sub-requests of a batch request body like {"requests": [{"path": "/api/..."}]}
+    """
+    requests = data.get("requests") if isinstance(data, dict) else None
+
+    if not isinstance(requests, list) or not requests:
+        raise ParseError("expected a list of requests")
+
+    if len(requests) > max_requests:
+        raise ParseError(f"expected at most {max_requests} requests")
+
+    if not all(isinstance(item, dict) and isinstance(item.get("path"), str) for item in requests):
+        raise ParseError("every request needs a path")
+
+    return [item["path"] for item in requests]
+
+
+def build_sub_request(request: Request, path: str) -> HttpRequest:
+    """
+    Builds a GET request for the path that is authenticated as the user of the batch request
+
+    The rest framework skips the authentication classes of the view for requests with a forced user,
+    so the token of the batch request is only checked once.
+    """
+    url = urlsplit(path)
+    sub_request = HttpRequest()
+    sub_request.method = "GET"
+    sub_request.path = sub_request.path_info = url.path
+    sub_request.META = {key: value for key, value in request.META.items() if key not in EXCLUDED_META}
+    sub_request.META["QUERY_STRING"] = url.query
+    sub_request.GET = QueryDict(url.query)
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def run_sub_request(request: Request, path: str, views: Iterable[type]) -> tuple[int, Optional[bytes]]:
+    """
+    Runs a GET request for the path when it resolves to one of the views, returns the status and json content
+    """
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        match = None
+
+    if match is None or (view_class := getattr(match.func, "view_class", None)) not in views:
+        return 404, b'{"detail":"not found"}'
+
+    # the view class is used instead of the resolved view, which can be its async version
+    response: HttpResponse = view_class.as_view()(build_sub_request(request, path), *match.args, **match.kwargs)
+
+    # error responses of the rest framework are rendered lazily
+    if hasattr(response, "render"):
+        response.render()
+
+    is_json = response.get("Content-Type", "").startswith("application/json")
+    return response.status_code, response.content if is_json and response.content else None
+
+
+def combine_responses(paths: list[str], results: list[tuple[int, Optional[bytes]]]) -> bytes:
+    """
+    Combines the sub-responses into {"responses": [{"path": ..., "status": ..., "body": ...}]}
+
+    The bodies are already json, so they are spliced in instead of being decoded and encoded again.
+    """
+    items = [
+        b'{"path":%s,"status":%d,"body":%s}' % (json.dumps(path).encode(), status, body or b"null")
+        for path, (status, body) in zip(paths, results)
+    ]
+    return b'{"responses":[' + b",".join(items) + b"]}"
+
+
+def decode_responses(paths: list[str], results: list[tuple[int, Optional[bytes]]]) -> list[dict[str, Any]]:
+    """
+    Returns the sub-responses as [{"path": ..., "status": ..., "body": ...}] with decoded bodies
+    """
+    return [
+        {"path": path, "status": status, "body": json.loads(body) if body else None}
+        for path, (status, body) in zip(paths, results)
+    ]
@@ -0,0 +1,114 @@
+import hashlib
+from datetime import datetime
+from typing import Awaitable, Callable, Optional, Sequence
+
+from asgiref.sync import sync_to_async
+from django.db.models import Model
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from beans.apps.base.models import User
+from beans.apps.coffee.api.renderers import accepts_msgpack
+from beans.apps.coffee.models import DeletionCounter
+
+
+def get_deletion_counters(user: User, resources: Sequence[str]) -> dict[str, DeletionCounter]:
+    """
+    Retrieves the deletion counters of the user for the provided resources, creating the missing ones
+    """
+    counters = {counter.resource: counter for counter in DeletionCounter.objects.filter(user=user, resource__in=resources)}
+
+    if missing := set(resources) - counters.keys():
+        DeletionCounter.objects.bulk_create(
+            [DeletionCounter(user=user, resource=resource) for resource in missing], ignore_conflicts=True
+        )
+        counters.update(
+            {counter.resource: counter for counter in DeletionCounter.objects.filter(user=user, resource__in=missing)}
+        )
+
+    return counters
+
+
+def get_validators(user: User, models: Sequence[type[Model]], variant: str = "") -> tuple[str, Optional[datetime]]:
+    """
+    Returns the ETag and last modified date of the user's rows of the provided models, the ETag also depends
+    on the variant, e.g. the format of the response
+
+    Both are computed from max(updated_at) and the deletion counter of every model, which takes one
+    query per model and one query for the deletion counters. The maximum is read from the (user, updated_at)
+    index, so the cost doesn't grow with the amount of rows. Creations and changes raise the maximum and
+    deletions the counter; a row committed late by a concurrent transaction with an older updated_at
+    is only noticed once something else changes.
+    """
+    resources = [model._meta.model_name for model in models]
+    counters = get_deletion_counters(user, resources)
+    parts: list[str] = [variant]
+    modified: list[datetime] = []
+
+    for model, resource in zip(models, resources):
+        rows = model.objects.filter(user=user).order_by("-updated_at")
+        last_modified = rows.values_list("updated_at", flat=True).first()
+        counter = counters[resource]
+        parts.append(f"{resource}:{last_modified.isoformat() if last_modified else ''}:{counter.count}")
+
+        if last_modified:
+            modified.append(last_modified)
+
+        if counter.count:
+            modified.append(counter.updated_at)
+
+    etag = hashlib.blake2b(";".join(parts).encode(), digest_size=16).hexdigest()
+    return quote_etag(etag), max(modified, default=None)
+
+
+def get_variant(request: HttpRequest) -> str:
+    """
+    Returns the format of the response, so json and MessagePack responses don't share an ETag
+    """
+    return "msgpack" if accepts_msgpack(request) else ""
+
+
+def conditional_get(
+    request: HttpRequest, models: Sequence[type[Model]], get_response: Callable[[], HttpResponse]
+) -> HttpResponse:
+    """
+    Returns 304 Not Modified when the client's If-None-Match or If-Modified-Since header matches
+    the validators of the provided models, otherwise the response of get_response with validator headers
+
+    get_response is only called when the data changed, so unchanged data isn't loaded nor serialized.
+    """
+    etag, last_modified = get_validators(request.user, models, get_variant(request))
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+
+    if (response := get_conditional_response(request, etag=etag, last_modified=timestamp)) is None:
+        response = get_response()
+
+    return _set_validators(response, etag, timestamp)
+
+
+async def aconditional_get(
+    request: HttpRequest, models: Sequence[type[Model]], get_response: Callable[[], Awaitable[HttpResponse]]
+) -> HttpResponse:
+    """
+    Like conditional_get, for async views whose get_response is a coroutine function
+    """
+    etag, last_modified = await sync_to_async(get_validators)(request.user, models, get_variant(request))
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+
+    if (response := get_conditional_response(request, etag=etag, last_modified=timestamp)) is None:
+        response = await get_response()
+
+    return _set_validators(response, etag, timestamp)
+
+
+def _set_validators(response: HttpResponse, etag: str, timestamp: Optional[int]) -> HttpResponse:
+    response.headers["ETag"] = etag
+
+    if timestamp is not None:
+        response.headers["Last-Modified"] = http_date(timestamp)
+
+    # clients have to revalidate, the data is private to the authenticated user
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Accept"])
+    return response
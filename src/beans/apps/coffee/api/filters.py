@@ -0,0 +1,89 @@
+from datetime import date
+from typing import Any, Callable, Optional
+
+from django.db.models import QuerySet
+from django.http import HttpRequest
+
+from rest_framework.exceptions import ParseError
+
+from beans.apps.coffee.models import Coffee, Roaster
+
+# the fields coffees can be ordered by, all of them are required so keyset pagination never compares nulls
+COFFEE_ORDERINGS = ("roasting_date", "name", "country", "updated_at")
+
+
+def _parse_rating(value: str) -> int:
+    rating = int(value)
+
+    if rating not in Coffee.Rating.values:
+        raise ValueError(value)
+
+    return rating
+
+
+# query parameter: (lookup, parser of the value)
+COFFEE_FILTERS: dict[str, tuple[str, Callable[[str], Any]]] = {
+    "country": ("country", str),
+    "processing": ("processing__name", str),
+    "rating_min": ("rating__gte", _parse_rating),
+    "rating_max": ("rating__lte", _parse_rating),
+    "roasted_after": ("roasting_date__gte", date.fromisoformat),
+    "roasted_before": ("roasting_date__lte", date.fromisoformat),
+}
+
+
+def filter_coffees(request: HttpRequest, queryset: QuerySet[Coffee]) -> QuerySet[Coffee]:
+    """
+    Applies the filters in the query parameters, e.g. ?country=Kenya&rating_min=4&roasted_after=2022-01-01
+
+    Every filter combined with the user is a range scan on one of the (user, ...) indexes of Coffee.
+    The roaster and processing filters match on name, the tasting_note filter matches coffees
+    that have a tasting note with that name.
+    """
+    filters = {}
+
+    for parameter, (lookup, parse) in COFFEE_FILTERS.items():
+        if (value := request.GET.get(parameter)) is None:
+            continue
+
+        try:
+            filters[lookup] = parse(value)
+        except ValueError:
+            raise ParseError(f"invalid value for {parameter}: {value}")
+
+    low, high = filters.pop("rating__gte", None), filters.pop("rating__lte", None)
+
+    if low is not None or high is not None:
+        # there are only five ratings, the range is expanded into the ratings it contains so a single rating
+        # is an equality lookup and its page is read in order from the (user, rating, roasting_date, id) index
+        low, high = low or min(Coffee.Rating.values), high or max(Coffee.Rating.values)
+        filters["rating__in"] = [rating for rating in Coffee.Rating.values if low <= rating <= high]
+
+    if (roaster := request.GET.get("roaster")) is not None:
+        # the ids are looked up first, joining the roasters would sort all coffees of the roaster for every page
+        filters["roaster_id__in"] = list(Roaster.objects.filter(user=request.user, name=roaster).values_list("id", flat=True))
+
+    if filters:
+        queryset = queryset.filter(**filters)
+
+    if (tasting_note := request.GET.get("tasting_note")) is not None:
+        # a subquery instead of a join, so coffees with several matching notes aren't returned twice
+        through = Coffee.tasting_notes.through.objects.filter(tastingnote__name=tasting_note)
+        queryset = queryset.filter(id__in=through.values("coffee_id"))
+
+    return queryset
+
+
+def get_coffee_ordering(request: HttpRequest) -> Optional[tuple[str, str]]:
+    """
+    Returns the ordering requested with ?ordering=name or ?ordering=-roasting_date, with the id as tie breaker
+
+    Returns None when no ordering is requested.
+    """
+    if not (value := request.GET.get("ordering", "").strip()):
+        return None
+
+    if value.removeprefix("-") not in COFFEE_ORDERINGS:
+        raise ParseError(f"invalid ordering: {value}, expected one of {', '.join(COFFEE_ORDERINGS)}")
+
+    return value, "-id" if value.startswith("-") else "id"
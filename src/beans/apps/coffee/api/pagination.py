@@ -0,0 +1,61 @@
+from typing import Any, Optional, Sequence, Union
+
+from django.conf import settings
+from django.db.models import Model, QuerySet
+from django.http import HttpRequest
+
+from rest_framework.exceptions import NotFound
+
+from beans.apps.base import pagination
+from beans.apps.base.pagination import InvalidCursor
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_PAGE_SIZE = 1000
+
+
+def is_paginated(request: HttpRequest) -> bool:
+    """
+    Lists are only paginated when the client asks for it, so existing clients keep receiving the full list
+    """
+    return "cursor" in request.GET or "page_size" in request.GET
+
+
+def get_page_size(request: HttpRequest) -> int:
+    """
+    Returns the page size requested by the client, capped at API_MAX_PAGE_SIZE
+
+    Invalid page sizes fall back to API_PAGE_SIZE, like the page size handling of rest framework.
+    """
+    default = getattr(settings, "API_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, "API_MAX_PAGE_SIZE", DEFAULT_MAX_PAGE_SIZE)
+
+    try:
+        page_size = int(request.GET.get("page_size", default))
+    except ValueError:
+        return default
+
+    return min(page_size, maximum) if page_size > 0 else default
+
+
+def decode_cursor(cursor: str, length: int) -> list[Any]:
+    """
+    Decodes a cursor created by encode_cursor, raises NotFound for cursors that weren't
+    """
+    try:
+        return pagination.decode_cursor(cursor, length)
+    except InvalidCursor as exc:
+        raise NotFound(str(exc))
+
+
+def paginate_queryset(
+    queryset: QuerySet, ordering: Sequence[str], cursor: Optional[str], page_size: int
+) -> tuple[list[Union[Model, dict[str, Any]]], Optional[str]]:
+    """
+    Returns a page of the queryset and the cursor of the next page, see beans.apps.base.pagination.paginate_queryset
+
+    Responds with a 404 to cursors that weren't created by the api.
+    """
+    try:
+        return pagination.paginate_queryset(queryset, ordering, cursor, page_size)
+    except InvalidCursor as exc:
+        raise NotFound(str(exc))
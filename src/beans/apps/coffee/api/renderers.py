@@ -0,0 +1,66 @@
+from typing import Any
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest
+from rest_framework.exceptions import ParseError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# dates, decimals and uuids are encoded as strings, like they are in json
+_json_encoder = DjangoJSONEncoder()
+
+
+def packb(data: Any) -> bytes:
+    """
+    Encodes data as MessagePack, msgpack is an optional dependency (pip install beans[msgpack])
+    """
+    return msgpack.packb(data, default=_json_encoder.default)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MSGPACK_MEDIA_TYPE
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data: Any, accepted_media_type=None, renderer_context=None) -> bytes:
+        return b"" if data is None else packb(data)
+
+
+class MessagePackParser(BaseParser):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None) -> Any:
+        try:
+            return msgpack.unpackb(stream.read())
+        except (ValueError, TypeError) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
+
+
+# MessagePack is only offered when msgpack is installed, other clients get a 406 or 415 when they ask for it
+API_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, *([MessagePackRenderer] if msgpack else [])]
+API_PARSER_CLASSES = [*api_settings.DEFAULT_PARSER_CLASSES, *([MessagePackParser] if msgpack else [])]
+
+
+def accepts_msgpack(request: HttpRequest) -> bool:
+    """
+    Returns whether the response to the request should be MessagePack instead of json
+
+    Views of the rest framework have negotiated the renderer already, other requests are negotiated here
+    with the same precedence, so json is returned unless the client prefers MessagePack.
+    """
+    if (renderer := getattr(request, "accepted_renderer", None)) is None:
+        renderers = [renderer_class() for renderer_class in API_RENDERER_CLASSES]
+        renderer, _ = DefaultContentNegotiation().select_renderer(Request(request), renderers)
+
+    return renderer.media_type == MSGPACK_MEDIA_TYPE
@@ -0,0 +1,34 @@
+from typing import Any
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
+
+from beans.apps.coffee.api.renderers import MSGPACK_MEDIA_TYPE, accepts_msgpack, packb
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def json_response(data: Any, status: int = 200) -> HttpResponse:
+    """
+    Returns data as a json response, encoded by orjson when API_FAST_JSON is enabled and orjson is installed
+
+    orjson is an optional dependency (pip install beans[fast-json]), it encodes large lists several times
+    faster than the json module. Its output has no whitespace between items, the data is the same.
+    """
+    if orjson is not None and getattr(settings, "API_FAST_JSON", False):
+        return HttpResponse(orjson.dumps(data), content_type="application/json", status=status)
+
+    return JsonResponse(data, safe=False, status=status)
+
+
+def api_response(request: HttpRequest, data: Any, status: int = 200) -> HttpResponse:
+    """
+    Returns data as MessagePack when the client asks for it with Accept: application/msgpack, as json otherwise
+    """
+    if accepts_msgpack(request):
+        return HttpResponse(packb(data), content_type=MSGPACK_MEDIA_TYPE, status=status)
+
+    return json_response(data, status)
@@ -1,3 +1,7 @@
+from typing import Union
+
+from django.db.models import Count, Prefetch, QuerySet
+
 from rest_framework import serializers
 
 from beans.apps.base.models import User
@@ -35,18 +39,83 @@ class CoffeeSerializer(serializers.ModelSerializer):
             "tasting_notes",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset: QuerySet[Coffee]) -> QuerySet[Coffee]:
+        """
+        Loads the related names of the coffees up front, so serializing a list of coffees takes two queries
+        """
+        return queryset.select_related("processing", "roaster").prefetch_related(
+            Prefetch("tasting_notes", queryset=TastingNote.objects.order_by("name"))
+        )
+
+
+class CoffeeSyncSerializer(CoffeeSerializer):
+    """
+    The CoffeeSerializer with the id, which the delta sync api needs to match changes and deletions
+    """
+
+    class Meta(CoffeeSerializer.Meta):
+        fields = ["id", *CoffeeSerializer.Meta.fields]
+
+
+class CoffeeUpsertSerializer(serializers.Serializer):
+    """
+    Validates a coffee in the CoffeeSerializer shape without querying the database
+
+    Processing, roaster and tasting notes are plain names, they are resolved in bulk when the coffees are saved.
+    """
+
+    name = serializers.CharField(max_length=200)
+    country = serializers.CharField(max_length=80)
+    processing = serializers.CharField(max_length=200)
+    roaster = serializers.CharField(max_length=200)
+    roasting_date = serializers.DateField()
+    rating = serializers.ChoiceField(choices=Coffee.Rating.choices, allow_null=True, default=None)
+    variety = serializers.CharField(max_length=200, allow_null=True, allow_blank=True, default=None)
+    tasting_notes = serializers.ListField(child=serializers.CharField(max_length=200), default=list)
+
+
+def get_coffee_count(obj: Union[Roaster, Processing]) -> int:
+    """
+    Returns the coffee count annotated by setup_eager_loading, or counts the coffees when it isn't annotated
+    """
+    if (count := getattr(obj, "coffee_count", None)) is not None:
+        return count
+
+    return obj.coffee_set.count()
+
 
 class RoasterSerializer(serializers.ModelSerializer):
-    coffees = serializers.IntegerField(source="coffee_set.count", read_only=True)
+    coffees = serializers.SerializerMethodField()
 
     class Meta:
         model = Roaster
         fields = ["id", "name", "country", "website", "coffees"]
 
+    @staticmethod
+    def setup_eager_loading(queryset: QuerySet[Roaster]) -> QuerySet[Roaster]:
+        """
+        Annotates the amount of coffees, so serializing a list of roasters takes a single query
+        """
+        return queryset.annotate(coffee_count=Count("coffee"))
+
+    def get_coffees(self, obj: Roaster) -> int:
+        return get_coffee_count(obj)
+
 
 class ProcessingSerializer(serializers.ModelSerializer):
-    used = serializers.IntegerField(source="coffee_set.count", read_only=True)
+    used = serializers.SerializerMethodField()
 
     class Meta:
         model = Processing
         fields = ["id", "name", "used"]
+
+    @staticmethod
+    def setup_eager_loading(queryset: QuerySet[Processing]) -> QuerySet[Processing]:
+        """
+        Annotates the amount of coffees, so serializing a list of processing methods takes a single query
+        """
+        return queryset.annotate(coffee_count=Count("coffee"))
+
+    def get_used(self, obj: Processing) -> int:
+        return get_coffee_count(obj)
@@ -0,0 +1,67 @@
+from collections import defaultdict
+from typing import Any, Optional, Sequence
+
+from django.db.models import QuerySet
+from django.http import HttpRequest
+
+from rest_framework.exceptions import ParseError
+
+from beans.apps.coffee.models import Coffee
+
+# the lookup used by .values() for every field of the CoffeeSerializer, except the tasting notes
+COFFEE_FIELD_LOOKUPS = {
+    "name": "name",
+    "country": "country",
+    "processing": "processing__name",
+    "roaster": "roaster__name",
+    "roasting_date": "roasting_date",
+    "rating": "rating",
+    "variety": "variety",
+}
+
+
+def get_requested_fields(request: HttpRequest, allowed: Sequence[str]) -> Optional[list[str]]:
+    """
+    Returns the fields requested with ?fields=a,b in the requested order, or None when all fields are requested
+    """
+    if not (value := request.GET.get("fields", "").strip()):
+        return None
+
+    fields = list(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+
+    if unknown := [field for field in fields if field not in allowed]:
+        raise ParseError(f"unknown fields: {', '.join(unknown)}")
+
+    return fields
+
+
+def get_coffee_values(queryset: QuerySet[Coffee], fields: Sequence[str], ordering: Sequence[str]) -> QuerySet:
+    """
+    Narrows the coffee queryset to the columns of the requested fields, plus the id and the ordering columns
+    """
+    lookups = [COFFEE_FIELD_LOOKUPS[field] for field in fields if field in COFFEE_FIELD_LOOKUPS]
+    return queryset.values(*dict.fromkeys(["id", *(field.lstrip("-") for field in ordering), *lookups]))
+
+
+def serialize_coffee_values(rows: Sequence[dict[str, Any]], fields: Sequence[str]) -> list[dict[str, Any]]:
+    """
+    Returns the requested fields of the rows of get_coffee_values in the CoffeeSerializer shape
+
+    Tasting notes are fetched with one extra query, only when they are requested.
+    """
+    tasting_notes: dict[int, list[str]] = defaultdict(list)
+
+    if "tasting_notes" in fields:
+        notes = (
+            Coffee.tasting_notes.through.objects.filter(coffee_id__in=[row["id"] for row in rows])
+            .order_by("tastingnote__name")
+            .values_list("coffee_id", "tastingnote__name")
+        )
+
+        for coffee_id, name in notes:
+            tasting_notes[coffee_id].append(name)
+
+    return [
+        {field: tasting_notes[row["id"]] if field == "tasting_notes" else row[COFFEE_FIELD_LOOKUPS[field]] for field in fields}
+        for row in rows
+    ]
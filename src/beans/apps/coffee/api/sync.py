@@ -0,0 +1,87 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ParseError
+
+from beans.apps.base.models import User
+from beans.apps.base.pagination import encode_cursor
+from beans.apps.coffee.api.pagination import decode_cursor
+from beans.apps.coffee.api.serializers import CoffeeSyncSerializer
+from beans.apps.coffee.models import Tombstone
+
+# the key of every resource in the response and the model name its tombstones are recorded with
+RESOURCES = {"coffees": "coffee", "roasters": "roaster", "processing": "processing", "tasting_notes": "tastingnote"}
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "the sync token is older than the tombstones are kept, sync without a token"
+    default_code = "sync_token_expired"
+
+
+def encode_sync_token(moment: datetime) -> str:
+    return encode_cursor([moment.isoformat()])
+
+
+def decode_sync_token(token: str) -> datetime:
+    """
+    Returns the moment of a sync token, raises SyncTokenExpired when tombstones of that moment may have been purged
+    """
+    try:
+        moment = datetime.fromisoformat(decode_cursor(token, 1)[0])
+    except (NotFound, TypeError, ValueError):
+        raise ParseError("invalid sync token")
+
+    # tokens are issued with an offset, a token without one can't be compared with aware datetimes
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+
+    if moment < get_tombstone_cutoff():
+        raise SyncTokenExpired()
+
+    return moment
+
+
+def get_tombstone_cutoff() -> datetime:
+    """
+    Returns the moment before which tombstones are purged
+    """
+    return timezone.now() - timedelta(days=getattr(settings, "SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+
+
+def get_changes(user: User, since: Optional[datetime]) -> dict[str, Any]:
+    """
+    Returns the objects of the user created or updated since the moment, the ids of the deleted ones and a new token
+
+    Every resource is a range scan on its (user, updated_at) index and deletions come from the tombstones,
+    so the cost depends on the amount of changes. Without a moment everything is returned.
+    The new token lies SYNC_TOKEN_OVERLAP seconds in the past, so rows of transactions that were still
+    running are returned again by the next sync. Clients should apply changes as upserts.
+    """
+    started = timezone.now()
+    coffees = CoffeeSyncSerializer.setup_eager_loading(user.coffee_set.all())
+    changes = {
+        "coffees": coffees,
+        "roasters": user.roaster_set.values("id", "name", "country", "website"),
+        "processing": user.processing_set.values("id", "name"),
+        "tasting_notes": user.tastingnote_set.values("id", "name"),
+    }
+    deleted: dict[str, list[int]] = defaultdict(list)
+
+    if since is not None:
+        changes = {key: queryset.filter(updated_at__gte=since) for key, queryset in changes.items()}
+        tombstones = Tombstone.objects.filter(user=user, deleted_at__gte=since).order_by("deleted_at", "id")
+
+        for resource, object_id in tombstones.values_list("resource", "object_id"):
+            deleted[resource].append(object_id)
+
+    data: dict[str, Any] = {key: list(queryset) for key, queryset in changes.items()}
+    data["coffees"] = CoffeeSyncSerializer(data["coffees"], many=True).data
+    data["deleted"] = {key: deleted[resource] for key, resource in RESOURCES.items()}
+    data["token"] = encode_sync_token(started - timedelta(seconds=getattr(settings, "SYNC_TOKEN_OVERLAP", 60)))
+    return data
@@ -1,13 +1,41 @@
+from django.conf import settings
 from django.urls import path
 
+from beans.apps.coffee.api import async_views
 from beans.apps.coffee.api.authtoken import EmailFieldObtainAuth
-from beans.apps.coffee.api.views import RoasterListView, ProcessingListView, CoffeeListView, UserStatsView, PublicStatsView
+from beans.apps.coffee.api.views import (
+    RoasterListView,
+    ProcessingListView,
+    CoffeeListView,
+    UserStatsView,
+    UserTimeseriesView,
+    PublicStatsView,
+    ChangesView,
+    TokenCacheStatsView,
+    BatchView,
+)
+
+if settings.ASYNC_VIEWS:
+    # async versions of the busiest views, for running on an asgi server
+    auth_view = async_views.obtain_auth_token_view
+    public_stats_view = async_views.public_stats_view
+    coffee_list_view = async_views.coffee_list_view
+    user_stats_view = async_views.user_stats_view
+else:
+    auth_view = EmailFieldObtainAuth.as_view()
+    public_stats_view = PublicStatsView.as_view()
+    coffee_list_view = CoffeeListView.as_view()
+    user_stats_view = UserStatsView.as_view()
 
 urlpatterns = [
-    path("auth/", EmailFieldObtainAuth.as_view()),
-    path("stats/", PublicStatsView.as_view()),
-    path("user/coffees/", CoffeeListView.as_view()),
+    path("auth/", auth_view),
+    path("auth/cache/", TokenCacheStatsView.as_view()),
+    path("stats/", public_stats_view),
+    path("user/coffees/", coffee_list_view),
     path("user/roasters/", RoasterListView.as_view()),
-    path("user/stats/", UserStatsView.as_view()),
+    path("user/stats/", user_stats_view),
+    path("user/stats/timeseries/", UserTimeseriesView.as_view()),
     path("user/processing/", ProcessingListView.as_view()),
+    path("user/changes/", ChangesView.as_view()),
+    path("batch/", BatchView.as_view()),
 ]
@@ -1,84 +1,269 @@
-from django.db.models import QuerySet
-from django.http import HttpRequest, JsonResponse
+from datetime import date
+from typing import Any, Callable, Iterable, Optional
 
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Model, QuerySet
+from django.http import HttpRequest, HttpResponse
+
+from rest_framework.exceptions import ParseError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.serializers import BaseSerializer
 from rest_framework.views import APIView
 
-from beans.apps.base.templatetags.queryset_tags import get_most_common_roasters, get_most_common_origins
-from beans.apps.coffee.models import Coffee, Roaster
-from beans.apps.coffee.api.authentication import BearerTokenAuthentication
-from beans.apps.coffee.api.serializers import RoasterSerializer, ProcessingSerializer, CoffeeSerializer
+from beans.apps.base.pagination import replace_query_param
+from beans.apps.base.throttling import PublicStatsThrottle
+from beans.apps.coffee.models import Coffee, Processing, Roaster, TastingNote
+from beans.apps.coffee.api.authentication import BearerTokenAuthentication, token_cache
+from beans.apps.coffee.api.batch import (
+    DEFAULT_MAX_BATCH_REQUESTS,
+    combine_responses,
+    decode_responses,
+    get_batch_paths,
+    run_sub_request,
+)
+from beans.apps.coffee.api.conditional import conditional_get
+from beans.apps.coffee.stats import (
+    TIMESERIES_BUCKETS,
+    TIMESERIES_GROUPS,
+    TIMESERIES_METRICS,
+    get_site_stats,
+    get_timeseries,
+    get_user_stats,
+)
+from beans.apps.coffee.api.filters import filter_coffees, get_coffee_ordering
+from beans.apps.coffee.api.pagination import get_page_size, is_paginated, paginate_queryset
+from beans.apps.coffee.api.renderers import API_PARSER_CLASSES, API_RENDERER_CLASSES, accepts_msgpack
+from beans.apps.coffee.api.responses import api_response
+from beans.apps.coffee.api.sync import decode_sync_token, get_changes
+from beans.apps.coffee.api.sparse import get_coffee_values, get_requested_fields, serialize_coffee_values
+from beans.apps.coffee.api.serializers import (
+    RoasterSerializer,
+    ProcessingSerializer,
+    CoffeeSerializer,
+    CoffeeUpsertSerializer,
+)
+from beans.apps.impex.bulk import bulk_upsert_coffees
+
+# the maximum number of coffees accepted by a single upsert request
+MAX_UPSERT_ITEMS = 500
 
 
 class AuthenticatedUserView(APIView):
     """
     Base view which requires authentication
+
+    Responds with MessagePack instead of json when the client sends Accept: application/msgpack,
+    and accepts MessagePack request bodies.
     """
 
     authentication_classes = [BearerTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    renderer_classes = API_RENDERER_CLASSES
+    parser_classes = API_PARSER_CLASSES
 
 
-class CoffeeListView(AuthenticatedUserView):
+class PaginatedListView(AuthenticatedUserView):
     """
-    List all coffees for the authenticated user
+    Base view for lists that are paginated with a cursor when the client passes a cursor or page_size
+
+    A paginated response looks like {"next": <url of the next page or null>, "results": [...]}.
     """
 
-    def get(self, request: HttpRequest) -> JsonResponse:
+    # the last field of the ordering must be unique
+    ordering: tuple[str, ...] = ("id",)
+    # the models whose changes change the response, used for the ETag and Last-Modified headers
+    conditional_models: list[type[Model]] = []
+
+    def list(self, request: HttpRequest, queryset: QuerySet, serializer_class: type[BaseSerializer]) -> HttpResponse:
+        """
+        Returns the serialized queryset, or a page of it when pagination is requested
+
+        Related objects and counts are loaded by the setup_eager_loading of the serializer class,
+        so the amount of queries doesn't depend on the amount of rows.
+        """
+        queryset = serializer_class.setup_eager_loading(queryset)
+        return self.paginate(request, queryset, lambda rows: serializer_class(rows, many=True).data)
+
+    def get_ordering(self, request: HttpRequest) -> tuple[str, ...]:
+        """
+        Returns the ordering of the pages, views can let the client choose it
+        """
+        return self.ordering
+
+    def paginate(self, request: HttpRequest, queryset: QuerySet, serialize: Callable[[Any], list]) -> HttpResponse:
         """
-        Return a list of all coffees
+        Returns the serialized rows of the queryset, or of a page of it when pagination is requested
         """
-        coffees = request.user.coffee_set.all()
-        serializer = CoffeeSerializer(coffees, many=True)
-        return JsonResponse(serializer.data, safe=False)
+        if not is_paginated(request):
+            return api_response(request, serialize(queryset))
 
+        ordering = self.get_ordering(request)
+        page, cursor = paginate_queryset(queryset, ordering, request.GET.get("cursor"), get_page_size(request))
+        next_url = replace_query_param(request.build_absolute_uri(), "cursor", cursor) if cursor else None
+        return api_response(request, {"next": next_url, "results": serialize(page)})
 
-class RoasterListView(AuthenticatedUserView):
+
+class CoffeeListView(PaginatedListView):
+    """
+    List, create and update the coffees of the authenticated user
+    """
+
+    ordering = ("roasting_date", "id")
+    conditional_models = [Coffee, Processing, Roaster, TastingNote]
+
+    def get_ordering(self, request: HttpRequest) -> tuple[str, ...]:
+        return get_coffee_ordering(request) or self.ordering
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        """
+        Return a list of the coffees, or of the fields requested with ?fields=name,roasting_date
+
+        The coffees can be filtered (see filter_coffees) and ordered with ?ordering=-roasting_date.
+        """
+        return conditional_get(request, self.conditional_models, lambda: self.get_list(request))
+
+    def get_list(self, request: HttpRequest) -> HttpResponse:
+        """
+        Returns the filtered and ordered coffees, or the requested fields of them
+        """
+        coffees = filter_coffees(request, request.user.coffee_set.all())
+
+        if ordering := get_coffee_ordering(request):
+            coffees = coffees.order_by(*ordering)
+
+        if (fields := get_requested_fields(request, CoffeeSerializer.Meta.fields)) is None:
+            return self.list(request, coffees, CoffeeSerializer)
+
+        # only the columns of the requested fields are selected and the serializer is skipped
+        coffees = get_coffee_values(coffees, fields, self.get_ordering(request))
+        return self.paginate(request, coffees, lambda rows: serialize_coffee_values(rows, fields))
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        """
+        Creates or updates a list of coffees, returns a result for every item
+        """
+        return self._upsert(request)
+
+    def put(self, request: HttpRequest) -> HttpResponse:
+        """
+        Creates or updates a list of coffees, returns a result for every item
+        """
+        return self._upsert(request)
+
+    def _upsert(self, request: HttpRequest) -> HttpResponse:
+        """
+        Upserts the valid items on the unique_bean_roaster_constraint key using a fixed number of queries
+
+        Invalid items are reported and skipped, they don't prevent the valid items from being saved.
+        """
+        if not isinstance(request.data, list):
+            return api_response(request, {"detail": "expected a list of coffees"}, status=400)
+
+        if len(request.data) > MAX_UPSERT_ITEMS:
+            return api_response(request, {"detail": f"expected at most {MAX_UPSERT_ITEMS} coffees"}, status=400)
+
+        results: list[dict[str, Any]] = []
+        valid: list[tuple[dict[str, Any], dict[str, Any]]] = []
+
+        for index, item in enumerate(request.data):
+            serializer = CoffeeUpsertSerializer(data=item)
+            result = {"index": index}
+
+            if serializer.is_valid():
+                valid.append((result, serializer.validated_data))
+            else:
+                result.update(status="invalid", errors=serializer.errors)
+
+            results.append(result)
+
+        with transaction.atomic():
+            saved = bulk_upsert_coffees(request.user, [data for _, data in valid])
+
+        for (result, _), (coffee, created) in zip(valid, saved):
+            result.update(status="created" if created else "updated", id=coffee.pk)
+
+        return api_response(request, results)
+
+
+class RoasterListView(PaginatedListView):
     """
     List all roasters for the authenticated user
     """
 
-    def get(self, request: HttpRequest) -> JsonResponse:
+    ordering = ("name", "id")
+    conditional_models = [Roaster, Coffee]
+
+    def get(self, request: HttpRequest) -> HttpResponse:
         """
         Return a list of all roasters
         """
-        roasters = request.user.roaster_set.all()
-        serializer = RoasterSerializer(roasters, many=True)
-        return JsonResponse(serializer.data, safe=False)
+        return conditional_get(
+            request,
+            self.conditional_models,
+            lambda: self.list(request, request.user.roaster_set.all(), RoasterSerializer),
+        )
 
 
-class ProcessingListView(AuthenticatedUserView):
+class ProcessingListView(PaginatedListView):
     """
     List all processing methods for the authenticated user
     """
 
-    def get(self, request: HttpRequest) -> JsonResponse:
+    ordering = ("name", "id")
+    conditional_models = [Processing, Coffee]
+
+    def get(self, request: HttpRequest) -> HttpResponse:
         """
         Return a list of all the processing method
         """
-        processing_methods = request.user.processing_set.all()
-        serializer = ProcessingSerializer(processing_methods, many=True)
-        return JsonResponse(serializer.data, safe=False)
+        return conditional_get(
+            request,
+            self.conditional_models,
+            lambda: self.list(request, request.user.processing_set.all(), ProcessingSerializer),
+        )
 
 
-class GenericStatsView(APIView):
-    def _get(self, coffee_set: QuerySet[Coffee], roaster_set: QuerySet[Roaster], limit: int) -> JsonResponse:
+class ChangesView(AuthenticatedUserView):
+    """
+    Delta sync of the coffees, roasters, processing methods and tasting notes of the authenticated user
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponse:
         """
-        Returns a stats dict for the provided QuerySets
+        Returns the changes since the token of the since parameter, or everything without it, and the next token
         """
-        top_roasters = get_most_common_roasters(coffee_set, limit).values("count", "name")
-        top_origins = get_most_common_origins(coffee_set, limit).values("count", "origin")
+        since = decode_sync_token(token) if (token := request.GET.get("since")) else None
+        return api_response(request, get_changes(request.user, since))
+
+
+class TokenCacheStatsView(AuthenticatedUserView):
+    """
+    Show the hit and miss counters of the token cache of the process that handles the request, for staff only
+    """
 
-        data = {
-            "total_coffees": coffee_set.count(),
-            "total_origins": coffee_set.values("country").distinct().count(),
-            "total_roasters": roaster_set.count(),
-            "top_origins": list(top_origins),
-            "top_roasters": list(top_roasters),
-        }
+    permission_classes = [IsAdminUser]
 
-        # note: we can use safe=True because the data is just a dict
-        return JsonResponse(data, safe=True)
+    def get(self, request: HttpRequest) -> HttpResponse:
+        return api_response(request, token_cache.get_stats())
+
+
+def get_stats_limit(request: HttpRequest) -> int:
+    """
+    Returns the amount of top origins and roasters requested with the limit parameter, 5 by default
+    """
+    try:
+        return max(int(request.GET.get("limit", 5)), 0)
+    except ValueError:
+        return 5
+
+
+class GenericStatsView(APIView):
+    renderer_classes = API_RENDERER_CLASSES
+    parser_classes = API_PARSER_CLASSES
+
+    def get_limit(self, request: HttpRequest) -> int:
+        return get_stats_limit(request)
 
 
 class PublicStatsView(GenericStatsView):
@@ -88,15 +273,13 @@ class PublicStatsView(GenericStatsView):
 
     authentication_classes = []
     permission_classes = [AllowAny]
+    throttle_classes = [PublicStatsThrottle]
 
-    def get(self, request: HttpRequest) -> JsonResponse:
+    def get(self, request: HttpRequest) -> HttpResponse:
         """
-        Returns site wide stats
+        Returns site wide stats from the rollup tables, refreshed_at tells how fresh they are
         """
-        limit = request.GET.get("limit", 5)
-        coffee_set = Coffee.objects.all()
-        roaster_set = Roaster.objects.all()
-        return self._get(coffee_set, roaster_set, limit)
+        return api_response(request, get_site_stats(self.get_limit(request)))
 
 
 class UserStatsView(GenericStatsView, AuthenticatedUserView):
@@ -104,11 +287,80 @@ class UserStatsView(GenericStatsView, AuthenticatedUserView):
     Show user stats
     """
 
-    def get(self, request: HttpRequest) -> JsonResponse:
+    conditional_models = [Coffee, Roaster]
+
+    def get(self, request: HttpRequest) -> HttpResponse:
         """
-        Return the user's stats
+        Return the user's stats from the counters that are kept up to date on write
         """
-        limit = request.GET.get("limit", 5)
-        coffee_set = request.user.coffee_set
-        roaster_set = request.user.roaster_set
-        return self._get(coffee_set, roaster_set, limit)
+        limit = self.get_limit(request)
+        return conditional_get(
+            request, self.conditional_models, lambda: api_response(request, get_user_stats(request.user, limit))
+        )
+
+
+class UserTimeseriesView(GenericStatsView, AuthenticatedUserView):
+    """
+    Show the user's coffees per week or month of their roasting date
+    """
+
+    conditional_models = [Coffee, Roaster]
+
+    @staticmethod
+    def get_choice(request: HttpRequest, parameter: str, choices: Iterable[str], default: Optional[str]) -> Optional[str]:
+        if (value := request.GET.get(parameter, default)) is not None and value not in choices:
+            raise ParseError(f"invalid {parameter}: {value}, expected one of {', '.join(choices)}")
+
+        return value
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        """
+        Returns ?metric=count or avg_rating per ?bucket=week or month, optionally per ?group_by=origin or roaster
+
+        The coffees can be filtered like the coffee list, roasted_after and roasted_before also set the range
+        of the series. Every series has a value for every period, see get_timeseries.
+        """
+        bucket = self.get_choice(request, "bucket", TIMESERIES_BUCKETS, "month")
+        metric = self.get_choice(request, "metric", TIMESERIES_METRICS, "count")
+        group_by = self.get_choice(request, "group_by", TIMESERIES_GROUPS, None)
+        coffees = filter_coffees(request, request.user.coffee_set.all())
+        # the dates are valid, filter_coffees parsed them
+        first, last = (
+            date.fromisoformat(value) if (value := request.GET.get(parameter)) else None
+            for parameter in ("roasted_after", "roasted_before")
+        )
+
+        def get_response() -> HttpResponse:
+            try:
+                timeseries = get_timeseries(coffees, bucket, metric, group_by, self.get_limit(request), first, last)
+            except ValueError as exc:
+                raise ParseError(f"{exc}, use a larger bucket or a shorter range")
+
+            return api_response(request, timeseries)
+
+        return conditional_get(request, self.conditional_models, get_response)
+
+
+class BatchView(AuthenticatedUserView):
+    """
+    Runs several GET requests for the user api in one round trip
+    """
+
+    views = (CoffeeListView, RoasterListView, ProcessingListView, UserStatsView, UserTimeseriesView, ChangesView)
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        """
+        Runs the sub-requests of {"requests": [{"path": "/api/user/coffees/"}, ...]} in order
+
+        The token is checked once for the whole batch and the sub-requests share the database connection
+        of the request. Returns {"responses": [{"path": ..., "status": ..., "body": ...}, ...]} in the same order,
+        paths that aren't part of the user api get a 404.
+        """
+        paths = get_batch_paths(request.data, getattr(settings, "API_MAX_BATCH_REQUESTS", DEFAULT_MAX_BATCH_REQUESTS))
+        results = [run_sub_request(request, path, self.views) for path in paths]
+
+        if accepts_msgpack(request):
+            # the sub-responses are json, so their bodies are decoded to be encoded again
+            return api_response(request, {"responses": decode_responses(paths, results)})
+
+        return HttpResponse(combine_responses(paths, results), content_type="application/json")
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoffeeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'beans.apps.coffee'
+
+    def ready(self):
+        from beans.apps.coffee.signals import connect_signals
+
+        connect_signals()
@@ -1,3 +1,4 @@
+import functools
 from typing import Optional
 
 from django.conf import settings
@@ -18,6 +19,8 @@ def get_country(code: str) -> Optional[Country]:
     return Country(code)
 
 
+# looking up a name goes through all countries, lists call this for every row
+@functools.lru_cache(maxsize=1024)
 def get_country_by_name(name: str) -> Optional[Country]:
     if (code := Countries().by_name(name)) == "":
         return None
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from beans.apps.coffee.api.sync import get_tombstone_cutoff
+from beans.apps.coffee.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = "Deletes the tombstones that are older than SYNC_TOMBSTONE_RETENTION_DAYS"
+
+    def handle(self, *args, **options):
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=get_tombstone_cutoff()).delete()
+        self.stdout.write(f"purged {deleted} tombstones")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from beans.apps.base.models import User
+from beans.apps.coffee.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the stats counters of users from their coffees, which repairs drifted counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument("emails", nargs="*", help="Emails of the users to rebuild, all users by default")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("pk")
+
+        if options["emails"]:
+            users = users.filter(email__in=options["emails"])
+
+        for user in users.iterator():
+            stats = rebuild_user_stats(user)
+            self.stdout.write(f"rebuilt stats of {user.email}: {stats.total_coffees} coffees, {stats.total_roasters} roasters")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from beans.apps.coffee.stats import refresh_site_stats
+
+
+class Command(BaseCommand):
+    help = "Refreshes the site wide stats served by /api/stats/ with the rows changed since the last refresh"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Count all rows instead of the changed ones")
+        parser.add_argument("--loop", action="store_true", help="Keep refreshing the stats")
+        parser.add_argument("--interval", type=float, default=60.0, help="Seconds to wait between refreshes")
+
+    def handle(self, *args, **options):
+        while True:
+            stats = refresh_site_stats(full=options["full"])
+            self.stdout.write(f"site stats refreshed: {stats.total_coffees} coffees, {stats.total_roasters} roasters")
+
+            if not options["loop"]:
+                break
+
+            time.sleep(options["interval"])
@@ -0,0 +1,25 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0009_alter_roaster_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coffee',
+            index=models.Index(fields=['user', 'roasting_date', 'id'], name='coffee_user_roasting_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processing',
+            index=models.Index(fields=['user', 'name', 'id'], name='processing_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roaster',
+            index=models.Index(fields=['user', 'name', 'id'], name='roaster_user_name_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('coffee', '0010_coffee_coffee_user_roasting_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resource', models.CharField(max_length=40)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='deletioncounter',
+            constraint=models.UniqueConstraint(fields=('user', 'resource'), name='unique_deletion_counter_constraint'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0011_deletioncounter_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteOriginCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=80, unique=True)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SiteRoasterCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('count', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SiteStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_coffees', models.PositiveBigIntegerField(default=0)),
+                ('total_origins', models.PositiveIntegerField(default=0)),
+                ('total_roasters', models.PositiveBigIntegerField(default=0)),
+                ('watermark', models.DateTimeField(null=True)),
+                ('refreshed_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SiteStatsStaleKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('origin', 'Origin'), ('roaster', 'Roaster'), ('roaster_id', 'Roaster Id')], max_length=20)),
+                ('key', models.CharField(max_length=200)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='siteroastercount',
+            index=models.Index(fields=['-count', 'name'], name='site_roaster_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='siteorigincount',
+            index=models.Index(fields=['-count', 'country'], name='site_origin_count_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0002_alter_user_username'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('coffee', '0012_siteorigincount_siteroastercount_sitestats_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_coffees', models.BigIntegerField(default=0)),
+                ('total_roasters', models.BigIntegerField(default=0)),
+                ('rebuilt_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserRoasterCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.BigIntegerField(default=0)),
+                ('roaster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='coffee.roaster')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserOriginCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=80)),
+                ('count', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userroastercount',
+            index=models.Index(fields=['user', '-count'], name='user_roaster_count_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userroastercount',
+            constraint=models.UniqueConstraint(fields=('user', 'roaster'), name='unique_user_roaster_count_constraint'),
+        ),
+        migrations.AddIndex(
+            model_name='userorigincount',
+            index=models.Index(fields=['user', '-count', 'country'], name='user_origin_count_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userorigincount',
+            constraint=models.UniqueConstraint(fields=('user', 'country'), name='unique_user_origin_count_constraint'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('coffee', '0013_userstats_userroastercount_userorigincount_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=40)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='coffee',
+            index=models.Index(fields=['user', 'updated_at'], name='coffee_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processing',
+            index=models.Index(fields=['user', 'updated_at'], name='processing_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roaster',
+            index=models.Index(fields=['user', 'updated_at'], name='roaster_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tastingnote',
+            index=models.Index(fields=['user', 'updated_at'], name='tastingnote_user_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.0.3 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0014_tombstone_coffee_coffee_user_updated_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coffee',
+            index=models.Index(fields=['user', 'country', 'roasting_date', 'id'], name='coffee_user_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coffee',
+            index=models.Index(fields=['user', 'roaster', 'roasting_date', 'id'], name='coffee_user_roaster_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coffee',
+            index=models.Index(fields=['user', 'rating', 'roasting_date', 'id'], name='coffee_user_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.3 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0015_coffee_coffee_user_country_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coffee',
+            index=models.Index(fields=['user', '-roasting_date', 'name', 'id'], name='coffee_user_list_idx'),
+        ),
+    ]
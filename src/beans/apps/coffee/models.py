@@ -1,8 +1,9 @@
 from django.db import models
+from django.utils import timezone
 
 from beans.apps.base.models import User
 from beans.apps.coffee.countries import get_country_by_name
-from beans.generic_models import TimeStampedModel
+from beans.generic_models import LoadedValuesMixin, TimeStampedModel
 
 
 class Processing(TimeStampedModel):
@@ -15,8 +16,14 @@ class Processing(TimeStampedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "name", "id"], name="processing_user_name_idx"),
+            models.Index(fields=["user", "updated_at"], name="processing_user_updated_idx"),
+        ]
 
-class Roaster(TimeStampedModel):
+
+class Roaster(LoadedValuesMixin, TimeStampedModel):
     constraints = [
         models.UniqueConstraint(
             fields=["user", "name", "country"],
@@ -30,6 +37,10 @@ class Roaster(TimeStampedModel):
 
     class Meta:
         ordering = ("name", )
+        indexes = [
+            models.Index(fields=["user", "name", "id"], name="roaster_user_name_idx"),
+            models.Index(fields=["user", "updated_at"], name="roaster_user_updated_idx"),
+        ]
 
     @property
     def country_flag(self) -> str:
@@ -49,11 +60,14 @@ class TastingNote(TimeStampedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "updated_at"], name="tastingnote_user_updated_idx")]
+
     def __str__(self):
         return self.name
 
 
-class Coffee(TimeStampedModel):
+class Coffee(LoadedValuesMixin, TimeStampedModel):
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -61,6 +75,16 @@ class Coffee(TimeStampedModel):
                 name="unique_bean_roaster_constraint"
             )
         ]
+        indexes = [
+            models.Index(fields=["user", "roasting_date", "id"], name="coffee_user_roasting_date_idx"),
+            # the ordering of the coffee list page
+            models.Index(fields=["user", "-roasting_date", "name", "id"], name="coffee_user_list_idx"),
+            models.Index(fields=["user", "updated_at"], name="coffee_user_updated_idx"),
+            # the filters end with the default ordering, so a filtered page is read from the index in order
+            models.Index(fields=["user", "country", "roasting_date", "id"], name="coffee_user_country_idx"),
+            models.Index(fields=["user", "roaster", "roasting_date", "id"], name="coffee_user_roaster_idx"),
+            models.Index(fields=["user", "rating", "roasting_date", "id"], name="coffee_user_rating_idx"),
+        ]
 
     class Rating(models.IntegerChoices):
         VERY_GOOD = 5
@@ -88,12 +112,134 @@ class Coffee(TimeStampedModel):
 
     @property
     def tasting_notes_list(self) -> list[str]:
-        if not self.tasting_notes.count():
-            return []
+        # note: iterating all() uses the prefetched tasting notes when available
+        return [note.name for note in self.tasting_notes.all()]
+
+
+class DeletionCounter(TimeStampedModel):
+    """
+    Counts the deleted objects of a model per user
+
+    Deletions can't always be derived from the remaining rows, the counter is used
+    to build the ETag and Last-Modified headers of the api.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "resource"], name="unique_deletion_counter_constraint")
+        ]
 
-        tasting_notes = []
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    resource = models.CharField(max_length=40)
+    count = models.PositiveBigIntegerField(default=0)
+
+
+class SiteStats(models.Model):
+    """
+    Site wide totals, refreshed by the refresh_site_stats management command
+
+    There is a single row, the watermark is the moment from which changed rows still have to be processed.
+    """
+
+    total_coffees = models.PositiveBigIntegerField(default=0)
+    total_origins = models.PositiveIntegerField(default=0)
+    total_roasters = models.PositiveBigIntegerField(default=0)
+    watermark = models.DateTimeField(null=True)
+    refreshed_at = models.DateTimeField(null=True)
+
+
+class SiteOriginCount(models.Model):
+    """
+    The amount of coffees of every origin over all users
+    """
+
+    class Meta:
+        indexes = [models.Index(fields=["-count", "country"], name="site_origin_count_idx")]
+
+    country = models.CharField(max_length=80, unique=True)
+    count = models.PositiveBigIntegerField(default=0)
+
+
+class SiteRoasterCount(models.Model):
+    """
+    The amount of coffees of every roaster name over all users
+    """
+
+    class Meta:
+        indexes = [models.Index(fields=["-count", "name"], name="site_roaster_count_idx")]
 
-        for note in self.tasting_notes.all():
-            tasting_notes.append(note.name)
+    name = models.CharField(max_length=200, unique=True)
+    count = models.PositiveBigIntegerField(default=0)
 
-        return tasting_notes
+
+class SiteStatsStaleKey(models.Model):
+    """
+    An origin or roaster whose site wide count has to be recomputed
+
+    Changed rows are found using their updated_at, but deleted rows and the previous
+    values of changed rows can't be, so they are recorded here when it happens.
+    """
+
+    class Kind(models.TextChoices):
+        ORIGIN = "origin"
+        ROASTER = "roaster"
+        ROASTER_ID = "roaster_id"
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    key = models.CharField(max_length=200)
+
+
+class UserStats(models.Model):
+    """
+    The totals of a user, kept up to date when coffees and roasters are written
+
+    The row is built by rebuild_user_stats when the stats are read for the first time, until
+    then writes don't touch the stats of the user.
+    """
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    total_coffees = models.BigIntegerField(default=0)
+    total_roasters = models.BigIntegerField(default=0)
+    rebuilt_at = models.DateTimeField(null=True)
+
+
+class UserOriginCount(models.Model):
+    """
+    The amount of coffees of a user per origin, origins without coffees don't have a row
+    """
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "country"], name="unique_user_origin_count_constraint")]
+        indexes = [models.Index(fields=["user", "-count", "country"], name="user_origin_count_idx")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    country = models.CharField(max_length=80)
+    count = models.BigIntegerField(default=0)
+
+
+class UserRoasterCount(models.Model):
+    """
+    The amount of coffees of a user per roaster, roasters without coffees don't have a row
+    """
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "roaster"], name="unique_user_roaster_count_constraint")]
+        indexes = [models.Index(fields=["user", "-count"], name="user_roaster_count_idx")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    roaster = models.ForeignKey(Roaster, on_delete=models.CASCADE)
+    count = models.BigIntegerField(default=0)
+
+
+class Tombstone(models.Model):
+    """
+    Records the id of a deleted coffee, roaster, processing method or tasting note for the delta sync api
+    """
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "deleted_at"], name="tombstone_user_deleted_idx")]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    resource = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
@@ -0,0 +1,209 @@
+import threading
+from collections import Counter
+
+from django.db.models import F, Model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from beans.apps.base.models import User
+from beans.apps.coffee.api.authentication import token_cache
+from beans.apps.coffee.models import (
+    Coffee,
+    DeletionCounter,
+    Processing,
+    Roaster,
+    SiteStatsStaleKey,
+    TastingNote,
+    Tombstone,
+)
+from beans.apps.coffee.stats import apply_user_stats_delta
+
+TRACKED_MODELS = (Coffee, Processing, Roaster, TastingNote)
+
+# ids of the users that are being deleted by the current thread
+_deleting_users = threading.local()
+
+
+def _get_deleting_users() -> set[int]:
+    if not hasattr(_deleting_users, "ids"):
+        _deleting_users.ids = set()
+
+    return _deleting_users.ids
+
+
+def mark_user_deleting(sender: type[User], instance: User, **kwargs) -> None:
+    _get_deleting_users().add(instance.pk)
+
+
+def unmark_user_deleting(sender: type[User], instance: User, **kwargs) -> None:
+    _get_deleting_users().discard(instance.pk)
+
+
+def invalidate_cached_token(sender: type[Token], instance: Token, **kwargs) -> None:
+    token_cache.invalidate([instance.key])
+
+
+def invalidate_cached_user_tokens(sender: type[User], instance: User, **kwargs) -> None:
+    """
+    Drops the cached tokens of a changed user, so e.g. deactivating a user takes effect right away
+    """
+    token_cache.invalidate(Token.objects.filter(user_id=instance.pk).values_list("key", flat=True))
+
+
+def increment_deletion_counter(sender: type[Model], instance: Model, **kwargs) -> None:
+    """
+    Increments the deletion counter of the user and model of the deleted instance
+
+    Counters are only updated, not created. They are created when validators are computed
+    for the first time, before that no client can hold a validator that has to change.
+    This also prevents creating counters for a user that is being deleted.
+    """
+    DeletionCounter.objects.filter(user_id=instance.user_id, resource=sender._meta.model_name).update(
+        count=F("count") + 1, updated_at=timezone.now()
+    )
+
+
+def create_tombstone(sender: type[Model], instance: Model, **kwargs) -> None:
+    """
+    Records the id of the deleted instance, so the delta sync api can report the deletion
+
+    No tombstones are created for the objects of a user that is being deleted, they would
+    reference the deleted user.
+    """
+    if instance.user_id in _get_deleting_users():
+        return
+
+    Tombstone.objects.create(user_id=instance.user_id, resource=sender._meta.model_name, object_id=instance.pk)
+
+
+def touch_coffee(sender: type[Model], instance: Model, action: str, reverse: bool, pk_set, **kwargs) -> None:
+    """
+    Updates the updated_at of coffees whose tasting notes were added, removed or cleared
+
+    When the tasting notes are changed from the tasting note side, instance is a tasting note and
+    pk_set holds the coffee ids. Cleared tasting notes are handled before clearing, after it the coffees are unknown.
+    """
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        coffees = Coffee.objects.filter(pk=instance.pk)
+    elif reverse and action in ("post_add", "post_remove"):
+        coffees = Coffee.objects.filter(pk__in=pk_set)
+    elif reverse and action == "pre_clear":
+        coffees = Coffee.objects.filter(tasting_notes=instance)
+    else:
+        return
+
+    coffees.update(updated_at=timezone.now())
+
+
+def touch_related_coffees(sender: type[Model], instance: Model, **kwargs) -> None:
+    """
+    Updates the updated_at of the coffees of a processing method, roaster or tasting note that is about to be deleted
+
+    The deletion clears the reference from the coffees without saving them, which the delta sync api wouldn't notice.
+    """
+    if instance.user_id in _get_deleting_users():
+        return
+
+    instance.coffee_set.update(updated_at=timezone.now())
+
+
+def mark_coffee_stats_stale(sender: type[Coffee], instance: Coffee, created: bool = False, **kwargs) -> None:
+    """
+    Records the previous origin and roaster of a changed or deleted coffee for the site stats
+
+    The new values don't have to be recorded, they are found by the updated_at of the coffee.
+    """
+    if created:
+        return
+
+    deleted = kwargs.get("signal") is post_delete
+    country = instance.country if deleted else instance.get_loaded_value("country", instance.country)
+    roaster_id = instance.roaster_id if deleted else instance.get_loaded_value("roaster_id", instance.roaster_id)
+    keys = []
+
+    if deleted or country != instance.country:
+        keys.append(SiteStatsStaleKey(kind=SiteStatsStaleKey.Kind.ORIGIN, key=country))
+
+    if roaster_id is not None and (deleted or roaster_id != instance.roaster_id):
+        keys.append(SiteStatsStaleKey(kind=SiteStatsStaleKey.Kind.ROASTER_ID, key=str(roaster_id)))
+
+    if keys:
+        SiteStatsStaleKey.objects.bulk_create(keys)
+
+
+def mark_roaster_stats_stale(sender: type[Roaster], instance: Roaster, created: bool = False, **kwargs) -> None:
+    """
+    Records the previous name of a renamed or deleted roaster for the site stats
+    """
+    if created:
+        return
+
+    name = instance.name if kwargs.get("signal") is post_delete else instance.get_loaded_value("name", instance.name)
+
+    if kwargs.get("signal") is post_delete or name != instance.name:
+        SiteStatsStaleKey.objects.create(kind=SiteStatsStaleKey.Kind.ROASTER, key=name)
+
+
+def update_user_stats_for_coffee(sender: type[Coffee], instance: Coffee, created: bool = False, **kwargs) -> None:
+    """
+    Applies a created, changed or deleted coffee to the stats of its user
+    """
+    origins: Counter[str] = Counter()
+    roasters: Counter[int] = Counter()
+    coffees = 0
+
+    if kwargs.get("signal") is post_delete:
+        coffees = -1
+        origins[instance.country] -= 1
+        roasters[instance.roaster_id] -= 1
+    elif created:
+        coffees = 1
+        origins[instance.country] += 1
+        roasters[instance.roaster_id] += 1
+    else:
+        origins[instance.get_loaded_value("country", instance.country)] -= 1
+        origins[instance.country] += 1
+        roasters[instance.get_loaded_value("roaster_id", instance.roaster_id)] -= 1
+        roasters[instance.roaster_id] += 1
+
+    roasters.pop(None, None)
+    apply_user_stats_delta(instance.user_id, total_coffees=coffees, origins=origins, roasters=roasters)
+
+
+def update_user_stats_for_roaster(sender: type[Roaster], instance: Roaster, created: bool = False, **kwargs) -> None:
+    """
+    Applies a created or deleted roaster to the stats of its user, the counts of its coffees are removed by cascade
+    """
+    if kwargs.get("signal") is post_delete:
+        apply_user_stats_delta(instance.user_id, total_roasters=-1)
+    elif created:
+        apply_user_stats_delta(instance.user_id, total_roasters=1)
+
+
+def connect_signals() -> None:
+    pre_delete.connect(mark_user_deleting, sender=User, dispatch_uid="mark_user_deleting")
+    post_delete.connect(unmark_user_deleting, sender=User, dispatch_uid="unmark_user_deleting")
+    post_delete.connect(invalidate_cached_token, sender=Token, dispatch_uid="invalidate_cached_token")
+    post_save.connect(invalidate_cached_user_tokens, sender=User, dispatch_uid="invalidate_cached_user_tokens")
+
+    for model in TRACKED_MODELS:
+        dispatch_uid = f"deletion_counter_{model._meta.model_name}"
+        post_delete.connect(increment_deletion_counter, sender=model, dispatch_uid=dispatch_uid)
+        post_delete.connect(create_tombstone, sender=model, dispatch_uid=f"tombstone_{model._meta.model_name}")
+
+    for model in (Processing, Roaster, TastingNote):
+        dispatch_uid = f"touch_coffees_{model._meta.model_name}"
+        pre_delete.connect(touch_related_coffees, sender=model, dispatch_uid=dispatch_uid)
+
+    m2m_changed.connect(touch_coffee, sender=Coffee.tasting_notes.through, dispatch_uid="touch_coffee")
+
+    post_save.connect(mark_coffee_stats_stale, sender=Coffee, dispatch_uid="site_stats_coffee_save")
+    post_delete.connect(mark_coffee_stats_stale, sender=Coffee, dispatch_uid="site_stats_coffee_delete")
+    post_save.connect(mark_roaster_stats_stale, sender=Roaster, dispatch_uid="site_stats_roaster_save")
+    post_delete.connect(mark_roaster_stats_stale, sender=Roaster, dispatch_uid="site_stats_roaster_delete")
+
+    post_save.connect(update_user_stats_for_coffee, sender=Coffee, dispatch_uid="user_stats_coffee_save")
+    post_delete.connect(update_user_stats_for_coffee, sender=Coffee, dispatch_uid="user_stats_coffee_delete")
+    post_save.connect(update_user_stats_for_roaster, sender=Roaster, dispatch_uid="user_stats_roaster_save")
+    post_delete.connect(update_user_stats_for_roaster, sender=Roaster, dispatch_uid="user_stats_roaster_delete")
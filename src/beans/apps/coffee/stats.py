@@ -0,0 +1,370 @@
+from datetime import date, timedelta
+from typing import Any, Callable, Iterable, Mapping, Optional, Type
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Avg, Count, F, QuerySet, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from beans.apps.base.db import run_queries_concurrently
+from beans.apps.base.models import User
+from beans.apps.coffee.models import (
+    Coffee,
+    Roaster,
+    SiteOriginCount,
+    SiteRoasterCount,
+    SiteStats,
+    SiteStatsStaleKey,
+    UserOriginCount,
+    UserRoasterCount,
+    UserStats,
+)
+
+
+def _get_site_stats_for_update() -> SiteStats:
+    stats, _ = SiteStats.objects.select_for_update().get_or_create(pk=1)
+    return stats
+
+
+def _count_origins(countries: Optional[set[str]] = None) -> dict[str, int]:
+    """
+    Counts the coffees of all users per origin, limited to the provided countries if any
+    """
+    coffees = Coffee.objects.all() if countries is None else Coffee.objects.filter(country__in=countries)
+    return {row["country"]: row["count"] for row in coffees.values("country").annotate(count=Count("id")).order_by()}
+
+
+def _count_roasters(names: Optional[set[str]] = None) -> dict[str, int]:
+    """
+    Counts the coffees of all users per roaster name, limited to the provided names if any
+    """
+    coffees = Coffee.objects.filter(roaster__isnull=False)
+
+    if names is not None:
+        coffees = coffees.filter(roaster__name__in=names)
+
+    counts = coffees.values("roaster__name").annotate(count=Count("id")).order_by()
+    return {row["roaster__name"]: row["count"] for row in counts}
+
+
+def _replace_origin_counts(counts: dict[str, int], countries: Optional[Iterable[str]] = None) -> None:
+    """
+    Replaces the counts of the provided countries, or all counts when no countries are provided
+    """
+    stale = SiteOriginCount.objects.all() if countries is None else SiteOriginCount.objects.filter(country__in=countries)
+    stale.delete()
+    SiteOriginCount.objects.bulk_create([SiteOriginCount(country=country, count=count) for country, count in counts.items()])
+
+
+def _replace_roaster_counts(counts: dict[str, int], names: Optional[Iterable[str]] = None) -> None:
+    """
+    Replaces the counts of the provided roaster names, or all counts when no names are provided
+    """
+    stale = SiteRoasterCount.objects.all() if names is None else SiteRoasterCount.objects.filter(name__in=names)
+    stale.delete()
+    SiteRoasterCount.objects.bulk_create([SiteRoasterCount(name=name, count=count) for name, count in counts.items()])
+
+
+def _get_stale_keys(watermark, stale_keys: list[SiteStatsStaleKey]) -> tuple[set[str], set[str]]:
+    """
+    Returns the countries and roaster names whose counts may have changed since the watermark
+    """
+    changed = Coffee.objects.filter(updated_at__gte=watermark)
+    countries = set(changed.values_list("country", flat=True).distinct())
+    names = set(changed.filter(roaster__isnull=False).values_list("roaster__name", flat=True).distinct())
+    names.update(Roaster.objects.filter(updated_at__gte=watermark).values_list("name", flat=True).distinct())
+    roaster_ids = set()
+
+    for stale_key in stale_keys:
+        if stale_key.kind == SiteStatsStaleKey.Kind.ORIGIN:
+            countries.add(stale_key.key)
+        elif stale_key.kind == SiteStatsStaleKey.Kind.ROASTER:
+            names.add(stale_key.key)
+        else:
+            roaster_ids.add(int(stale_key.key))
+
+    if roaster_ids:
+        names.update(Roaster.objects.filter(pk__in=roaster_ids).values_list("name", flat=True))
+
+    return countries, names
+
+
+def refresh_site_stats(full: bool = False) -> SiteStats:
+    """
+    Brings the site stats up to date
+
+    Only the origins and roasters of coffees and roasters changed since the watermark, and the ones
+    recorded as stale, are counted again. A full refresh counts everything and is done the first time.
+    The new watermark lies SITE_STATS_WATERMARK_OVERLAP seconds before the start of the refresh,
+    so rows of transactions that were still running are processed again by the next refresh.
+    """
+    started = timezone.now()
+    overlap = timedelta(seconds=getattr(settings, "SITE_STATS_WATERMARK_OVERLAP", 60))
+
+    with transaction.atomic():
+        stats = _get_site_stats_for_update()
+        stale_keys = list(SiteStatsStaleKey.objects.all())
+
+        if full or stats.watermark is None:
+            _replace_origin_counts(_count_origins())
+            _replace_roaster_counts(_count_roasters())
+        else:
+            countries, names = _get_stale_keys(stats.watermark, stale_keys)
+            _replace_origin_counts(_count_origins(countries), countries)
+            _replace_roaster_counts(_count_roasters(names), names)
+
+        SiteStatsStaleKey.objects.filter(pk__in=[stale_key.pk for stale_key in stale_keys]).delete()
+
+        origins = SiteOriginCount.objects.aggregate(total=Sum("count"), count=Count("id"))
+        stats.total_coffees = origins["total"] or 0
+        stats.total_origins = origins["count"]
+        stats.total_roasters = Roaster.objects.count()
+        stats.watermark = started - overlap
+        stats.refreshed_at = timezone.now()
+        stats.save()
+
+    return stats
+
+
+def _get_site_stats_reads(limit: int) -> tuple[Callable[[], Any], ...]:
+    return (
+        lambda: SiteStats.objects.filter(pk=1).first() or SiteStats(),
+        lambda: list(SiteOriginCount.objects.order_by("-count", "country")[:limit]),
+        lambda: list(SiteRoasterCount.objects.order_by("-count", "name")[:limit]),
+    )
+
+
+def get_site_stats(limit: int) -> dict[str, Any]:
+    """
+    Returns the site wide stats from the rollup tables, which takes three small indexed reads
+    """
+    return _format_site_stats(*(read() for read in _get_site_stats_reads(limit)))
+
+
+async def aget_site_stats(limit: int) -> dict[str, Any]:
+    """
+    Like get_site_stats, but runs the three reads concurrently
+    """
+    return _format_site_stats(*await run_queries_concurrently(*_get_site_stats_reads(limit)))
+
+
+def _format_site_stats(
+    stats: SiteStats, top_origins: list[SiteOriginCount], top_roasters: list[SiteRoasterCount]
+) -> dict[str, Any]:
+    return {
+        "total_coffees": stats.total_coffees,
+        "total_origins": stats.total_origins,
+        "total_roasters": stats.total_roasters,
+        "top_origins": [{"origin": origin.country, "count": origin.count} for origin in top_origins],
+        "top_roasters": [{"name": roaster.name, "count": roaster.count} for roaster in top_roasters],
+        "refreshed_at": stats.refreshed_at,
+    }
+
+
+def _apply_counts(model: Type[models.Model], user_id: int, field: str, deltas: Mapping[Any, int]) -> None:
+    """
+    Adds the deltas to the per key counts of the user in a fixed number of queries, rows that drop to 0 are deleted
+    """
+    if not (deltas := {key: delta for key, delta in deltas.items() if delta}):
+        return
+
+    # rows for new keys are created with a count of 0 first, so every row can be locked and updated the same way
+    model.objects.bulk_create(
+        [model(user_id=user_id, **{field: key}) for key, delta in deltas.items() if delta > 0], ignore_conflicts=True
+    )
+    rows = list(model.objects.select_for_update().filter(user_id=user_id, **{f"{field}__in": deltas.keys()}))
+
+    for row in rows:
+        row.count += deltas[getattr(row, field)]
+
+    model.objects.bulk_update(rows, ["count"])
+    model.objects.filter(user_id=user_id, count__lte=0).delete()
+
+
+def apply_user_stats_delta(
+    user_id: int,
+    total_coffees: int = 0,
+    total_roasters: int = 0,
+    origins: Optional[Mapping[str, int]] = None,
+    roasters: Optional[Mapping[int, int]] = None,
+) -> None:
+    """
+    Applies changed amounts of coffees, roasters and coffees per origin and roaster id to the stats of the user
+
+    Nothing is applied when the stats of the user haven't been built yet, they are built from scratch when read.
+    """
+    with transaction.atomic():
+        updated = UserStats.objects.filter(user_id=user_id).update(
+            total_coffees=F("total_coffees") + total_coffees, total_roasters=F("total_roasters") + total_roasters
+        )
+
+        if not updated:
+            return
+
+        _apply_counts(UserOriginCount, user_id, "country", origins or {})
+        _apply_counts(UserRoasterCount, user_id, "roaster_id", roasters or {})
+
+
+def rebuild_user_stats(user: User) -> UserStats:
+    """
+    Builds the stats of the user from scratch, which repairs any drift of the counters
+    """
+    coffees = user.coffee_set.all()
+
+    with transaction.atomic():
+        stats, _ = UserStats.objects.select_for_update().get_or_create(user=user)
+        stats.total_coffees = coffees.count()
+        stats.total_roasters = user.roaster_set.count()
+        stats.rebuilt_at = timezone.now()
+        stats.save()
+
+        origins = coffees.values("country").annotate(count=Count("id")).order_by()
+        roasters = coffees.filter(roaster__isnull=False).values("roaster_id").annotate(count=Count("id")).order_by()
+
+        UserOriginCount.objects.filter(user=user).delete()
+        UserOriginCount.objects.bulk_create([UserOriginCount(user=user, **row) for row in origins])
+        UserRoasterCount.objects.filter(user=user).delete()
+        UserRoasterCount.objects.bulk_create([UserRoasterCount(user=user, **row) for row in roasters])
+
+    return stats
+
+
+def _get_user_stats_reads(user: User, limit: int) -> tuple[Callable[[], Any], ...]:
+    origins = UserOriginCount.objects.filter(user=user)
+    roasters = UserRoasterCount.objects.filter(user=user).select_related("roaster")
+
+    return (
+        lambda: origins.count(),
+        lambda: list(origins.order_by("-count", "country")[:limit]),
+        lambda: list(roasters.order_by("-count", "roaster__name")[:limit]),
+    )
+
+
+def get_user_stats(user: User, limit: int) -> dict[str, Any]:
+    """
+    Returns the stats of the user from the counters, building them first when the user has none
+    """
+    if (stats := UserStats.objects.filter(user=user).first()) is None:
+        stats = rebuild_user_stats(user)
+
+    return _format_user_stats(stats, *(read() for read in _get_user_stats_reads(user, limit)))
+
+
+async def aget_user_stats(user: User, limit: int) -> dict[str, Any]:
+    """
+    Like get_user_stats, but runs the reads concurrently
+
+    The stats of users that have none yet are built by get_user_stats in a single thread.
+    """
+    stats, *reads = await run_queries_concurrently(
+        lambda: UserStats.objects.filter(user=user).first(), *_get_user_stats_reads(user, limit)
+    )
+
+    if stats is None:
+        return await sync_to_async(get_user_stats)(user, limit)
+
+    return _format_user_stats(stats, *reads)
+
+
+def _format_user_stats(
+    stats: UserStats, total_origins: int, top_origins: list[UserOriginCount], top_roasters: list[UserRoasterCount]
+) -> dict[str, Any]:
+    return {
+        "total_coffees": stats.total_coffees,
+        "total_origins": total_origins,
+        "total_roasters": stats.total_roasters,
+        "top_origins": [{"origin": origin.country, "count": origin.count} for origin in top_origins],
+        "top_roasters": [{"name": roaster.roaster.name, "count": roaster.count} for roaster in top_roasters],
+    }
+
+
+# bucket: (truncation of the roasting date, start of the next bucket)
+TIMESERIES_BUCKETS: dict[str, tuple[type, Callable[[date], date]]] = {
+    "week": (TruncWeek, lambda start: start + timedelta(days=7)),
+    "month": (TruncMonth, lambda start: date(start.year + start.month // 12, start.month % 12 + 1, 1)),
+}
+TIMESERIES_METRICS = {"count": Count("id"), "avg_rating": Avg("rating")}
+# group: field of the coffee that names the series
+TIMESERIES_GROUPS = {"origin": "country", "roaster": "roaster__name"}
+TIMESERIES_MAX_BUCKETS = 1000
+
+
+def _get_bucket_starts(bucket: str, first: date, last: date) -> list[date]:
+    """
+    Returns the start of every bucket from the bucket of first up to and including the bucket of last
+    """
+    _, get_next = TIMESERIES_BUCKETS[bucket]
+    # the truncation of the database for the first date, so the starts match the buckets of the query
+    start = first - timedelta(days=first.weekday()) if bucket == "week" else first.replace(day=1)
+    starts: list[date] = []
+
+    while start <= last:
+        if len(starts) == TIMESERIES_MAX_BUCKETS:
+            raise ValueError(f"more than {TIMESERIES_MAX_BUCKETS} buckets")
+
+        starts.append(start)
+
+        try:
+            start = get_next(start)
+        except (OverflowError, ValueError):
+            # the bucket contains date.max, there is no bucket after it
+            break
+
+    return starts
+
+
+def get_timeseries(
+    coffees: QuerySet[Coffee],
+    bucket: str,
+    metric: str,
+    group_by: Optional[str] = None,
+    limit: int = 5,
+    first: Optional[date] = None,
+    last: Optional[date] = None,
+) -> dict[str, Any]:
+    """
+    Returns the metric of the coffees per bucket of their roasting date, optionally per origin or roaster
+
+    The coffees are grouped by the truncated roasting date (and the group) in a single query, so only one
+    row per bucket and group is read. The series are dense: they have a value for every bucket from first to last
+    (the first and last roasting date by default), empty buckets have a count of 0 and an avg_rating of None.
+    When grouped, only the limit groups with the most coffees get a series.
+    Raises ValueError when the range has more than TIMESERIES_MAX_BUCKETS buckets.
+    """
+    truncate, _ = TIMESERIES_BUCKETS[bucket]
+    fields = ["period"] + ([TIMESERIES_GROUPS[group_by]] if group_by else [])
+    rows = list(
+        coffees.annotate(period=truncate("roasting_date"))
+        .values(*fields)
+        .annotate(coffees=Count("id"), value=TIMESERIES_METRICS[metric])
+        .order_by()
+    )
+
+    periods = [row["period"] for row in rows]
+    starts = _get_bucket_starts(bucket, first or min(periods, default=date.max), last or max(periods, default=date.min))
+    empty = 0 if metric == "count" else None
+    series: dict[Any, dict[date, Any]] = {}
+    totals: dict[Any, int] = {}
+
+    for row in rows:
+        name = row[fields[1]] if group_by else "all"
+        value = round(row["value"], 2) if isinstance(row["value"], float) else row["value"]
+        series.setdefault(name, {})[row["period"]] = value
+        totals[name] = totals.get(name, 0) + row["coffees"]
+
+    if not group_by:
+        series.setdefault("all", {})
+    else:
+        series = {name: series[name] for name in sorted(totals, key=lambda name: (-totals[name], str(name)))[:limit]}
+
+    return {
+        "bucket": bucket,
+        "metric": metric,
+        "group_by": group_by,
+        "periods": [start.isoformat() for start in starts],
+        "series": [
+            {"name": name, "values": [values.get(start, empty) for start in starts]} for name, values in series.items()
+        ],
+    }
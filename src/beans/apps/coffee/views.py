@@ -1,16 +1,23 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.db.models import Q, Count
+from django.core.exceptions import BadRequest
 from django.http import HttpRequest, HttpResponse, Http404
 from django.shortcuts import render, redirect
 from django_countries.fields import Country
 
 from beans.apps.base.models import User
+from beans.apps.base.pagination import InvalidCursor, paginate_queryset, replace_query_param
 from beans.apps.coffee.exceptions import CoffeeException
 from beans.apps.coffee.forms import AddCoffeeForm, AddRoasterForm
 from beans.apps.coffee.countries import OriginCountries
 from beans.apps.coffee.models import Coffee
 
+# the last field is unique, so the list can be paginated with a cursor
+COFFEE_LIST_ORDERING = ("-roasting_date", "name", "id")
+
 
 def process_add_coffee_form(form: AddCoffeeForm, user: User):
     if not form.is_valid():
@@ -24,36 +31,53 @@ def process_add_coffee_form(form: AddCoffeeForm, user: User):
     roasting_date = cd.get("roasting_date")
     rating = cd.get("rating")
 
-    processing, _ = user.processing_set.get_or_create(name=processing_name)
-    roaster, _ = user.roaster_set.get_or_create(name=roaster_name)
+    # the stats of the user are updated by signals, in the same transaction as the coffee
+    with transaction.atomic():
+        processing, _ = user.processing_set.get_or_create(name=processing_name)
+        roaster, _ = user.roaster_set.get_or_create(name=roaster_name)
 
-    user.coffee_set.create(
-        name=name,
-        country=country,
-        processing=processing,
-        roaster=roaster,
-        roasting_date=roasting_date,
-        rating=rating,
-    )
+        user.coffee_set.create(
+            name=name,
+            country=country,
+            processing=processing,
+            roaster=roaster,
+            roasting_date=roasting_date,
+            rating=rating,
+        )
 
 
 @login_required(login_url="/login")
 def coffee_list_view(request: HttpRequest) -> HttpResponse:
+    """
+    Shows a page of the coffees of the user, newest first, the next page starts after the cursor of the previous one
+
+    Every page is read from the (user, -roasting_date, name, id) index with its roasters, so it takes
+    the same time and amount of queries however many coffees the user has.
+    """
+    coffees = request.user.coffee_set.select_related("roaster")
+
     if (query := request.GET.get("q", None)) is not None:
-        query = query
-        coffee_list = request.user.coffee_set.filter(
+        coffees = coffees.filter(
             Q(name__icontains=query)
             | Q(country__icontains=query)
             | Q(processing__name__icontains=query)
             | Q(roaster__name__icontains=query)
-        ).order_by("-roasting_date", "name")
-    else:
-        coffee_list = request.user.coffee_set.all().order_by("-roasting_date", "name")
+        )
+
+    page_size = getattr(settings, "COFFEE_LIST_PAGE_SIZE", 50)
+
+    # paginate_queryset validates the ordering and the values of the cursor, a cursor that isn't valid is a 400
+    try:
+        coffee_list, cursor = paginate_queryset(coffees, COFFEE_LIST_ORDERING, request.GET.get("cursor"), page_size)
+    except InvalidCursor as exc:
+        raise BadRequest(str(exc))
 
     context = {
         "page": "coffee-list",
         "query": query,
         "coffee_list": coffee_list,
+        "next_url": replace_query_param(request.get_full_path(), "cursor", cursor) if cursor else None,
+        "first_url": replace_query_param(request.get_full_path(), "cursor", None) if "cursor" in request.GET else None,
     }
 
     return render(request, "coffees.html", context=context)
@@ -124,7 +148,10 @@ def add_roaster_view(request: HttpRequest) -> HttpResponse:
         if form.is_valid():
             roaster = form.save(commit=False)
             roaster.user = request.user
-            roaster.save()
+
+            with transaction.atomic():
+                roaster.save()
+
             return redirect("roaster-list")
         else:
             messages.error(request, "An error occurred while processing the form")
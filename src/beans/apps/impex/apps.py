@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ImpexConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "beans.apps.impex"
+
+    def ready(self):
+        from beans.apps.impex.signals import connect_signals
+
+        connect_signals()
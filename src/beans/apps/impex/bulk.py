@@ -0,0 +1,187 @@
+from collections import Counter
+from typing import Any, Iterable, Type, TypeVar
+
+from django.db import models
+from django.utils import timezone
+
+from beans.apps.base.models import User
+from beans.apps.coffee.models import Coffee, Processing, Roaster, TastingNote
+from beans.apps.coffee.stats import apply_user_stats_delta
+
+NamedModel = TypeVar("NamedModel", Processing, Roaster, TastingNote)
+CoffeeKey = tuple[str, str, int, Any, int]
+
+
+def resolve_names(model: Type[NamedModel], user: User, names: Iterable[str]) -> dict[str, NamedModel]:
+    """
+    Retrieves the objects of the provided model for the given names, creating the missing ones in bulk
+    """
+    objects, _ = _resolve_names(model, user, names)
+    return objects
+
+
+def _resolve_names(model: Type[NamedModel], user: User, names: Iterable[str]) -> tuple[dict[str, NamedModel], int]:
+    """
+    Like resolve_names, but also returns the amount of created objects
+
+    bulk_create only returns primary keys on some databases (e.g. Postgresql), so the created
+    objects are fetched again instead of relying on the objects passed to bulk_create.
+    """
+    names = set(names)
+
+    if not names:
+        return {}, 0
+
+    objects = {obj.name: obj for obj in model.objects.filter(user=user, name__in=names)}
+
+    if missing := names - objects.keys():
+        model.objects.bulk_create([model(user=user, name=name) for name in missing])
+        objects.update({obj.name: obj for obj in model.objects.filter(user=user, name__in=missing)})
+
+    return objects, len(missing)
+
+
+def _apply_stats(user: User, created: list[Coffee], created_roasters: int) -> None:
+    """
+    Applies the created coffees and roasters to the stats of the user, bulk_create doesn't send the signals that do so
+    """
+    apply_user_stats_delta(
+        user.pk,
+        total_coffees=len(created),
+        total_roasters=created_roasters,
+        origins=Counter(coffee.country for coffee in created),
+        roasters=Counter(coffee.roaster_id for coffee in created if coffee.roaster_id is not None),
+    )
+
+
+def get_coffee_key(coffee: Coffee) -> CoffeeKey:
+    """
+    Returns the values of the unique_bean_roaster_constraint for the provided coffee, without the user
+    """
+    return coffee.name, coffee.country, coffee.roaster_id, coffee.roasting_date, coffee.processing_id
+
+
+def _get_existing_coffees(user: User, keys: set[CoffeeKey]) -> dict[CoffeeKey, Coffee]:
+    """
+    Retrieves the coffees of the user that match one of the provided keys
+    """
+    coffees = user.coffee_set.filter(name__in={key[0] for key in keys})
+    return {key: coffee for coffee in coffees if (key := get_coffee_key(coffee)) in keys}
+
+
+def _build_coffees(
+    user: User, rows: list[dict[str, Any]]
+) -> tuple[dict[CoffeeKey, Coffee], list[CoffeeKey], dict[CoffeeKey, list[int]], int]:
+    """
+    Builds unsaved coffees for the cleaned rows, resolving their processing, roasters and tasting notes in bulk
+
+    Returns the coffees by key (the last row wins when rows share a key), the key of every row,
+    the tasting note ids of every key and the amount of created roasters.
+    """
+    processing = resolve_names(Processing, user, (row["processing"] for row in rows))
+    roasters, created_roasters = _resolve_names(Roaster, user, (row["roaster"] for row in rows))
+    tasting_notes = resolve_names(TastingNote, user, (note for row in rows for note in row["tasting_notes"]))
+
+    coffees: dict[CoffeeKey, Coffee] = {}
+    row_keys: list[CoffeeKey] = []
+    notes_per_coffee: dict[CoffeeKey, list[int]] = {}
+
+    for row in rows:
+        coffee = Coffee(
+            user=user,
+            name=row["name"],
+            country=row["country"],
+            processing=processing[row["processing"]],
+            roaster=roasters[row["roaster"]],
+            roasting_date=row["roasting_date"],
+            rating=row["rating"],
+            variety=row["variety"],
+        )
+        key = get_coffee_key(coffee)
+        coffees[key] = coffee
+        row_keys.append(key)
+        notes = notes_per_coffee.setdefault(key, [])
+        notes.extend(tasting_notes[note].pk for note in row["tasting_notes"] if tasting_notes[note].pk not in notes)
+
+    return coffees, row_keys, notes_per_coffee, created_roasters
+
+
+def bulk_create_coffees(user: User, rows: list[dict[str, Any]]) -> list[Coffee]:
+    """
+    Creates coffees for the provided cleaned rows using a fixed number of queries
+
+    Processing, roasters and tasting notes are resolved by name for all rows at once, coffees that
+    already exist are reused and the tasting notes are added through a single insert on the through table.
+    Returns the coffees in the order of the provided rows, rows that describe the same coffee share an object.
+    """
+    if not rows:
+        return []
+
+    coffees, row_keys, notes_per_coffee, created_roasters = _build_coffees(user, rows)
+    existing = _get_existing_coffees(user, set(coffees))
+    # the tasting notes of reused coffees may change, which has to change their updated_at as well
+    reused = [coffee.pk for key, coffee in existing.items() if notes_per_coffee[key]]
+
+    if missing := [coffee for key, coffee in coffees.items() if key not in existing]:
+        Coffee.objects.bulk_create(missing)
+        existing.update(_get_existing_coffees(user, {get_coffee_key(coffee) for coffee in missing}))
+
+    _apply_stats(user, missing, created_roasters)
+
+    _bulk_add_tasting_notes([(existing[key].pk, note) for key, notes in notes_per_coffee.items() for note in notes])
+
+    if reused:
+        Coffee.objects.filter(pk__in=reused).update(updated_at=timezone.now())
+
+    return [existing[key] for key in row_keys]
+
+
+def bulk_upsert_coffees(user: User, rows: list[dict[str, Any]]) -> list[tuple[Coffee, bool]]:
+    """
+    Creates or updates coffees for the provided cleaned rows using a fixed number of queries
+
+    Coffees are matched on the unique_bean_roaster_constraint key, the rating, variety and tasting notes
+    of existing coffees are replaced by the values of the row.
+    Returns (coffee, created) pairs in the order of the provided rows.
+    """
+    if not rows:
+        return []
+
+    coffees, row_keys, notes_per_coffee, created_roasters = _build_coffees(user, rows)
+    existing = _get_existing_coffees(user, set(coffees))
+    now = timezone.now()
+
+    for key, coffee in existing.items():
+        coffee.rating = coffees[key].rating
+        coffee.variety = coffees[key].variety
+        coffee.updated_at = now
+
+    if existing:
+        Coffee.objects.bulk_update(list(existing.values()), ["rating", "variety", "updated_at"])
+
+    created = {key for key in coffees if key not in existing}
+
+    if created:
+        Coffee.objects.bulk_create([coffees[key] for key in created])
+        existing.update(_get_existing_coffees(user, created))
+
+    _apply_stats(user, [coffees[key] for key in created], created_roasters)
+
+    Coffee.tasting_notes.through.objects.filter(coffee_id__in=[coffee.pk for coffee in existing.values()]).delete()
+    _bulk_add_tasting_notes([(existing[key].pk, note) for key, notes in notes_per_coffee.items() for note in notes])
+
+    return [(existing[key], key in created) for key in row_keys]
+
+
+def _bulk_add_tasting_notes(pairs: list[tuple[int, int]]) -> None:
+    """
+    Adds tasting notes to coffees by inserting (coffee id, tasting note id) pairs into the through table
+    """
+    if not pairs:
+        return
+
+    through: Type[models.Model] = Coffee.tasting_notes.through
+    through.objects.bulk_create(
+        [through(coffee_id=coffee_id, tastingnote_id=tasting_note_id) for coffee_id, tasting_note_id in pairs],
+        ignore_conflicts=True,
+    )
@@ -0,0 +1,13 @@
+class RowValidationError(ValueError):
+    """
+    Raised when a value in an import row is invalid, keeps track of the row number and field
+    """
+
+    def __init__(self, message: str, row_number: int, field: str):
+        super().__init__(message)
+        self.message = message
+        self.row_number = row_number
+        self.field = field
+
+    def as_dict(self) -> dict:
+        return {"row": self.row_number, "field": self.field, "message": self.message}
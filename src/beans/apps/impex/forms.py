@@ -1,5 +1,9 @@
 from django import forms
 
+from beans.apps.impex.models import ImportJob
+
 
 class UploadFileForm(forms.Form):
     file = forms.FileField()
+    file_format = forms.ChoiceField(choices=ImportJob.FileFormat.choices, initial=ImportJob.FileFormat.CSV)
+    dry_run = forms.BooleanField(required=False, label="Only validate the file, don't import it")
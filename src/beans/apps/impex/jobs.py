@@ -0,0 +1,160 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Iterator, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from beans.apps.base.models import User
+from beans.apps.impex.models import ImportJob
+from beans.apps.impex.parallel import iter_parallel_import_results
+from beans.apps.impex.utils import IMPORT_CHUNK_SIZE, get_file_hash, iter_import_results, iter_lines, read_rows
+
+DEFAULT_JOB_TIMEOUT = 60 * 60
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def create_import_job(user: User, file, file_format: str = ImportJob.FileFormat.CSV) -> ImportJob:
+    """
+    Stores the uploaded file in an import job and schedules it once the current transaction is committed
+
+    If the user already imported a file with the same contents, the job is marked as duplicate and isn't scheduled.
+    """
+    file_hash = get_file_hash(file)
+    duplicate = user.importjob_set.filter(file_hash=file_hash, status=ImportJob.Status.DONE).exists()
+
+    job = ImportJob.objects.create(
+        user=user,
+        file=file,
+        file_format=file_format,
+        file_hash=file_hash,
+        status=ImportJob.Status.DUPLICATE if duplicate else ImportJob.Status.PENDING,
+    )
+
+    if not duplicate:
+        transaction.on_commit(lambda: submit_import_job(job.pk))
+
+    return job
+
+
+def submit_import_job(job_id: int) -> None:
+    """
+    Runs the import job on the in-process thread pool
+
+    When IMPEX_JOB_THREADS is 0 the job stays pending until it is picked up by the
+    process_import_jobs management command.
+    """
+    global _executor
+
+    if (threads := getattr(settings, "IMPEX_JOB_THREADS", 0)) < 1:
+        return
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="impex")
+
+    _executor.submit(_run_in_thread, job_id)
+
+
+def _run_in_thread(job_id: int) -> None:
+    try:
+        run_import_job(job_id)
+    finally:
+        # every thread has its own database connection, it isn't closed by the request cycle
+        connection.close()
+
+
+def claim_import_job(job_id: int) -> bool:
+    """
+    Marks a pending job as running, returns False if another worker already claimed it
+    """
+    now = timezone.now()
+    return (
+        ImportJob.objects.filter(pk=job_id, status=ImportJob.Status.PENDING).update(
+            status=ImportJob.Status.RUNNING, started_at=now, updated_at=now
+        )
+        == 1
+    )
+
+
+def fail_stale_import_jobs(user: Optional[User] = None) -> int:
+    """
+    Marks running jobs without progress for IMPEX_JOB_TIMEOUT seconds as failed, returns the amount of jobs
+
+    A job is left running when its worker crashes or is killed. The chunks it committed stay imported,
+    uploading the file again imports the remaining rows. Only the jobs of the user are checked when provided.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, "IMPEX_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT))
+    # updated_at is set on every chunk, so a long running job that makes progress isn't stale
+    jobs = ImportJob.objects.filter(status=ImportJob.Status.RUNNING, started_at__lt=cutoff, updated_at__lt=cutoff)
+
+    if user is not None:
+        jobs = jobs.filter(user=user)
+
+    return jobs.update(
+        status=ImportJob.Status.FAILED,
+        error="the import job stopped without finishing, upload the file again to import the remaining rows",
+        finished_at=now,
+        updated_at=now,
+    )
+
+
+def get_pending_job_ids(limit: int = 10) -> list[int]:
+    """
+    Returns the ids of the oldest pending jobs
+    """
+    pending = ImportJob.objects.filter(status=ImportJob.Status.PENDING).order_by("created_at")
+    return list(pending.values_list("pk", flat=True)[:limit])
+
+
+def run_import_job(job_id: int, chunk_size: Optional[int] = None, workers: Optional[int] = None) -> Optional[ImportJob]:
+    """
+    Claims and processes the import job, progress is saved after every chunk
+
+    Every chunk is committed in its own transaction, invalid rows and rows that can't be saved
+    are counted as failed and the first error is kept on the job. With more than one worker
+    the file is parsed by a pool of processes, while this process writes to the database.
+    """
+    if not claim_import_job(job_id):
+        return None
+
+    job = ImportJob.objects.select_related("user").get(pk=job_id)
+    chunk_size = chunk_size or getattr(settings, "IMPEX_CHUNK_SIZE", IMPORT_CHUNK_SIZE)
+    workers = workers or getattr(settings, "IMPEX_PARSE_WORKERS", 1)
+
+    try:
+        for result in _iter_job_results(job, chunk_size, workers):
+            job.rows_done += result["committed"]
+            job.rows_skipped += result["skipped"]
+            job.rows_failed += result["failed"]
+
+            if result["errors"] and not job.error:
+                job.error = result["errors"][0]["message"]
+
+            ImportJob.objects.filter(pk=job.pk).update(
+                rows_done=job.rows_done,
+                rows_failed=job.rows_failed,
+                rows_skipped=job.rows_skipped,
+                error=job.error,
+                updated_at=timezone.now(),
+            )
+    except Exception as e:
+        job.status = ImportJob.Status.FAILED
+        job.error = str(e)
+    else:
+        job.status = ImportJob.Status.DONE
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "rows_done", "rows_failed", "rows_skipped", "finished_at", "updated_at"])
+    return job
+
+
+def _iter_job_results(job: ImportJob, chunk_size: int, workers: int) -> Iterator[dict[str, Any]]:
+    if workers > 1:
+        yield from iter_parallel_import_results(job.user, job.file.path, job.file_format, workers, chunk_size)
+        return
+
+    with job.file.open("rb") as file:
+        yield from iter_import_results(job.user, read_rows(iter_lines(file), job.file_format), chunk_size)
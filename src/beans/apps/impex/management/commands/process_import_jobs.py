@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from beans.apps.impex.jobs import fail_stale_import_jobs, get_pending_job_ids, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Processes pending csv import jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to wait between polls")
+        parser.add_argument("--workers", type=int, default=None, help="Amount of processes used to parse a file")
+
+    def handle(self, *args, **options):
+        while True:
+            if stale := fail_stale_import_jobs():
+                self.stdout.write(f"marked {stale} stale import jobs as failed")
+
+            for job_id in get_pending_job_ids():
+                if (job := run_import_job(job_id, workers=options["workers"])) is not None:
+                    self.stdout.write(f"import job {job.pk} {job.status}: {job.rows_done} done, {job.rows_failed} failed")
+
+            if not options["loop"]:
+                break
+
+            time.sleep(options["interval"])
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('impex', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='file_format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')], default='csv', max_length=10),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.0.3 on 2026-10-18 17:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('impex', '0002_importjob_file_format'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_hash', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='file_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='rows_skipped',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='importjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('duplicate', 'Duplicate')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='importjob',
+            index=models.Index(fields=['user', 'file_hash'], name='import_job_file_hash_idx'),
+        ),
+        migrations.AddField(
+            model_name='importedrow',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='importedrow',
+            constraint=models.UniqueConstraint(fields=('user', 'row_hash'), name='unique_imported_row_constraint'),
+        ),
+    ]
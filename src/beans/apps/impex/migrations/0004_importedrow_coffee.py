@@ -0,0 +1,28 @@
+# Generated by Django 4.0.3 on 2026-10-18 21:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def delete_imported_rows(apps, schema_editor):
+    # the coffees of the existing fingerprints are unknown, without a fingerprint a row is matched
+    # to its existing coffee again when it is imported
+    apps.get_model('impex', 'ImportedRow').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0016_coffee_coffee_user_list_idx'),
+        ('impex', '0003_importedrow_importjob_file_hash_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_imported_rows, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='importedrow',
+            name='coffee',
+            field=models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, to='coffee.coffee'),
+            preserve_default=False,
+        ),
+    ]
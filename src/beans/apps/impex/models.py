@@ -1,3 +1,68 @@
+from typing import Optional
+
 from django.db import models
+from django.utils import timezone
+
+from beans.apps.base.models import User
+from beans.apps.coffee.models import Coffee
+from beans.generic_models import TimeStampedModel
+
+
+class ImportJob(TimeStampedModel):
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="import_job_status_idx"),
+            models.Index(fields=["user", "file_hash"], name="import_job_file_hash_idx"),
+        ]
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+        DUPLICATE = "duplicate"
+
+    class FileFormat(models.TextChoices):
+        CSV = "csv", "CSV"
+        NDJSON = "ndjson", "NDJSON"
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    file = models.FileField(upload_to="imports/")
+    file_format = models.CharField(max_length=10, choices=FileFormat.choices, default=FileFormat.CSV)
+    file_hash = models.CharField(max_length=64, blank=True, default="")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    rows_skipped = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+
+        if elapsed <= 0:
+            return None
+
+        return round((self.rows_done + self.rows_failed + self.rows_skipped) / elapsed, 1)
+
+
+class ImportedRow(models.Model):
+    """
+    Fingerprint of an imported row, used to skip rows that were already imported by the user
+
+    The fingerprint is deleted with the coffee of the row, so a deleted coffee can be imported again.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "row_hash"], name="unique_imported_row_constraint"),
+        ]
 
-# Create your models here.
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    coffee = models.ForeignKey(Coffee, on_delete=models.CASCADE)
+    row_hash = models.CharField(max_length=32)
@@ -0,0 +1,179 @@
+import csv
+import gc
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from beans.apps.base.models import User
+from beans.apps.impex.models import ImportJob
+from beans.apps.impex.utils import IMPORT_CHUNK_SIZE, chunk_rows, get_row_values, parse_ndjson_line, write_cleaned_rows
+
+RANGE_SIZE = 1024 * 1024
+READ_BLOCK_SIZE = 1024 * 1024
+
+# the values of a row are sent between processes as a tuple in this order, which is much cheaper to pickle than a dict
+VALUE_KEYS = ("name", "country", "processing", "roaster", "roasting_date", "rating", "variety", "tasting_notes")
+
+# (row number, value tuple or None when the row is invalid, errors)
+ParsedRow = tuple[int, Optional[tuple], list[dict[str, Any]]]
+ByteRange = tuple[int, int, int]
+
+
+def _init_worker() -> None:
+    """
+    Sets up django in worker processes that are spawned instead of forked
+
+    The garbage collector is disabled as well, parsing only creates acyclic objects and the
+    collections triggered by the many allocations more than double the parse time.
+    """
+    from django.apps import apps
+
+    gc.disable()
+
+    if not apps.ready:
+        import django
+
+        django.setup()
+
+
+def read_csv_header(path: str) -> tuple[list[str], int]:
+    """
+    Returns the field names of a csv file and the byte offset of the first row
+    """
+    with open(path, "rb") as file:
+        line = file.readline()
+
+    fieldnames = next(csv.reader([line.decode("utf-8-sig", errors="replace")], delimiter=";"), [])
+    return fieldnames, len(line)
+
+
+def _count_lines(file, start: int, end: int) -> int:
+    """
+    Counts the line breaks between the start and end offset of the file
+    """
+    file.seek(start)
+    lines = 0
+    remaining = end - start
+
+    while remaining > 0 and (data := file.read(min(READ_BLOCK_SIZE, remaining))):
+        lines += data.count(b"\n")
+        remaining -= len(data)
+
+    return lines
+
+
+def get_byte_ranges(path: str, start: int = 0, range_size: int = RANGE_SIZE) -> list[ByteRange]:
+    """
+    Splits the file from start into (start, end, first row number) ranges of about range_size bytes
+
+    Every range ends right after a line break, so no line is split over two ranges. The row number
+    of the first line of every range is counted up front, which lets workers report global row numbers.
+    Fields with quoted line breaks are not supported, as a range could start inside such a field.
+    """
+    size = os.path.getsize(path)
+    ranges: list[ByteRange] = []
+    row_number = 0
+
+    with open(path, "rb") as file:
+        while start < size:
+            file.seek(min(start + range_size, size))
+            file.readline()
+            end = min(file.tell(), size)
+
+            ranges.append((start, end, row_number))
+            row_number += _count_lines(file, start, end)
+            start = end
+
+    return ranges
+
+
+def parse_byte_range(
+    path: str, byte_range: ByteRange, file_format: str, fieldnames: Optional[list[str]] = None
+) -> list[ParsedRow]:
+    """
+    Parses and validates the rows in the byte range of the file, without touching the database
+
+    The row number is the line number, counted from the first row, so blank lines are counted as well.
+    """
+    start, end, first_row_number = byte_range
+
+    with open(path, "rb") as file:
+        file.seek(start)
+        # a byte order mark can only be at the start of the file, like the serial reader it is dropped
+        encoding = "utf-8-sig" if start == 0 else "utf-8"
+        lines = file.read(end - start).decode(encoding, errors="replace").split("\n")
+
+    if file_format == ImportJob.FileFormat.CSV:
+        records: Iterable[Any] = csv.reader(lines, delimiter=";")
+    else:
+        records = lines
+
+    parsed: list[ParsedRow] = []
+
+    for offset, record in enumerate(records):
+        if not record or (isinstance(record, str) and not record.strip()):
+            continue
+
+        number = first_row_number + offset
+
+        if file_format == ImportJob.FileFormat.CSV:
+            row = dict(zip(fieldnames or [], record))
+        else:
+            row = parse_ndjson_line(record, number)
+
+        values, errors = get_row_values(row, number)
+
+        if errors:
+            parsed.append((number, None, [error.as_dict() for error in errors]))
+        else:
+            parsed.append((number, tuple(values[key] for key in VALUE_KEYS), []))
+
+    return parsed
+
+
+def _ordered_map(executor: Executor, fn: Callable, arguments: Iterable[tuple], window: int) -> Iterator[Any]:
+    """
+    Like executor.map, but keeps at most window tasks in flight so results don't pile up in memory
+    """
+    pending = deque()
+
+    for args in arguments:
+        pending.append(executor.submit(fn, *args))
+
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
+def parse_file_parallel(path: str, file_format: str, workers: int, range_size: int = RANGE_SIZE) -> Iterator[ParsedRow]:
+    """
+    Parses and validates the file in byte ranges on a pool of worker processes, yielding the rows in file order
+    """
+    fieldnames, start = read_csv_header(path) if file_format == ImportJob.FileFormat.CSV else (None, 0)
+    arguments = ((path, byte_range, file_format, fieldnames) for byte_range in get_byte_ranges(path, start, range_size))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for parsed in _ordered_map(executor, parse_byte_range, arguments, window=workers * 2):
+            yield from parsed
+
+
+def iter_parallel_import_results(
+    user: User,
+    path: str,
+    file_format: str,
+    workers: int,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    range_size: int = RANGE_SIZE,
+) -> Iterator[dict[str, Any]]:
+    """
+    Imports the file with parallel parsing, the current process is the only one writing to the database
+
+    Yields the same chunk reports as iter_import_results.
+    """
+    for chunk in chunk_rows(parse_file_parallel(path, file_format, workers, range_size), chunk_size):
+        valid_rows = [(number, dict(zip(VALUE_KEYS, values))) for number, values, _ in chunk if values is not None]
+        errors = [error for _, _, row_errors in chunk for error in row_errors]
+        yield write_cleaned_rows(user, valid_rows, len(chunk), errors)
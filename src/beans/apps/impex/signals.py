@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete
+
+from beans.apps.impex.models import ImportedRow, ImportJob
+
+
+def forget_imported_files(sender: type[ImportedRow], instance: ImportedRow, **kwargs) -> None:
+    """
+    Clears the file hashes of the user's finished jobs when the coffee of an imported row is deleted
+
+    Uploading one of those files again is no longer a duplicate, it is parsed so the deleted coffee is imported again.
+    """
+    ImportJob.objects.filter(user_id=instance.user_id, status=ImportJob.Status.DONE).exclude(file_hash="").update(
+        file_hash=""
+    )
+
+
+def connect_signals() -> None:
+    post_delete.connect(forget_imported_files, sender=ImportedRow, dispatch_uid="forget_imported_files")
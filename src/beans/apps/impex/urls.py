@@ -1,8 +1,10 @@
 from django.urls import path
 
-from beans.apps.impex.views import UploadCsvView, download_template_view
+from beans.apps.impex.views import UploadCsvView, download_template_view, export_view, import_job_status_view
 
 urlpatterns = [
     path("upload/", UploadCsvView.as_view(), name="upload"),
     path("download-template", download_template_view, name="download-template"),
+    path("export/", export_view, name="export"),
+    path("jobs/<int:pk>/", import_job_status_view, name="import-job-status"),
 ]
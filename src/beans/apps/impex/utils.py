@@ -1,13 +1,34 @@
+import codecs
 import csv
+import hashlib
+import json
 
-from datetime import datetime, date
-from io import TextIOWrapper
-from typing import Any
+from datetime import date
+from functools import lru_cache
+from itertools import chain, islice
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional, Union
 
-# from django.db import IntegrityError
+from django.db import DatabaseError, transaction
+from django.db.models import Prefetch
 
 from beans.apps.base.models import User
-from beans.apps.coffee.models import Coffee, Processing, Roaster
+from beans.apps.coffee.models import Coffee, Processing, Roaster, TastingNote
+from beans.apps.impex.bulk import bulk_create_coffees
+from beans.apps.impex.exceptions import RowValidationError
+from beans.apps.impex.models import ImportedRow, ImportJob
+
+IMPORT_CHUNK_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """
+    File-like object that returns the written value instead of buffering it, used to stream csv rows
+    """
+
+    def write(self, value: str) -> str:
+        return value
 
 
 def get_csv_headers() -> list[str]:
@@ -23,35 +44,359 @@ def get_csv_headers() -> list[str]:
     ]
 
 
-def csv_to_coffees(user: User, file: TextIOWrapper) -> list[Coffee]:
+def coffee_to_row(coffee: Coffee) -> list[str]:
+    """
+    Returns the values of the provided coffee in the order of the csv headers
+    """
+    return [
+        coffee.name,
+        coffee.country,
+        coffee.processing.name if coffee.processing else "",
+        coffee.roaster.name if coffee.roaster else "",
+        coffee.roasting_date.isoformat(),
+        "" if coffee.rating is None else str(coffee.rating),
+        coffee.variety or "",
+        ", ".join(coffee.tasting_notes_list),
+    ]
+
+
+def coffee_to_dict(coffee: Coffee) -> dict[str, Any]:
+    """
+    Returns the values of the provided coffee keyed by the csv headers, tasting notes are kept as a list
+    """
+    return {
+        "coffee_name": coffee.name,
+        "country": coffee.country,
+        "processing": coffee.processing.name if coffee.processing else None,
+        "roaster": coffee.roaster.name if coffee.roaster else None,
+        "roasting_date": coffee.roasting_date.isoformat(),
+        "rating": coffee.rating,
+        "variety": coffee.variety,
+        "tasting_notes": coffee.tasting_notes_list,
+    }
+
+
+def iter_coffees(user: User, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[Coffee]:
+    """
+    Yields all coffees of the user, with their processing, roaster and tasting notes loaded
+
+    The coffees are fetched in primary key ordered chunks, so memory usage doesn't depend on the
+    amount of coffees and every chunk only costs two queries.
+    """
+    tasting_notes = Prefetch("tasting_notes", queryset=TastingNote.objects.order_by("name"))
+    queryset = user.coffee_set.select_related("processing", "roaster").prefetch_related(tasting_notes).order_by("pk")
+    last_pk = 0
+
+    while chunk := list(queryset.filter(pk__gt=last_pk)[:chunk_size]):
+        yield from chunk
+        last_pk = chunk[-1].pk
+
+
+def coffees_to_csv(user: User) -> Iterator[str]:
+    """
+    Yields the csv lines, starting with the headers, for all coffees of the user
+    """
+    writer = csv.writer(Echo(), delimiter=";")
+    yield writer.writerow(get_csv_headers())
+
+    for coffee in iter_coffees(user):
+        yield writer.writerow(coffee_to_row(coffee))
+
+
+def coffees_to_ndjson(user: User) -> Iterator[str]:
+    """
+    Yields a newline delimited json line for every coffee of the user
+    """
+    for coffee in iter_coffees(user):
+        yield json.dumps(coffee_to_dict(coffee), ensure_ascii=False) + "\n"
+
+
+def iter_lines(file: BinaryIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yields the lines of a binary file, reading it in chunks of chunk_size bytes
+
+    The bytes are decoded as UTF-8 incrementally, so multibyte characters split over two chunks
+    are decoded correctly. A byte order mark is skipped and invalid bytes are replaced.
+    The line endings are kept, which the csv module needs for quoted fields with line breaks.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    remainder = ""
+
+    while data := file.read(chunk_size):
+        lines = (remainder + decoder.decode(data)).split("\n")
+        remainder = lines.pop()
+        yield from (line + "\n" for line in lines)
+
+    if remainder := remainder + decoder.decode(b"", final=True):
+        yield remainder
+
+
+def read_csv_rows(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """
+    Yields a dict for every row of the ;-delimited csv lines, keyed by the header row
+    """
+    return iter(csv.DictReader(lines, delimiter=";"))
+
+
+class InvalidRow(dict):
+    """
+    A row that couldn't be read, e.g. a line that isn't json, it is reported as a row with a validation error
+    """
+
+    def __init__(self, error: RowValidationError):
+        super().__init__()
+        self.error = error
+
+
+def parse_ndjson_line(line: str, row_number: int) -> dict[str, Any]:
+    """
+    Returns the json object of a line, or an InvalidRow when the line isn't a json object
+    """
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return InvalidRow(RowValidationError(f"invalid json in row {row_number}", row_number, "json"))
+
+    if not isinstance(row, dict):
+        return InvalidRow(RowValidationError(f"expected a json object in row {row_number}", row_number, "json"))
+
+    return row
+
+
+def read_ndjson_rows(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    """
+    Yields a dict for every newline delimited json line, blank lines are skipped
+
+    Lines that aren't a json object are yielded as an InvalidRow, so they fail like any other invalid row
+    and the rows after them are still imported.
+    """
+    for number, line in enumerate(line for line in lines if line.strip()):
+        yield parse_ndjson_line(line, number)
+
+
+ROW_READERS: dict[str, Callable[[Iterable[str]], Iterator[dict[str, Any]]]] = {
+    ImportJob.FileFormat.CSV: read_csv_rows,
+    ImportJob.FileFormat.NDJSON: read_ndjson_rows,
+}
+
+
+def read_rows(lines: Iterable[str], file_format: str = ImportJob.FileFormat.CSV) -> Iterator[dict[str, Any]]:
+    """
+    Yields the rows of the provided lines using the reader of the file format
+    """
+    if (reader := ROW_READERS.get(file_format)) is None:
+        raise ValueError(f"unsupported file format {file_format}")
+
+    return reader(lines)
+
+
+def iter_rows_to_coffees(
+    user: User, rows: Iterable[dict[str, Any]], chunk_size: int = IMPORT_CHUNK_SIZE
+) -> Iterator[list[Coffee]]:
+    """
+    Imports the provided rows chunk by chunk, yielding the coffees of every chunk
+
+    Only a single chunk of rows and coffees is kept in memory, so memory usage doesn't depend on the file size.
+    """
+    for chunk in chunk_rows(enumerate(rows), chunk_size):
+        yield import_chunk(user, chunk)
+
+
+def iter_csv_to_coffees(user: User, file: Iterable[str], chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[list[Coffee]]:
+    """
+    Imports the provided csv lines chunk by chunk, yielding the coffees of every chunk
+    """
+    return iter_rows_to_coffees(user, read_csv_rows(file), chunk_size)
+
+
+def iter_ndjson_to_coffees(user: User, file: Iterable[str], chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[list[Coffee]]:
+    """
+    Imports the provided newline delimited json lines chunk by chunk, yielding the coffees of every chunk
+    """
+    return iter_rows_to_coffees(user, read_ndjson_rows(file), chunk_size)
+
+
+def csv_to_coffees(user: User, file: Iterable[str], chunk_size: int = IMPORT_CHUNK_SIZE) -> list[Coffee]:
     """
     Create coffee objects from the provided csv file
+
+    The file is read in chunks of chunk_size rows, every chunk is validated completely
+    before it is written to the database with a fixed number of queries.
+    Use iter_csv_to_coffees for large files, this function keeps all coffees in memory.
+    """
+    return list(chain.from_iterable(iter_csv_to_coffees(user, file, chunk_size)))
+
+
+def import_chunk(user: User, chunk: list[tuple[int, dict[str, Any]]]) -> list[Coffee]:
+    """
+    Validates all (row number, row) pairs of the chunk and writes them in a single transaction
+
+    Rows that were imported before by the user are skipped, only the coffees of the new rows are returned.
+    """
+    rows = filter_imported_rows(user, [(number, clean_row(row, number)) for number, row in chunk])
+
+    with transaction.atomic():
+        return _write_rows(user, rows)
+
+
+def import_chunk_isolated(user: User, chunk: list[tuple[int, dict[str, Any]]]) -> dict[str, Any]:
+    """
+    Imports the valid rows of the chunk in a single transaction, without raising for invalid rows
+
+    The new rows are written in bulk inside a savepoint. When that fails, the savepoint is rolled back and
+    the rows are retried one by one in their own savepoint, so only the rows causing the error are lost.
+    Returns a report with the amount of committed, skipped and failed rows and the errors of the failed rows.
+    """
+    errors: list[dict[str, Any]] = []
+    valid_rows: list[tuple[int, dict[str, Any]]] = []
+
+    for number, row in chunk:
+        values, row_errors = get_row_values(row, number)
+
+        if row_errors:
+            errors.extend(error.as_dict() for error in row_errors)
+        else:
+            valid_rows.append((number, values))
+
+    return write_cleaned_rows(user, valid_rows, len(chunk), errors)
+
+
+def write_cleaned_rows(
+    user: User, valid_rows: list[tuple[int, dict[str, Any]]], rows_in_chunk: int, errors: list[dict[str, Any]]
+) -> dict[str, Any]:
     """
-    csv_reader = csv.DictReader(file, delimiter=";")
-    coffees: list[Coffee] = []
+    Writes the already validated (row number, values) pairs of a chunk, see import_chunk_isolated
 
-    # errors: list[Exception] = []
+    rows_in_chunk and errors include the rows that failed validation, they are used for the report.
+    """
+    rows_not_saved = 0
+
+    with transaction.atomic():
+        rows = filter_imported_rows(user, valid_rows)
+
+        try:
+            with transaction.atomic():
+                _write_rows(user, rows)
+        except DatabaseError:
+            for row_hash, (number, values) in rows.items():
+                try:
+                    with transaction.atomic():
+                        _write_rows(user, {row_hash: (number, values)})
+                except DatabaseError as e:
+                    rows_not_saved += 1
+                    errors.append({"row": number, "field": None, "message": f"could not save row {number}: {e}"})
+
+    return {
+        "rows": rows_in_chunk,
+        "committed": len(rows) - rows_not_saved,
+        "skipped": len(valid_rows) - len(rows),
+        "failed": rows_in_chunk - len(valid_rows) + rows_not_saved,
+        "errors": errors,
+    }
+
+
+def iter_import_results(
+    user: User, rows: Iterable[dict[str, Any]], chunk_size: int = IMPORT_CHUNK_SIZE
+) -> Iterator[dict[str, Any]]:
+    """
+    Imports the provided rows chunk by chunk with import_chunk_isolated, yielding the report of every chunk
+    """
+    for chunk in chunk_rows(enumerate(rows), chunk_size):
+        yield import_chunk_isolated(user, chunk)
 
-    for number, row in enumerate(csv_reader):
-        coffees.append(parse_row(user, row, number))
-        # try:
-        #     coffees.append(parse_row(user, row))
-        # except IntegrityError as e:
-        #     errors.append(e)
 
+def _write_rows(user: User, rows: dict[str, tuple[int, dict[str, Any]]]) -> list[Coffee]:
+    """
+    Creates the coffees for the provided hashed rows and stores their hashes with the coffee of the row
+    """
+    coffees = bulk_create_coffees(user, [values for _, values in rows.values()])
+    ImportedRow.objects.bulk_create(
+        [ImportedRow(user=user, coffee=coffee, row_hash=row_hash) for row_hash, coffee in zip(rows, coffees)],
+        ignore_conflicts=True,
+    )
     return coffees
 
 
+def get_file_hash(file) -> str:
+    """
+    Returns the sha256 hex digest of the contents of a django File
+    """
+    file_hash = hashlib.sha256()
+
+    for data in file.chunks():
+        file_hash.update(data)
+
+    return file_hash.hexdigest()
+
+
+def get_row_hash(values: dict[str, Any]) -> str:
+    """
+    Returns a fingerprint of the normalized values of a row, the order of the tasting notes is ignored
+    """
+    fields = [
+        values["name"],
+        values["country"],
+        values["processing"],
+        values["roaster"],
+        values["roasting_date"].isoformat(),
+        "" if values["rating"] is None else str(values["rating"]),
+        values["variety"] or "",
+        ",".join(sorted(values["tasting_notes"])),
+    ]
+    return hashlib.blake2b("\x1f".join(fields).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def filter_imported_rows(
+    user: User, rows: list[tuple[int, dict[str, Any]]]
+) -> dict[str, tuple[int, dict[str, Any]]]:
+    """
+    Returns the (row number, values) pairs keyed by the hash of the values, without the rows the user
+    already imported or duplicates within the rows
+
+    The already imported rows are looked up with a single query.
+    """
+    hashed_rows: dict[str, tuple[int, dict[str, Any]]] = {}
+
+    for number, values in rows:
+        hashed_rows.setdefault(get_row_hash(values), (number, values))
+
+    if not hashed_rows:
+        return hashed_rows
+
+    imported = ImportedRow.objects.filter(user=user, row_hash__in=hashed_rows).values_list("row_hash", flat=True)
+
+    for row_hash in imported:
+        del hashed_rows[row_hash]
+
+    return hashed_rows
+
+
+def chunk_rows(rows: Iterable[Any], chunk_size: int) -> Iterator[list[Any]]:
+    """
+    Yields lists of at most chunk_size items from the provided iterable
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    iterator = iter(rows)
+
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
 def _validate_row_property(row: dict[str, str], row_number: int, property_name: str) -> str:
     """
     Validates the given property name for the provided row.
     Returns the retrieved property value
-    If the property value is None or an empty string, it will raise a ValueError
+    If the property value is None, an empty string or not a string, it will raise a ValueError
     """
     value = row.get(property_name, None)
 
     if not value or value == "":
-        raise ValueError(f"{property_name} is a required field in row {row_number}")
+        raise RowValidationError(f"{property_name} is a required field in row {row_number}", row_number, property_name)
+
+    if not isinstance(value, str):
+        raise RowValidationError(f"{property_name} must be text in row {row_number}", row_number, property_name)
 
     return value
 
@@ -65,12 +410,160 @@ def _validate_row_datestr_property(row: dict[str, str], row_number: int, propert
 
     try:
         parse_roasting_date(value)
-    except ValueError as e:
-        raise ValueError(f"roasting_date is invalid in row {row_number}") from e
+    except (TypeError, ValueError) as e:
+        raise RowValidationError(f"roasting_date is invalid in row {row_number}", row_number, property_name) from e
+
+    return value
+
+
+def _validate_row_rating_property(row: dict[str, Any], row_number: int) -> Optional[int]:
+    """
+    Validates the optional rating property for the provided row.
+    Returns None if the rating is empty, raises a ValueError if it isn't a whole number
+    """
+    value = row.get("rating", None)
+
+    if value is None or value == "":
+        return None
+
+    # json rows can hold any type, int() would turn true into 1 and truncate 4.7 to 4
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise RowValidationError(f"rating is invalid in row {row_number}", row_number, "rating")
+
+    try:
+        return int(value)
+    except (TypeError, ValueError) as e:
+        raise RowValidationError(f"rating is invalid in row {row_number}", row_number, "rating") from e
+
+
+def _validate_row_optional_property(row: dict[str, Any], row_number: int, property_name: str) -> Optional[str]:
+    """
+    Validates the optional text property for the provided row.
+    Returns None if the property is empty, raises a ValueError if it isn't a string
+    """
+    if not (value := row.get(property_name, None)):
+        return None
+
+    if not isinstance(value, str):
+        raise RowValidationError(f"{property_name} must be text in row {row_number}", row_number, property_name)
 
     return value
 
 
+def _validate_row_tasting_notes_property(row: dict[str, Any], row_number: int) -> list[str]:
+    """
+    Validates the optional tasting notes of the provided row, a comma delimited string or a list of strings.
+    Returns the normalized tasting notes
+    """
+    value = row.get("tasting_notes", None)
+
+    if value and not (isinstance(value, str) or (isinstance(value, list) and all(isinstance(note, str) for note in value))):
+        raise RowValidationError(f"tasting_notes must be text in row {row_number}", row_number, "tasting_notes")
+
+    return get_tasting_notes(value)
+
+
+# (key, function) pairs used to turn a DictReader or json row into coffee values, every field can raise
+# a RowValidationError, the optional fields only when they have a value of the wrong type
+_VALIDATED_ROW_FIELDS: tuple[tuple[str, Callable[[dict[str, Any], int], Any]], ...] = (
+    ("name", lambda row, number: _validate_row_property(row, number, "coffee_name")),
+    ("processing", lambda row, number: _validate_row_property(row, number, "processing")),
+    ("roaster", lambda row, number: _validate_row_property(row, number, "roaster")),
+    ("roasting_date", lambda row, number: parse_roasting_date(_validate_row_datestr_property(row, number, "roasting_date"))),
+    ("rating", _validate_row_rating_property),
+    ("country", lambda row, number: _validate_row_optional_property(row, number, "country") or ""),
+    ("variety", lambda row, number: _validate_row_optional_property(row, number, "variety")),
+    ("tasting_notes", _validate_row_tasting_notes_property),
+)
+
+
+def get_row_values(row: dict[str, Any], row_number: int) -> tuple[dict[str, Any], list[RowValidationError]]:
+    """
+    Returns the normalized coffee values of a DictReader row together with all validation errors of the row
+    """
+    if isinstance(row, InvalidRow):
+        return {}, [row.error]
+
+    values: dict[str, Any] = {}
+    errors: list[RowValidationError] = []
+
+    for key, validate in _VALIDATED_ROW_FIELDS:
+        try:
+            values[key] = validate(row, row_number)
+        except RowValidationError as e:
+            errors.append(e)
+
+    return values, errors
+
+
+def get_row_errors(row: dict[str, Any], row_number: int) -> list[RowValidationError]:
+    """
+    Returns all validation errors of a DictReader or json row
+    """
+    if isinstance(row, InvalidRow):
+        return [row.error]
+
+    errors: list[RowValidationError] = []
+
+    for _, validate in _VALIDATED_ROW_FIELDS:
+        try:
+            validate(row, row_number)
+        except RowValidationError as e:
+            errors.append(e)
+
+    return errors
+
+
+def clean_row(row: dict[str, Any], row_number: int) -> dict[str, Any]:
+    """
+    Validates a DictReader row and returns the normalized coffee values, without touching the database
+    Raises the first validation error of the row
+    """
+    values, errors = get_row_values(row, row_number)
+
+    if errors:
+        raise errors[0]
+
+    return values
+
+
+def validate_rows(rows: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Validates every row without writing to the database
+
+    Returns a report with the amount of (valid) rows and the errors of all invalid rows.
+    When the file itself can't be read any further, its error is added and validation stops.
+    """
+    errors: list[dict[str, Any]] = []
+    rows_checked = invalid_rows = 0
+
+    try:
+        for number, row in enumerate(rows):
+            rows_checked += 1
+
+            if row_errors := get_row_errors(row, number):
+                invalid_rows += 1
+                errors.extend(error.as_dict() for error in row_errors)
+    except RowValidationError as e:
+        rows_checked += 1
+        invalid_rows += 1
+        errors.append(e.as_dict())
+
+    return {
+        "valid": invalid_rows == 0,
+        "rows": rows_checked,
+        "valid_rows": rows_checked - invalid_rows,
+        "errors": errors,
+    }
+
+
+def validate_csv(file: Iterable[str]) -> dict[str, Any]:
+    """
+    Validates every row of the provided csv file without writing to the database
+    """
+    return validate_rows(read_csv_rows(file))
+
+
 def parse_row(user: User, row: dict[str, Any], row_number) -> Coffee:
     """
     Parses a DictReader row and creates a coffee object for the provided user
@@ -103,24 +596,32 @@ def parse_row(user: User, row: dict[str, Any], row_number) -> Coffee:
     return coffee
 
 
+@lru_cache(maxsize=4096)
 def parse_roasting_date(roasting_date_str: str) -> date:
     """
     Parses roasting date from the provided date str
+
+    Imports usually contain a small set of distinct dates, so results are cached. The strict
+    YYYY-MM-DD layout is checked up front, which allows the faster date.fromisoformat.
     """
+    if len(roasting_date_str) != 10 or roasting_date_str[4] != "-" or roasting_date_str[7] != "-":
+        raise ValueError("expected date format to be YYYY-MM-DD")
+
     try:
-        return datetime.strptime(roasting_date_str, "%Y-%m-%d").date()
+        return date.fromisoformat(roasting_date_str)
     except ValueError as e:
         raise ValueError("expected date format to be YYYY-MM-DD") from e
 
 
-def get_tasting_notes(tasting_notes_str: str) -> list[str]:
+def get_tasting_notes(tasting_notes_str: Union[str, list[str], None]) -> list[str]:
     """
-    Retrieves a list of str from the comma delimited str value
+    Retrieves a list of str from the comma delimited str value, a list of notes is only normalized
     """
     if not tasting_notes_str:
         return []
 
-    return [note.strip(" ").lower().capitalize() for note in tasting_notes_str.split(",")]
+    notes = tasting_notes_str.split(",") if isinstance(tasting_notes_str, str) else tasting_notes_str
+    return [note.strip(" ").lower().capitalize() for note in notes]
 
 
 def add_tasting_notes_to_coffee(coffee: Coffee, tasting_notes: list[str]) -> None:
@@ -1,30 +1,91 @@
 import csv
-from io import TextIOWrapper
+from typing import Any
 
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.urls import reverse
 from django.views.generic import FormView
 
 from beans.apps.impex.forms import UploadFileForm
-from beans.apps.impex.utils import csv_to_coffees, get_csv_headers
+from beans.apps.impex.jobs import create_import_job, fail_stale_import_jobs
+from beans.apps.impex.models import ImportJob
+from beans.apps.impex.utils import (
+    coffees_to_csv,
+    coffees_to_ndjson,
+    get_csv_headers,
+    iter_lines,
+    read_rows,
+    validate_rows,
+)
 
 
 class UploadCsvView(LoginRequiredMixin, FormView):
     """
     In this view the user can upload csv files for import
+
+    The file is stored in an import job which is processed in the background, the user is sent to its status page
     """
 
     template_name = "upload_file.html"
     form_class = UploadFileForm
-    success_url = "/coffees"
 
     def form_valid(self, form: UploadFileForm):
-        self.process_data(form.cleaned_data)
+        if form.cleaned_data.get("dry_run"):
+            report = self.validate_data(form.cleaned_data)
+            return self.render_to_response(self.get_context_data(form=form, report=report))
+
+        self.job = self.process_data(form.cleaned_data)
+
+        if self.job.status == ImportJob.Status.DUPLICATE:
+            messages.warning(self.request, "This file was already imported, it will not be imported again")
+        else:
+            messages.info(self.request, f"Import of {self.job.file.name} started, your coffees will appear shortly")
+
         return super(UploadCsvView, self).form_valid(form)
 
-    def process_data(self, valid_data):
-        file = TextIOWrapper(valid_data["file"], encoding="ascii", errors="replace")
-        csv_to_coffees(self.request.user, file)
+    def get_success_url(self) -> str:
+        return reverse("import-job-status", args=[self.job.pk])
+
+    def validate_data(self, valid_data) -> dict[str, Any]:
+        file_format = valid_data.get("file_format", ImportJob.FileFormat.CSV)
+        return validate_rows(read_rows(iter_lines(valid_data["file"]), file_format))
+
+    def process_data(self, valid_data) -> ImportJob:
+        file_format = valid_data.get("file_format", ImportJob.FileFormat.CSV)
+        return create_import_job(self.request.user, valid_data["file"], file_format)
+
+
+@login_required(login_url="/login")
+def import_job_status_view(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Shows the status of an import job, as a page for browsers and as json otherwise
+    """
+    fail_stale_import_jobs(request.user)
+
+    try:
+        job = request.user.importjob_set.get(id=pk)
+    except ImportJob.DoesNotExist:
+        raise Http404("Import job does not exist or you do not have permission to view it")
+
+    if "text/html" in request.headers.get("Accept", ""):
+        return render(request, "import_job.html", context={"page": "upload", "job": job})
+
+    return JsonResponse(
+        {
+            "id": job.pk,
+            "status": job.status,
+            "rows_done": job.rows_done,
+            "rows_failed": job.rows_failed,
+            "rows_skipped": job.rows_skipped,
+            "rows_per_second": job.rows_per_second,
+            "error": job.error,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+    )
 
 
 def download_template_view(request: HttpRequest) -> HttpResponse:
@@ -38,3 +99,25 @@ def download_template_view(request: HttpRequest) -> HttpResponse:
     writer = csv.writer(response, delimiter=";")
     writer.writerow(get_csv_headers())
     return response
+
+
+EXPORT_FORMATS = {
+    ImportJob.FileFormat.CSV: (coffees_to_csv, "text/csv", "beans_export.csv"),
+    ImportJob.FileFormat.NDJSON: (coffees_to_ndjson, "application/x-ndjson", "beans_export.ndjson"),
+}
+
+
+@login_required(login_url="/login")
+def export_view(request: HttpRequest) -> StreamingHttpResponse:
+    try:
+        export, content_type, filename = EXPORT_FORMATS[request.GET.get("format", ImportJob.FileFormat.CSV)]
+    except KeyError:
+        raise Http404("Export format does not exist")
+
+    return StreamingHttpResponse(
+        export(request.user),
+        content_type=content_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+        },
+    )
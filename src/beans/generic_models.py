@@ -7,3 +7,27 @@ class TimeStampedModel(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+
+class LoadedValuesMixin:
+    """
+    Keeps the field values as they are in the database, so signal receivers can detect changed fields
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # deferred fields aren't in __dict__, they are skipped instead of loaded
+        attnames = [field.attname for field in self._meta.concrete_fields]
+        self._loaded_values = {attname: self.__dict__[attname] for attname in attnames if attname in self.__dict__}
+
+    def get_loaded_value(self, field: str, default=None):
+        """
+        Returns the value of the field when the instance was loaded or last saved, or the default for new instances
+        """
+        return getattr(self, "_loaded_values", {}).get(field, default)
@@ -86,7 +86,9 @@ MESSAGE_TAGS = {
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "beans.apps.coffee.api.authentication.BearerTokenAuthentication",
-    ]
+    ],
+    # Amount of trusted proxies in front of the app, X-Forwarded-For is ignored when 0 so clients can't pick their ip
+    "NUM_PROXIES": int(os.environ.get("NUM_PROXIES", 0)),
 }
 
 WSGI_APPLICATION = "beans.wsgi.application"
@@ -193,5 +195,50 @@ COUNTRIES_FILTER = [
     "ZW",
 ]
 
+# Amount of threads used to process csv import jobs in the web process,
+# set to 0 to process them with the process_import_jobs management command instead
+IMPEX_JOB_THREADS = int(os.environ.get("IMPEX_JOB_THREADS", 2))
+# Amount of rows that are committed in a single transaction by import jobs
+IMPEX_CHUNK_SIZE = int(os.environ.get("IMPEX_CHUNK_SIZE", 500))
+# Amount of processes used by import jobs to parse a file, 1 parses the file in the job's own process
+IMPEX_PARSE_WORKERS = int(os.environ.get("IMPEX_PARSE_WORKERS", 1))
+# Seconds a running import job may go without progress before it is marked as failed
+IMPEX_JOB_TIMEOUT = int(os.environ.get("IMPEX_JOB_TIMEOUT", 60 * 60))
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
+
+# Amount of coffees on a page of the coffee list
+COFFEE_LIST_PAGE_SIZE = int(os.environ.get("COFFEE_LIST_PAGE_SIZE", 50))
+# Default and maximum amount of items in a page of a cursor paginated api list
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", 100))
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", 1000))
+# Seconds before the start of a site stats refresh from which changed rows are processed again by the next refresh
+SITE_STATS_WATERMARK_OVERLAP = int(os.environ.get("SITE_STATS_WATERMARK_OVERLAP", 60))
+# Encode api lists with orjson when it is installed (pip install beans[fast-json])
+API_FAST_JSON = os.environ.get("API_FAST_JSON", "false").lower() == "true"
+# Seconds a delta sync token lies before the sync, changes of transactions that were still running are returned again
+SYNC_TOKEN_OVERLAP = int(os.environ.get("SYNC_TOKEN_OVERLAP", 60))
+# Days tombstones of deleted objects are kept, older sync tokens have to sync from scratch
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+# Amount of api tokens cached in every process and the seconds they stay cached, a ttl of 0 disables the in-process cache
+API_TOKEN_CACHE_SIZE = int(os.environ.get("API_TOKEN_CACHE_SIZE", 4096))
+API_TOKEN_CACHE_TTL = int(os.environ.get("API_TOKEN_CACHE_TTL", 60))
+# Alias of a django cache shared by all processes that backs the in-process token cache, e.g. "default"
+API_TOKEN_CACHE_ALIAS = os.environ.get("API_TOKEN_CACHE_ALIAS") or None
+# Token bucket throttles as "<requests>/<s, m, h or d>" per client ip and per account, an empty rate disables a throttle
+THROTTLE_RATES = {
+    "login_ip": os.environ.get("THROTTLE_LOGIN_IP", "30/m"),
+    "login_account": os.environ.get("THROTTLE_LOGIN_ACCOUNT", "10/m"),
+    "auth_ip": os.environ.get("THROTTLE_AUTH_IP", "30/m"),
+    "auth_account": os.environ.get("THROTTLE_AUTH_ACCOUNT", "10/m"),
+    "stats_ip": os.environ.get("THROTTLE_STATS_IP", "120/m"),
+}
+# Alias of a django cache shared by all processes to keep the throttle buckets in, local memory is used when unset
+THROTTLE_CACHE_ALIAS = os.environ.get("THROTTLE_CACHE_ALIAS") or None
+# Maximum amount of sub-requests in a request to the batch api
+API_MAX_BATCH_REQUESTS = int(os.environ.get("API_MAX_BATCH_REQUESTS", 10))
+# Route the auth, stats and coffee list api to their async views, for running on an asgi server (see the README)
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "0") == "1"
+# Threads that check passwords for the async token view
+ASYNC_PASSWORD_THREADS = int(os.environ.get("ASYNC_PASSWORD_THREADS", 4))
@@ -12,6 +12,7 @@ from faker import Faker
 from faker.providers import person
 
 from beans.apps.base.models import User
+from beans.apps.base.throttling import get_bucket_store
 from beans.apps.coffee.models import TastingNote
 from tests.factories.model_factories import UserFactory, ProcessingFactory, RoasterFactory, CoffeeFactory
 
@@ -31,6 +32,11 @@ def set_django_secret():
     os.environ["DJANGO_SECRET_KEY"] = "t0ps3cr3t-key"
 
 
+@pytest.fixture(autouse=True)
+def clear_throttle_buckets():
+    get_bucket_store().clear()
+
+
 @pytest.fixture()
 def setup_one_coffee():
     # TODO: merge with user_with_one_coffee
@@ -2,6 +2,7 @@ from beans.apps.base.templatetags.queryset_tags import (
     count_distinct_fields,
     get_most_common_origins,
     get_most_common_roasters,
+    user_stats,
 )
 
 from tests.factories.model_factories import UserFactory, CoffeeFactory, RoasterFactory
@@ -45,3 +46,9 @@ def test_get_most_common_roasters(db):
     assert query_set.count() == 2
     assert query_set[0] == {"count": 3, "name": "roaster A", "roaster__name": "roaster A"}
     assert query_set[1] == {"count": 2, "name": "roaster B", "roaster__name": "roaster B"}
+
+
+def test_user_stats(db, user_with_one_coffee):
+    stats = user_stats(user_with_one_coffee, 1)
+    assert (stats["total_coffees"], stats["total_origins"], stats["total_roasters"]) == (1, 1, 1)
+    assert len(stats["top_origins"]) == 1
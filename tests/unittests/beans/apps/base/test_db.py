@@ -0,0 +1,19 @@
+import threading
+
+from asgiref.sync import async_to_sync
+
+from beans.apps.base.db import run_queries_concurrently
+from beans.apps.base.models import User
+from tests.factories.model_factories import UserFactory
+
+
+def test_run_queries_concurrently(transactional_db):
+    UserFactory.create()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def count():
+        # both reads wait for each other, which only works when they run at the same time
+        barrier.wait()
+        return User.objects.count()
+
+    assert async_to_sync(run_queries_concurrently)(count, count) == [1, 1]
@@ -0,0 +1,143 @@
+from datetime import date, datetime, timezone
+
+import pytest
+
+from django.db.models import Q
+
+from beans.apps.base.pagination import (
+    decode_cursor,
+    decode_page_cursor,
+    encode_cursor,
+    get_keyset_filter,
+    InvalidCursor,
+    get_page_cursor,
+    paginate_queryset,
+    replace_query_param,
+)
+from beans.apps.coffee.models import Coffee
+from tests.factories.model_factories import CoffeeFactory, UserFactory
+
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor(["2022-03-23", 12])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == ["2022-03-23", 12]
+
+
+def test_cursor_keeps_microseconds():
+    updated_at = datetime(2022, 3, 23, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor([updated_at]), 1) == ["2022-03-23T12:00:00.123456+00:00"]
+
+
+def test_paginate_queryset_shared_updated_at(db):
+    user = UserFactory.create()
+    coffees = [CoffeeFactory.create(user=user, name=f"coffee {i}") for i in range(5)]
+    # bulk writes give many rows the same timestamp, with microseconds
+    Coffee.objects.filter(user=user).update(updated_at=datetime(2022, 3, 23, 12, 0, 0, 123456, tzinfo=timezone.utc))
+    ids, cursor = [], None
+
+    for _ in range(len(coffees)):
+        page, cursor = paginate_queryset(Coffee.objects.filter(user=user), ("updated_at", "id"), cursor, 2)
+        ids.extend(coffee.pk for coffee in page)
+
+        if cursor is None:
+            break
+
+    assert cursor is None
+    assert sorted(ids) == sorted(coffee.pk for coffee in coffees)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor([1]), encode_cursor({"a": 1})])
+def test_decode_cursor_invalid(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 2)
+
+
+def test_get_keyset_filter():
+    keyset_filter = get_keyset_filter(("roasting_date", "id"), ["2022-03-23", 12])
+    assert keyset_filter == Q(roasting_date__gte="2022-03-23") & (
+        Q(roasting_date__gt="2022-03-23") | Q(roasting_date="2022-03-23", id__gt=12)
+    )
+
+
+def test_get_keyset_filter_descending():
+    keyset_filter = get_keyset_filter(("-name", "-id"), ["b", 3])
+    assert keyset_filter == Q(name__lte="b") & (Q(name__lt="b") | Q(name="b", id__lt=3))
+
+
+def test_paginate_queryset_descending(db):
+    user = UserFactory.create()
+    coffees = [CoffeeFactory.create(user=user, name=name) for name in ["b", "a", "c", "b"]]
+
+    page, cursor = paginate_queryset(Coffee.objects.all(), ("-name", "-id"), None, 2)
+    assert page == [coffees[2], coffees[3]]
+
+    page, cursor = paginate_queryset(Coffee.objects.all(), ("-name", "-id"), cursor, 2)
+    assert page == [coffees[0], coffees[1]]
+    assert cursor is None
+
+
+def test_paginate_queryset(db):
+    user = UserFactory.create()
+    dates = ["2022-03-23", "2022-01-01", "2022-03-23", "2021-12-31", "2022-02-02"]
+    coffees = [CoffeeFactory.create(user=user, name=f"coffee {i}", roasting_date=date) for i, date in enumerate(dates)]
+    ordering = ("roasting_date", "id")
+
+    page, cursor = paginate_queryset(Coffee.objects.all(), ordering, None, 2)
+    assert page == [coffees[3], coffees[1]]
+
+    # rows inserted before the cursor don't shift the next pages
+    CoffeeFactory.create(user=user, name="early", roasting_date="2020-01-01")
+
+    page, cursor = paginate_queryset(Coffee.objects.all(), ordering, cursor, 2)
+    assert page == [coffees[4], coffees[0]]
+
+    page, cursor = paginate_queryset(Coffee.objects.all(), ordering, cursor, 2)
+    assert page == [coffees[2]]
+    assert cursor is None
+
+
+@pytest.mark.parametrize(
+    "url, value, expected",
+    [
+        ("/coffees/?q=kenya", "abc", "/coffees/?cursor=abc&q=kenya"),
+        ("/coffees/?cursor=abc&q=kenya", "def", "/coffees/?cursor=def&q=kenya"),
+        ("/coffees/?cursor=abc&q=kenya", None, "/coffees/?q=kenya"),
+        ("http://testserver/api/user/coffees/", "abc", "http://testserver/api/user/coffees/?cursor=abc"),
+    ],
+)
+def test_replace_query_param(url, value, expected):
+    assert replace_query_param(url, "cursor", value) == expected
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        ["2022-01-01", "abc"],
+        ["notadate", 1],
+        [{"a": 1}, 1],
+        [5, 1],
+        ["2022-01-01", None],
+        ["2022-01-01", 2**70],
+    ],
+)
+def test_paginate_queryset_invalid_cursor_values(db, values):
+    CoffeeFactory.create(user=UserFactory.create())
+
+    with pytest.raises(InvalidCursor):
+        paginate_queryset(Coffee.objects.all(), ("roasting_date", "id"), encode_cursor(["roasting_date,id", *values]), 2)
+
+
+def test_page_cursor_roundtrip(db):
+    coffee = CoffeeFactory.create(user=UserFactory.create(), roasting_date="2022-03-23")
+    cursor = get_page_cursor(("-roasting_date", "id"), coffee)
+
+    assert decode_page_cursor(Coffee, ("-roasting_date", "id"), cursor) == [date(2022, 3, 23), coffee.pk]
+
+
+@pytest.mark.parametrize("ordering", [("roasting_date", "id"), ("name", "id"), ("-roasting_date", "name", "id")])
+def test_decode_page_cursor_other_ordering(db, ordering):
+    coffee = CoffeeFactory.create(user=UserFactory.create())
+
+    with pytest.raises(InvalidCursor):
+        decode_page_cursor(Coffee, ordering, get_page_cursor(("-roasting_date", "id"), coffee))
@@ -0,0 +1,101 @@
+import pytest
+
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+
+from beans.apps.base.throttling import (
+    AuthTokenThrottle,
+    CacheBucketStore,
+    LocalMemoryBucketStore,
+    get_client_ip,
+    get_throttle_wait,
+    parse_rate,
+    take_token,
+)
+
+
+@pytest.mark.parametrize("rate, expected", [("10/s", (10, 10)), ("30/m", (30, 0.5)), ("36/hour", (36, 0.01))])
+def test_parse_rate(rate, expected):
+    assert parse_rate(rate) == expected
+
+
+def test_take_token():
+    state, wait = take_token(None, 2, 1, 100)
+    assert (state, wait) == ((1, 100), 0)
+
+    state, wait = take_token(state, 2, 1, 100)
+    assert (state, wait) == ((0, 100), 0)
+
+    state, wait = take_token(state, 2, 1, 100.25)
+    assert state == (0.25, 100.25)
+    assert wait == 0.75
+
+    # the bucket never holds more than its capacity
+    assert take_token(state, 2, 1, 200) == ((1, 200), 0)
+
+
+@pytest.mark.parametrize("store", [LocalMemoryBucketStore(), CacheBucketStore("default")])
+def test_bucket_store(store):
+    assert store.take("beans:throttle:test", 2, 0.01) == 0
+    assert store.take("beans:throttle:test", 2, 0.01) == 0
+    assert store.take("beans:throttle:test", 2, 0.01) > 0
+    assert store.take("beans:throttle:other", 2, 0.01) == 0
+
+
+def test_local_memory_bucket_store_max_buckets():
+    store = LocalMemoryBucketStore(max_buckets=1)
+    store.take("a", 1, 0.01)
+    store.take("b", 1, 0.01)
+
+    assert store.take("a", 1, 0.01) == 0
+
+
+def test_get_throttle_wait(rf, settings):
+    settings.THROTTLE_RATES = {"login_ip": "3/m", "login_account": "1/m"}
+    request = rf.post("/login/")
+
+    assert get_throttle_wait(request, "login", "a@example.com") == 0
+    assert get_throttle_wait(request, "login", "A@example.com") > 0
+    assert get_throttle_wait(request, "login", "b@example.com") == 0
+    assert get_throttle_wait(request, "login") > 0
+
+    # scopes without rates aren't throttled
+    assert get_throttle_wait(request, "stats") == 0
+
+
+def test_get_throttle_wait_cache_backend(rf, settings):
+    settings.THROTTLE_RATES = {"stats_ip": "1/m"}
+    settings.THROTTLE_CACHE_ALIAS = "default"
+
+    assert get_throttle_wait(rf.get("/api/stats/", REMOTE_ADDR="10.0.0.1"), "stats") == 0
+    assert get_throttle_wait(rf.get("/api/stats/", REMOTE_ADDR="10.0.0.1"), "stats") > 0
+    assert get_throttle_wait(rf.get("/api/stats/", REMOTE_ADDR="10.0.0.2"), "stats") == 0
+
+
+def test_get_throttle_wait_spoofed_forwarded_for(rf, settings):
+    settings.THROTTLE_RATES = {"stats_ip": "1/m"}
+
+    assert get_throttle_wait(rf.get("/api/stats/", HTTP_X_FORWARDED_FOR="1.1.1.1"), "stats") == 0
+    # a new X-Forwarded-For value doesn't give the client a new bucket
+    assert get_throttle_wait(rf.get("/api/stats/", HTTP_X_FORWARDED_FOR="2.2.2.2"), "stats") > 0
+
+
+def test_get_client_ip_trusted_proxies(rf, settings):
+    request = rf.get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.1.1.1, 2.2.2.2")
+    assert get_client_ip(request) == "10.0.0.1"
+
+    settings.REST_FRAMEWORK = dict(settings.REST_FRAMEWORK, NUM_PROXIES=1)
+    assert get_client_ip(request) == "2.2.2.2"
+
+
+def test_auth_token_throttle(api_rf, settings):
+    settings.THROTTLE_RATES = {"auth_account": "1/m"}
+    throttle = AuthTokenThrottle()
+
+    def request(email):
+        return Request(api_rf.post("/api/auth/", {"email": email}, format="json"), parsers=[JSONParser()])
+
+    assert throttle.allow_request(request("a@example.com"), None)
+    assert not throttle.allow_request(request("a@example.com"), None)
+    assert throttle.wait() > 0
+    assert throttle.allow_request(request(["not", "an", "email"]), None)
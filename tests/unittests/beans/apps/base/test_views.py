@@ -3,7 +3,9 @@ from django.shortcuts import render
 from pytest_mock import MockFixture
 
 from beans.apps.base.forms import RegistrationForm
-from beans.apps.base.views import home_view, login_view, logout_view, register_view
+from asgiref.sync import async_to_sync
+
+from beans.apps.base.views import async_home_view, home_view, login_view, logout_view, register_view
 
 
 def test_home_view(request_with_anonymous_user, mocker: MockFixture):
@@ -29,6 +31,26 @@ def test_home_view_logged_in_user(rf, user_with_one_coffee, mocker: MockFixture)
     mock_render.assert_called_with(request, "home.html", context=expected_context)
 
 
+def test_async_home_view(request_with_anonymous_user, mocker: MockFixture):
+    mock_render = mocker.patch("beans.apps.base.views.render", wraps=render)
+
+    response = async_to_sync(async_home_view)(request_with_anonymous_user)
+
+    assert response.status_code == 200
+    mock_render.assert_called_with(request_with_anonymous_user, "home.html", context={"page": "home"})
+
+
+def test_async_home_view_logged_in_user(rf, transactional_db, django_user_model):
+    user = django_user_model.objects.create(email="test@email.com", password="tops3cret")
+    request = rf.request()
+    request.user = user
+
+    response = async_to_sync(async_home_view)(request)
+
+    assert response.status_code == 200
+    assert b"No origins yet" in response.content
+
+
 def test_login_view(request_with_anonymous_user, mocker: MockFixture):
     mock_render = mocker.patch("beans.apps.base.views.render")
 
@@ -75,6 +97,24 @@ def test_login_view_post_form_invalid_user(rf, anonymous_user, mocker: MockFixtu
     mock_messages.error.assert_called_with(request, "Username or password incorrect")
 
 
+@pytest.mark.django_db
+def test_login_view_post_form_throttled(rf, anonymous_user, mocker: MockFixture, settings):
+    settings.THROTTLE_RATES = {"login_account": "1/m"}
+    mock_authenticate = mocker.patch("beans.apps.base.views.authenticate", return_value=None)
+    mocker.patch("beans.apps.base.views.messages")
+
+    def post():
+        request = rf.post("/login", data={"email": "test@email.com", "password": "tops3cret"})
+        request.user = anonymous_user
+        return login_view(request)
+
+    assert post().status_code == 200
+    response = post()
+    assert response.status_code == 429
+    assert response["Retry-After"] == "60"
+    assert mock_authenticate.call_count == 1
+
+
 @pytest.mark.django_db
 def test_login_view_already_authenticated(rf, mocker: MockFixture, logged_in_user):
     mock_redirect = mocker.patch("beans.apps.base.views.redirect")
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from asgiref.sync import async_to_sync
+from rest_framework.authtoken.models import Token
+
+from beans.apps.coffee.api.async_views import (
+    coffee_list_view,
+    obtain_auth_token_view,
+    public_stats_view,
+    user_stats_view,
+)
+from beans.apps.coffee.api.authentication import token_cache
+from beans.apps.coffee.stats import refresh_site_stats
+from tests.factories.model_factories import CoffeeFactory, RoasterFactory, UserFactory
+
+
+@pytest.fixture()
+def user_with_token(db):
+    token_cache.clear()
+    user = UserFactory.create()
+    roaster = RoasterFactory.create(user=user)
+    CoffeeFactory.create(user=user, roaster=roaster, country="Kenya")
+    return user, Token.objects.create(user=user)
+
+
+def _get(rf, view, url, token=None, **headers):
+    if token is not None:
+        headers["HTTP_AUTHORIZATION"] = f"Bearer {token.key}"
+
+    return async_to_sync(view)(rf.get(url, **headers))
+
+
+def test_coffee_list_view(rf, user_with_token):
+    user, token = user_with_token
+    response = _get(rf, coffee_list_view, "/api/user/coffees/?fields=name,roaster", token)
+
+    assert response.status_code == 200
+    assert json.loads(response.content) == [{"name": "A Coffee", "roaster": "A roaster"}]
+    assert _get(rf, coffee_list_view, "/api/user/coffees/", token, HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 304
+
+
+def test_coffee_list_view_msgpack(rf, user_with_token):
+    msgpack = pytest.importorskip("msgpack")
+    _, token = user_with_token
+    response = _get(rf, coffee_list_view, "/api/user/coffees/?fields=name", token, HTTP_ACCEPT="application/msgpack")
+
+    assert response["Content-Type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == [{"name": "A Coffee"}]
+
+
+def test_coffee_list_view_errors(rf, user_with_token):
+    _, token = user_with_token
+
+    response = _get(rf, coffee_list_view, "/api/user/coffees/")
+    assert response.status_code == 401
+    assert response["WWW-Authenticate"] == "Bearer"
+
+    response = _get(rf, coffee_list_view, "/api/user/coffees/?fields=password", token)
+    assert response.status_code == 400
+    assert json.loads(response.content) == {"detail": "unknown fields: password"}
+
+
+def test_coffee_list_view_post(rf, user_with_token):
+    _, token = user_with_token
+    request = rf.post("/api/user/coffees/", [], content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {token.key}")
+
+    assert async_to_sync(coffee_list_view)(request).status_code == 200
+
+
+def test_user_stats_view(rf, transactional_db):
+    token_cache.clear()
+    user = UserFactory.create()
+    CoffeeFactory.create(user=user, country="Kenya")
+    token = Token.objects.create(user=user)
+
+    # the first request builds the stats, the second one reads them concurrently
+    for _ in range(2):
+        data = json.loads(_get(rf, user_stats_view, "/api/user/stats/?limit=1", token).content)
+        assert data["total_coffees"] == 1
+        assert data["top_origins"] == [{"origin": "Kenya", "count": 1}]
+
+
+def test_public_stats_view(rf, transactional_db, settings):
+    settings.THROTTLE_RATES = {"stats_ip": "1/m"}
+    CoffeeFactory.create(user=UserFactory.create(), country="Kenya")
+    refresh_site_stats()
+
+    data = json.loads(_get(rf, public_stats_view, "/api/stats/").content)
+    assert data["total_coffees"] == 1
+    assert data["top_origins"] == [{"origin": "Kenya", "count": 1}]
+    assert _get(rf, public_stats_view, "/api/stats/").status_code == 429
+
+
+@pytest.mark.parametrize("password, status", [("tops3cret", 200), ("wrong", 400)])
+def test_obtain_auth_token_view(rf, db, password, status):
+    user = UserFactory.create()
+    user.set_password("tops3cret")
+    user.save()
+    data = json.dumps({"email": user.email, "password": password})
+
+    response = async_to_sync(obtain_auth_token_view)(rf.post("/api/auth/", data, content_type="application/json"))
+    assert response.status_code == status
+
+    if status == 200:
+        assert json.loads(response.content) == {"token": Token.objects.get(user=user).key}
+
+
+def test_obtain_auth_token_view_unknown_email(rf, db):
+    request = rf.post("/api/auth/", {"email": "nobody@example.com", "password": "tops3cret"})
+
+    assert async_to_sync(obtain_auth_token_view)(request).status_code == 400
@@ -1,6 +1,109 @@
-from beans.apps.coffee.api.authentication import BearerTokenAuthentication
+import pytest
+
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from beans.apps.base.models import User
+from beans.apps.coffee.api.authentication import BearerTokenAuthentication, TokenCache, token_cache
+from tests.factories.model_factories import UserFactory
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
 
 
 def test_bearer_token_authentication():
     auth = BearerTokenAuthentication()
     assert "Bearer" == auth.keyword
+
+
+def test_bearer_token_authentication_cached(db, django_assert_num_queries):
+    token = Token.objects.create(user=UserFactory.create())
+    auth = BearerTokenAuthentication()
+
+    with django_assert_num_queries(1):
+        assert auth.authenticate_credentials(token.key) == (token.user, token)
+
+    with django_assert_num_queries(0):
+        assert auth.authenticate_credentials(token.key) == (token.user, token)
+
+    assert token_cache.get_stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_bearer_token_authentication_cached_copies(db):
+    token = Token.objects.create(user=UserFactory.create())
+    auth = BearerTokenAuthentication()
+
+    user, _ = auth.authenticate_credentials(token.key)
+    user.request_attribute = "first request"
+    cached_user, cached_token = auth.authenticate_credentials(token.key)
+    cached_user.other_attribute = "second request"
+
+    assert cached_user == user and cached_user is not user
+    assert not hasattr(cached_user, "request_attribute")
+    assert not hasattr(auth.authenticate_credentials(token.key)[0], "other_attribute")
+    assert cached_token.user is cached_user
+
+
+def test_bearer_token_authentication_invalid(db):
+    with pytest.raises(AuthenticationFailed):
+        BearerTokenAuthentication().authenticate_credentials("nope")
+
+    assert token_cache.get_stats()["size"] == 0
+
+
+def test_token_cache_invalidated_on_delete(db):
+    token = Token.objects.create(user=UserFactory.create())
+    auth = BearerTokenAuthentication()
+    auth.authenticate_credentials(token.key)
+
+    token.delete()
+    with pytest.raises(AuthenticationFailed):
+        auth.authenticate_credentials(token.key)
+
+
+def test_token_cache_invalidated_on_deactivation(db):
+    user = UserFactory.create()
+    token = Token.objects.create(user=user)
+    auth = BearerTokenAuthentication()
+    auth.authenticate_credentials(token.key)
+
+    user.is_active = False
+    user.save()
+    with pytest.raises(AuthenticationFailed):
+        auth.authenticate_credentials(token.key)
+
+
+def _token(key):
+    return Token(key=key, user=User(email=f"{key}@example.com"))
+
+
+def test_token_cache_lru_and_ttl(settings):
+    settings.API_TOKEN_CACHE_SIZE = 2
+    cache = TokenCache()
+    cache.set("a", _token("a"))
+    cache.set("b", _token("b"))
+    cache.get("a")
+    cache.set("c", _token("c"))
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (_token("a"), _token("c"))
+
+    settings.API_TOKEN_CACHE_TTL = 0
+    cache.set("d", _token("d"))
+    assert cache.get("d") is None
+
+
+def test_token_cache_shared(settings):
+    settings.API_TOKEN_CACHE_ALIAS = "default"
+    cache, other_cache = TokenCache(), TokenCache()
+    cache.set("a", _token("a"))
+
+    assert other_cache.get("a") == _token("a")
+    assert other_cache.get_stats() == {"hits": 1, "misses": 0, "size": 1}
+
+    cache.invalidate(["a"])
+    assert TokenCache().get("a") is None
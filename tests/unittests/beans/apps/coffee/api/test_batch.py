@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from rest_framework.exceptions import ParseError
+
+from beans.apps.coffee.api.batch import combine_responses, get_batch_paths
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        {"requests": []},
+        {"requests": "/api/user/coffees/"},
+        {"requests": [{"path": "/api/user/coffees/"}] * 3},
+        {"requests": [{"path": 1}]},
+        {"requests": ["/api/user/coffees/"]},
+    ],
+)
+def test_get_batch_paths_invalid(data):
+    with pytest.raises(ParseError):
+        get_batch_paths(data, 2)
+
+
+def test_get_batch_paths():
+    data = {"requests": [{"path": "/api/user/coffees/"}, {"path": "/api/user/stats/?limit=3"}]}
+    assert get_batch_paths(data, 2) == ["/api/user/coffees/", "/api/user/stats/?limit=3"]
+
+
+def test_combine_responses():
+    content = combine_responses(["/a/", '/b/"'], [(200, b'[{"name":"x"}]'), (304, None)])
+    assert json.loads(content) == {
+        "responses": [
+            {"path": "/a/", "status": 200, "body": [{"name": "x"}]},
+            {"path": '/b/"', "status": 304, "body": None},
+        ]
+    }
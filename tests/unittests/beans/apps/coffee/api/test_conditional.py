@@ -0,0 +1,70 @@
+from django.http import HttpResponse
+
+from beans.apps.coffee.api.conditional import conditional_get, get_deletion_counters, get_validators
+from beans.apps.coffee.models import Coffee, DeletionCounter, Roaster
+from tests.factories.model_factories import CoffeeFactory, RoasterFactory, UserFactory
+
+
+def test_get_deletion_counters(db):
+    user = UserFactory.create()
+    DeletionCounter.objects.create(user=user, resource="coffee", count=3)
+
+    counters = get_deletion_counters(user, ["coffee", "roaster"])
+    assert {resource: counter.count for resource, counter in counters.items()} == {"coffee": 3, "roaster": 0}
+    assert DeletionCounter.objects.filter(user=user).count() == 2
+
+
+def test_get_validators_change(db):
+    user = UserFactory.create()
+    roaster = RoasterFactory.create(user=user)
+    coffee = CoffeeFactory.create(user=user, roaster=roaster)
+    etag, last_modified = get_validators(user, [Coffee, Roaster])
+
+    assert etag.startswith('"') and etag.endswith('"')
+    assert last_modified == coffee.updated_at
+    assert get_validators(user, [Coffee, Roaster]) == (etag, last_modified)
+
+    coffee.rating = 1
+    coffee.save()
+    updated_etag, last_modified = get_validators(user, [Coffee, Roaster])
+    assert updated_etag != etag
+    assert last_modified == coffee.updated_at
+
+    # deleting a roaster that isn't the most recently updated row doesn't change max(updated_at) of coffees
+    RoasterFactory.create(user=user, name="Another roaster").delete()
+    deleted_etag, last_modified = get_validators(user, [Coffee, Roaster])
+    assert deleted_etag not in (etag, updated_etag)
+    assert last_modified == DeletionCounter.objects.get(user=user, resource="roaster").updated_at
+
+
+def test_get_validators_scoped_to_user(db):
+    user, other_user = UserFactory.create(), UserFactory.create(email="other@example.com")
+    etag, _ = get_validators(user, [Coffee])
+
+    CoffeeFactory.create(user=other_user).delete()
+    assert get_validators(user, [Coffee]) == (etag, None)
+
+
+def test_conditional_get(db, rf):
+    user = UserFactory.create()
+    CoffeeFactory.create(user=user)
+    calls = []
+
+    def get_response():
+        calls.append(True)
+        return HttpResponse("data")
+
+    request = rf.get("/api/user/coffees/")
+    request.user = user
+    response = conditional_get(request, [Coffee], get_response)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    for header, value in [("HTTP_IF_NONE_MATCH", response["ETag"]), ("HTTP_IF_MODIFIED_SINCE", response["Last-Modified"])]:
+        request = rf.get("/api/user/coffees/", **{header: value})
+        request.user = user
+        not_modified = conditional_get(request, [Coffee], get_response)
+        assert not_modified.status_code == 304
+        assert not_modified["ETag"] == response["ETag"]
+
+    assert len(calls) == 1
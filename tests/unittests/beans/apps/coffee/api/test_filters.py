@@ -0,0 +1,85 @@
+from datetime import date
+
+import pytest
+
+from rest_framework.exceptions import ParseError
+
+from beans.apps.coffee.api.filters import filter_coffees, get_coffee_ordering
+from beans.apps.coffee.models import Coffee
+from tests.factories.model_factories import (
+    CoffeeFactory,
+    ProcessingFactory,
+    RoasterFactory,
+    TastingNoteFactory,
+    UserFactory,
+)
+
+
+@pytest.fixture()
+def coffees(db):
+    user = UserFactory.create()
+    roaster = RoasterFactory.create(user=user)
+    other_roaster = RoasterFactory.create(user=user, name="Other roaster")
+    processing = ProcessingFactory.create(user=user)
+    cherry = TastingNoteFactory.create(user=user, name="Cherry")
+    coffees = [
+        CoffeeFactory.create(user=user, name="a", country="Kenya", roaster=roaster, rating=5, roasting_date=date(2022, 1, 1)),
+        CoffeeFactory.create(
+            user=user, name="b", country="Kenya", roaster=other_roaster, rating=3, roasting_date=date(2022, 2, 1)
+        ),
+        CoffeeFactory.create(
+            user=user, name="c", country="Peru", processing=processing, rating=None, roasting_date=date(2022, 3, 1)
+        ),
+    ]
+    coffees[0].tasting_notes.add(cherry)
+    coffees[2].tasting_notes.add(cherry)
+    return coffees
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("", ["a", "b", "c"]),
+        ("?country=Kenya", ["a", "b"]),
+        ("?roaster=Other roaster", ["b"]),
+        ("?roaster=Unknown roaster", []),
+        ("?processing=Natural", ["c"]),
+        ("?rating_min=4", ["a"]),
+        ("?rating_min=3&rating_max=4", ["b"]),
+        ("?rating_max=3", ["b"]),
+        ("?roasted_after=2022-02-01", ["b", "c"]),
+        ("?roasted_after=2022-01-15&roasted_before=2022-02-15", ["b"]),
+        ("?tasting_note=Cherry", ["a", "c"]),
+        ("?tasting_note=Cherry&country=Kenya", ["a"]),
+    ],
+)
+def test_filter_coffees(rf, coffees, query, expected):
+    request = rf.get(f"/api/user/coffees/{query}")
+    request.user = coffees[0].user
+    queryset = filter_coffees(request, Coffee.objects.all())
+    assert sorted(queryset.values_list("name", flat=True)) == expected
+
+
+@pytest.mark.parametrize("query", ["?rating_min=6", "?rating_max=good", "?roasted_after=yesterday"])
+def test_filter_coffees_invalid(rf, query):
+    with pytest.raises(ParseError):
+        filter_coffees(rf.get(f"/api/user/coffees/{query}"), Coffee.objects.all())
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [("", None), ("?ordering=name", ("name", "id")), ("?ordering=-roasting_date", ("-roasting_date", "-id"))],
+)
+def test_get_coffee_ordering(rf, query, expected):
+    assert get_coffee_ordering(rf.get(f"/api/user/coffees/{query}")) == expected
+
+
+@pytest.mark.parametrize("query", ["?ordering=rating", "?ordering=--name", "?ordering=user"])
+def test_get_coffee_ordering_invalid(rf, query):
+    with pytest.raises(ParseError):
+        get_coffee_ordering(rf.get(f"/api/user/coffees/{query}"))
+
+
+def test_filter_coffees_single_rating_is_equality(rf, db):
+    queryset = filter_coffees(rf.get("/api/user/coffees/?rating_min=4&rating_max=4"), Coffee.objects.all())
+    assert '"rating" IN (4)' in str(queryset.query)
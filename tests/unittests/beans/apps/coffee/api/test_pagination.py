@@ -0,0 +1,33 @@
+import pytest
+
+from rest_framework.exceptions import NotFound
+
+from beans.apps.base.pagination import encode_cursor
+from beans.apps.coffee.api.pagination import decode_cursor, get_page_size, is_paginated, paginate_queryset
+from beans.apps.coffee.models import Coffee
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [("", False), ("?limit=5", False), ("?page_size=10", True), ("?cursor=abc", True)],
+)
+def test_is_paginated(rf, query, expected):
+    assert is_paginated(rf.get(f"/api/user/coffees/{query}")) is expected
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [("", 100), ("?page_size=10", 10), ("?page_size=5000", 1000), ("?page_size=0", 100), ("?page_size=ten", 100)],
+)
+def test_get_page_size(rf, query, expected):
+    assert get_page_size(rf.get(f"/api/user/coffees/{query}")) == expected
+
+
+def test_decode_cursor_invalid():
+    with pytest.raises(NotFound):
+        decode_cursor(encode_cursor([1]), 2)
+
+
+def test_paginate_queryset_invalid_cursor(db):
+    with pytest.raises(NotFound):
+        paginate_queryset(Coffee.objects.all(), ("roasting_date", "id"), "not a cursor", 2)
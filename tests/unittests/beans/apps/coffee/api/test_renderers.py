@@ -0,0 +1,44 @@
+import io
+from datetime import date
+
+import pytest
+
+from rest_framework.exceptions import ParseError
+
+from beans.apps.coffee.api.renderers import MessagePackParser, MessagePackRenderer, accepts_msgpack
+
+msgpack = pytest.importorskip("msgpack")
+
+
+def test_message_pack_renderer():
+    content = MessagePackRenderer().render({"name": "A Coffee", "roasting_date": date(2022, 3, 23)})
+
+    assert msgpack.unpackb(content) == {"name": "A Coffee", "roasting_date": "2022-03-23"}
+    assert MessagePackRenderer().render(None) == b""
+
+
+def test_message_pack_parser():
+    stream = io.BytesIO(msgpack.packb([{"name": "A Coffee", "rating": 4}]))
+
+    assert MessagePackParser().parse(stream) == [{"name": "A Coffee", "rating": 4}]
+
+
+def test_message_pack_parser_invalid():
+    with pytest.raises(ParseError):
+        MessagePackParser().parse(io.BytesIO(b"\xc1"))
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, False),
+        ("*/*", False),
+        ("application/json", False),
+        ("application/msgpack", True),
+        ("application/msgpack, */*", True),
+    ],
+)
+def test_accepts_msgpack(rf, accept, expected):
+    headers = {"HTTP_ACCEPT": accept} if accept else {}
+
+    assert accepts_msgpack(rf.get("/", **headers)) is expected
@@ -0,0 +1,51 @@
+from datetime import date
+
+import pytest
+
+from rest_framework.exceptions import ParseError
+
+from beans.apps.coffee.api.sparse import get_coffee_values, get_requested_fields, serialize_coffee_values
+from beans.apps.coffee.api.serializers import CoffeeSerializer
+from beans.apps.coffee.models import Coffee
+from tests.factories.model_factories import CoffeeFactory, RoasterFactory, TastingNoteFactory, UserFactory
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("", None),
+        ("?fields=", None),
+        ("?fields=name", ["name"]),
+        ("?fields=rating, name,rating", ["rating", "name"]),
+    ],
+)
+def test_get_requested_fields(rf, query, expected):
+    assert get_requested_fields(rf.get(f"/api/user/coffees/{query}"), CoffeeSerializer.Meta.fields) == expected
+
+
+def test_get_requested_fields_unknown(rf):
+    with pytest.raises(ParseError) as exc_info:
+        get_requested_fields(rf.get("/api/user/coffees/?fields=name,id,user"), CoffeeSerializer.Meta.fields)
+
+    assert str(exc_info.value.detail) == "unknown fields: id, user"
+
+
+def test_get_coffee_values(db):
+    queryset = get_coffee_values(Coffee.objects.all(), ["roaster", "name"], ("roasting_date", "id"))
+    sql = str(queryset.query)
+
+    assert "roaster" in sql and "rating" not in sql and "variety" not in sql
+
+
+def test_serialize_coffee_values(db, django_assert_num_queries):
+    user = UserFactory.create()
+    coffee = CoffeeFactory.create(user=user, roaster=RoasterFactory.create(user=user))
+    coffee.tasting_notes.add(*[TastingNoteFactory.create(user=user, name=name) for name in ["Lime", "Fig"]])
+    fields = ["tasting_notes", "roaster", "roasting_date"]
+
+    with django_assert_num_queries(2):
+        rows = list(get_coffee_values(user.coffee_set.all(), fields, ("id",)))
+        data = serialize_coffee_values(rows, fields)
+
+    assert data == [{"tasting_notes": ["Fig", "Lime"], "roaster": "A roaster", "roasting_date": date(2022, 3, 23)}]
+    assert list(data[0]) == fields
@@ -0,0 +1,97 @@
+from datetime import timedelta, timezone as dt_timezone
+
+import pytest
+
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.test import force_authenticate
+
+from beans.apps.base.pagination import encode_cursor
+from beans.apps.coffee.api.sync import SyncTokenExpired, decode_sync_token, encode_sync_token, get_changes
+from beans.apps.coffee.api.views import ChangesView
+from beans.apps.coffee.models import Coffee, Tombstone
+from tests.factories.model_factories import CoffeeFactory, RoasterFactory, TastingNoteFactory, UserFactory
+
+
+def test_sync_token():
+    moment = timezone.now() - timedelta(hours=1)
+    assert decode_sync_token(encode_sync_token(moment)) == moment
+
+
+@pytest.mark.parametrize("token", ["nope", "WzFd", "WyJub3QgYSBkYXRlIl0"])
+def test_decode_sync_token_invalid(token):
+    with pytest.raises(ParseError):
+        decode_sync_token(token)
+
+
+def test_decode_sync_token_naive():
+    moment = timezone.now().astimezone(dt_timezone.utc) - timedelta(hours=1)
+    token = encode_cursor([moment.replace(tzinfo=None).isoformat()])
+
+    assert decode_sync_token(token) == moment
+
+
+def test_changes_view_naive_token(db, api_rf):
+    naive_moment = (timezone.now() - timedelta(hours=1)).replace(tzinfo=None)
+    request = api_rf.get("/api/user/changes/", {"since": encode_cursor([naive_moment.isoformat()])})
+    force_authenticate(request, user=UserFactory.create())
+
+    assert ChangesView.as_view()(request).status_code == 200
+
+
+def test_decode_sync_token_expired(settings):
+    settings.SYNC_TOMBSTONE_RETENTION_DAYS = 1
+
+    with pytest.raises(SyncTokenExpired):
+        decode_sync_token(encode_sync_token(timezone.now() - timedelta(days=2)))
+
+
+def test_get_changes_without_token(db):
+    user = UserFactory.create()
+    roaster = RoasterFactory.create(user=user)
+    coffee = CoffeeFactory.create(user=user, roaster=roaster, country="Lesotho")
+    CoffeeFactory.create(user=UserFactory.create(email="other@example.com"))
+
+    changes = get_changes(user, None)
+    assert [row["id"] for row in changes["coffees"]] == [coffee.pk]
+    assert changes["coffees"][0]["roaster"] == "A roaster"
+    assert changes["roasters"] == [{"id": roaster.pk, "name": "A roaster", "country": "", "website": None}]
+    assert changes["processing"] == changes["tasting_notes"] == []
+    assert changes["deleted"] == {"coffees": [], "roasters": [], "processing": [], "tasting_notes": []}
+    assert changes["token"]
+
+
+def test_get_changes_since(db, settings, django_assert_num_queries):
+    settings.SYNC_TOKEN_OVERLAP = 0
+    user = UserFactory.create()
+    unchanged = CoffeeFactory.create(user=user, name="Unchanged")
+    changed = CoffeeFactory.create(user=user, name="Changed")
+    deleted = CoffeeFactory.create(user=user, name="Deleted")
+    since = decode_sync_token(get_changes(user, None)["token"])
+
+    Coffee.objects.filter(pk=unchanged.pk).update(updated_at=since - timedelta(seconds=1))
+    changed.tasting_notes.add(TastingNoteFactory.create(user=user, name="Cherry"))
+    deleted_pk = deleted.pk
+    deleted.delete()
+
+    # coffees and their tasting notes, roasters, processing, tasting notes and tombstones
+    with django_assert_num_queries(6):
+        changes = get_changes(user, since)
+
+    assert [row["name"] for row in changes["coffees"]] == ["Changed"]
+    assert changes["coffees"][0]["tasting_notes"] == ["Cherry"]
+    assert [row["name"] for row in changes["tasting_notes"]] == ["Cherry"]
+    assert changes["deleted"]["coffees"] == [deleted_pk]
+    assert decode_sync_token(changes["token"]) > since
+
+
+def test_get_changes_scoped_to_user(db):
+    user = UserFactory.create()
+    other_user = UserFactory.create(email="other@example.com")
+    since = timezone.now() - timedelta(minutes=1)
+    CoffeeFactory.create(user=other_user).delete()
+
+    changes = get_changes(user, since)
+    assert changes["coffees"] == []
+    assert changes["deleted"]["coffees"] == []
+    assert Tombstone.objects.filter(user=other_user).count() == 1
@@ -1,18 +1,57 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.test import force_authenticate
 
 from beans.apps.base.models import User
-from beans.apps.coffee.api.authentication import BearerTokenAuthentication
+from beans.apps.base.pagination import encode_cursor
+from beans.apps.coffee.api.authentication import BearerTokenAuthentication, token_cache
+from beans.apps.coffee.api.conditional import get_deletion_counters
+from beans.apps.coffee.models import Coffee, Processing, Roaster, TastingNote
+from beans.apps.coffee.stats import refresh_site_stats
+from tests.factories.model_factories import UserFactory
 
 from beans.apps.coffee.api.views import (
     AuthenticatedUserView,
+    BatchView,
+    ChangesView,
     CoffeeListView,
+    TokenCacheStatsView,
     RoasterListView,
     ProcessingListView,
     PublicStatsView,
     UserStatsView,
+    UserTimeseriesView,
+    MAX_UPSERT_ITEMS,
 )
 
 
+def _upsert(api_rf, user, data, method="post"):
+    request = getattr(api_rf, method)("/api/user/coffees/", data, format="json")
+    force_authenticate(request, user=user)
+    response = CoffeeListView.as_view()(request)
+    return response.status_code, json.loads(response.content)
+
+
+def _coffee_data(name="A Coffee", **kwargs):
+    data = {
+        "name": name,
+        "country": "Lesotho",
+        "processing": "Natural",
+        "roaster": "A roaster",
+        "roasting_date": "2022-03-23",
+        "rating": 4,
+        "variety": None,
+        "tasting_notes": ["Cherry"],
+    }
+    data.update(kwargs)
+    return data
+
+
 def test_authenticated_user_view():
     view = AuthenticatedUserView()
     assert view.authentication_classes == [BearerTokenAuthentication]
@@ -61,15 +100,41 @@ def test_public_stats_view(db, api_rf, setup_one_coffee):
     user = User.objects.first()
     request = api_rf.request()
     request.user = user
+    stats = refresh_site_stats()
 
     response = view.get(request)
     assert response.content == (
         b'{"total_coffees": 1, "total_origins": 1, "total_roasters": 1, "top_origins":'
         b' [{"origin": "Lesotho", "count": 1}], "top_roasters": [{"name": "A roaster",'
-        b' "count": 1}]}'
+        b' "count": 1}], "refreshed_at": "' + stats.refreshed_at.isoformat()[:23].encode() + b'Z"}'
     )
 
 
+def test_public_stats_view_throttled(db, api_rf, settings):
+    settings.THROTTLE_RATES = {"stats_ip": "1/m"}
+
+    assert PublicStatsView.as_view()(api_rf.get("/api/stats/")).status_code == 200
+    response = PublicStatsView.as_view()(api_rf.get("/api/stats/"))
+    assert response.status_code == 429
+    assert response["Retry-After"] == "60"
+
+
+def test_public_stats_view_not_refreshed(db, api_rf, django_assert_num_queries):
+    request = api_rf.get("/api/stats/?limit=ten")
+
+    with django_assert_num_queries(3):
+        response = PublicStatsView.as_view()(request)
+
+    assert json.loads(response.content) == {
+        "total_coffees": 0,
+        "total_origins": 0,
+        "total_roasters": 0,
+        "top_origins": [],
+        "top_roasters": [],
+        "refreshed_at": None,
+    }
+
+
 def test_user_stats_view(db, api_rf, setup_one_coffee):
     view = UserStatsView()
     user = User.objects.first()
@@ -82,3 +147,403 @@ def test_user_stats_view(db, api_rf, setup_one_coffee):
         b'"total_roasters": 1, "top_origins": [{"origin": "Lesotho", "count": 1}], '
         b'"top_roasters": [{"name": "A roaster", "count": 1}]}'
     )
+
+
+def test_coffee_list_view_upsert(db, api_rf, setup_one_coffee):
+    user = User.objects.first()
+    data = [
+        _coffee_data(rating=2, tasting_notes=["Cherry", "Lime"]),
+        _coffee_data("B Coffee", roaster="B roaster"),
+        _coffee_data("C Coffee", rating=9, roasting_date="yesterday"),
+    ]
+
+    status, results = _upsert(api_rf, user, data)
+    assert status == 200
+    assert [result["status"] for result in results] == ["updated", "created", "invalid"]
+    assert set(results[2]["errors"]) == {"rating", "roasting_date"}
+
+    updated = user.coffee_set.get(pk=results[0]["id"])
+    assert updated.rating == 2
+    assert sorted(updated.tasting_notes_list) == ["Cherry", "Lime"]
+    assert user.coffee_set.count() == 2
+    assert user.roaster_set.count() == 2
+
+
+def test_coffee_list_view_upsert_put_replaces_tasting_notes(db, api_rf, setup_one_coffee):
+    user = User.objects.first()
+    _upsert(api_rf, user, [_coffee_data(tasting_notes=["Cherry", "Lime"])])
+
+    status, results = _upsert(api_rf, user, [_coffee_data(tasting_notes=["Lime"])], method="put")
+    assert status == 200
+    assert results == [{"index": 0, "status": "updated", "id": results[0]["id"]}]
+    assert user.coffee_set.get().tasting_notes_list == ["Lime"]
+
+
+def test_coffee_list_view_upsert_is_scoped_to_user(db, api_rf, setup_one_coffee, user_with_one_coffee):
+    user = User.objects.first()
+    _upsert(api_rf, user_with_one_coffee, [_coffee_data()])
+
+    assert user.coffee_set.count() == 1
+    assert user.tastingnote_set.count() == 0
+
+
+def test_coffee_list_view_upsert_query_count(db, api_rf, django_assert_max_num_queries):
+    user = UserFactory.create()
+    _upsert(api_rf, user, [_coffee_data(f"coffee {i}") for i in range(10)])
+    data = [_coffee_data(f"coffee {i}", roaster=f"roaster {i}", tasting_notes=[f"note {i}"]) for i in range(200)]
+
+    with django_assert_max_num_queries(20):
+        status, results = _upsert(api_rf, user, data)
+
+    assert status == 200
+    assert {result["status"] for result in results} == {"created"}
+    assert user.coffee_set.count() == 210
+
+
+def test_coffee_list_view_upsert_bad_request(db, api_rf):
+    user = UserFactory.create()
+
+    assert _upsert(api_rf, user, _coffee_data()) == (400, {"detail": "expected a list of coffees"})
+    status, _ = _upsert(api_rf, user, [_coffee_data()] * (MAX_UPSERT_ITEMS + 1))
+    assert status == 400
+
+
+def test_coffee_list_view_paginated(db, api_rf):
+    user = UserFactory.create()
+    _upsert(api_rf, user, [_coffee_data(f"coffee {i}", roasting_date=f"2022-03-{i + 10}") for i in range(5)])
+    names = []
+    url = "/api/user/coffees/?page_size=2"
+
+    while url:
+        request = api_rf.get(url)
+        force_authenticate(request, user=user)
+        data = json.loads(CoffeeListView.as_view()(request).content)
+        assert len(data["results"]) <= 2
+        names.extend(coffee["name"] for coffee in data["results"])
+        url = data["next"]
+
+    assert names == [f"coffee {i}" for i in range(5)]
+
+
+@pytest.mark.parametrize("query", ["", "&ordering=roasting_date", "&ordering=-name"])
+def test_coffee_list_view_cursor_of_other_ordering(db, api_rf, query):
+    user = _create_coffees(3)
+    request = api_rf.get("/api/user/coffees/?page_size=1&ordering=name")
+    force_authenticate(request, user=user)
+    next_url = json.loads(CoffeeListView.as_view()(request).content)["next"]
+    cursor = parse_qs(urlsplit(next_url).query)["cursor"][0]
+
+    request = api_rf.get(f"/api/user/coffees/?page_size=1&cursor={cursor}{query}")
+    force_authenticate(request, user=user)
+    assert CoffeeListView.as_view()(request).status_code == 404
+
+    path = f"/api/user/coffees/?cursor={cursor}{query}"
+    request = api_rf.post("/api/batch/", {"requests": [{"path": path}]}, format="json")
+    force_authenticate(request, user=user)
+    assert json.loads(BatchView.as_view()(request).content)["responses"][0]["status"] == 404
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    ["invalid", encode_cursor(["name,id", "a roaster", "abc"]), encode_cursor(["name,id", {"a": 1}, 1])],
+)
+def test_roaster_list_view_invalid_cursor(db, api_rf, cursor):
+    user = UserFactory.create()
+    Roaster.objects.create(user=user, name="A roaster")
+    request = api_rf.get("/api/user/roasters/", {"cursor": cursor})
+    force_authenticate(request, user=user)
+
+    response = RoasterListView.as_view()(request)
+    assert response.status_code == 404
+
+
+def _create_coffees(amount):
+    user = UserFactory.create()
+    processing = Processing.objects.create(user=user, name="Natural")
+    roaster = Roaster.objects.create(user=user, name="A roaster")
+    tasting_note = TastingNote.objects.create(user=user, name="Cherry")
+    Coffee.objects.bulk_create(
+        [
+            Coffee(user=user, name=f"coffee {i}", processing=processing, roaster=roaster, roasting_date="2022-03-23")
+            for i in range(amount)
+        ]
+    )
+    through = Coffee.tasting_notes.through
+    through.objects.bulk_create(
+        [through(coffee_id=pk, tastingnote=tasting_note) for pk in user.coffee_set.values_list("pk", flat=True)]
+    )
+    return user
+
+
+@pytest.mark.parametrize("amount", [1, 100, 10_000])
+@pytest.mark.parametrize(
+    "view_class, url, queries",
+    [
+        (CoffeeListView, "/api/user/coffees/", 2),
+        (CoffeeListView, "/api/user/coffees/?page_size=50", 2),
+        (RoasterListView, "/api/user/roasters/", 1),
+        (ProcessingListView, "/api/user/processing/", 1),
+    ],
+)
+def test_list_view_query_count(db, api_rf, django_assert_num_queries, amount, view_class, url, queries):
+    user = _create_coffees(amount)
+    request = api_rf.get(url)
+    force_authenticate(request, user=user)
+    # the validators take one aggregate query per model and one query for the deletion counters
+    models = len(view_class.conditional_models)
+    get_deletion_counters(user, [model._meta.model_name for model in view_class.conditional_models])
+
+    with django_assert_num_queries(queries + models + 1):
+        response = view_class.as_view()(request)
+
+    assert response.status_code == 200
+    data = json.loads(response.content)
+    data = data["results"] if "results" in data else data
+
+    if view_class is CoffeeListView:
+        assert len(data) == min(amount, 50 if "page_size" in url else amount)
+        assert data[0]["tasting_notes"] == ["Cherry"]
+    else:
+        assert data[0]["coffees" if view_class is RoasterListView else "used"] == amount
+
+
+def test_coffee_list_view_not_modified(db, api_rf):
+    user = _create_coffees(3)
+
+    def get(**headers):
+        request = api_rf.get("/api/user/coffees/", **headers)
+        force_authenticate(request, user=user)
+        return CoffeeListView.as_view()(request)
+
+    etag = get()["ETag"]
+    assert get(HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    user.coffee_set.first().delete()
+    response = get(HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert len(json.loads(response.content)) == 2
+
+    roaster = user.roaster_set.get()
+    roaster.name = "Renamed"
+    roaster.save()
+    assert get(HTTP_IF_NONE_MATCH=response["ETag"]).status_code == 200
+
+
+def _get(api_rf, view_class, url, user):
+    request = api_rf.get(url)
+    force_authenticate(request, user=user)
+    return view_class.as_view()(request)
+
+
+def test_coffee_list_view_sparse_fields(db, api_rf, django_assert_num_queries):
+    user = _create_coffees(3)
+    get_deletion_counters(user, [model._meta.model_name for model in CoffeeListView.conditional_models])
+
+    with django_assert_num_queries(len(CoffeeListView.conditional_models) + 2):
+        response = _get(api_rf, CoffeeListView, "/api/user/coffees/?fields=name,roasting_date", user)
+
+    assert json.loads(response.content)[0] == {"name": "coffee 0", "roasting_date": "2022-03-23"}
+
+    response = _get(api_rf, CoffeeListView, "/api/user/coffees/?fields=roaster,tasting_notes&page_size=2", user)
+    data = json.loads(response.content)
+    assert data["results"] == [{"roaster": "A roaster", "tasting_notes": ["Cherry"]}] * 2
+
+    response = _get(api_rf, CoffeeListView, data["next"], user)
+    assert json.loads(response.content) == {"next": None, "results": [{"roaster": "A roaster", "tasting_notes": ["Cherry"]}]}
+
+
+def test_coffee_list_view_filtered_and_ordered(db, api_rf):
+    user = _create_coffees(5)
+    user.coffee_set.filter(name__in=["coffee 1", "coffee 3"]).update(country="Kenya")
+    url = "/api/user/coffees/?country=Kenya&ordering=-name"
+
+    data = json.loads(_get(api_rf, CoffeeListView, url, user).content)
+    assert [coffee["name"] for coffee in data] == ["coffee 3", "coffee 1"]
+
+    data = json.loads(_get(api_rf, CoffeeListView, f"{url}&fields=name&page_size=1", user).content)
+    assert data["results"] == [{"name": "coffee 3"}]
+
+    data = json.loads(_get(api_rf, CoffeeListView, data["next"], user).content)
+    assert data == {"next": None, "results": [{"name": "coffee 1"}]}
+
+    assert _get(api_rf, CoffeeListView, "/api/user/coffees/?ordering=password", user).status_code == 400
+
+
+def test_coffee_list_view_unknown_fields(db, api_rf):
+    response = _get(api_rf, CoffeeListView, "/api/user/coffees/?fields=name,password", UserFactory.create())
+
+    assert response.status_code == 400
+
+
+def test_coffee_list_view_fast_json(db, api_rf, settings):
+    user = _create_coffees(2)
+    expected = json.loads(_get(api_rf, CoffeeListView, "/api/user/coffees/", user).content)
+    settings.API_FAST_JSON = True
+
+    response = _get(api_rf, CoffeeListView, "/api/user/coffees/", user)
+    assert response["Content-Type"] == "application/json"
+    assert json.loads(response.content) == expected
+
+
+def test_coffee_list_view_msgpack(db, api_rf):
+    msgpack = pytest.importorskip("msgpack")
+    user = _create_coffees(2)
+    get_deletion_counters(user, [model._meta.model_name for model in CoffeeListView.conditional_models])
+    expected = json.loads(_get(api_rf, CoffeeListView, "/api/user/coffees/?page_size=1", user).content)
+    request = api_rf.get("/api/user/coffees/?page_size=1", HTTP_ACCEPT="application/msgpack")
+    force_authenticate(request, user=user)
+
+    response = CoffeeListView.as_view()(request)
+    assert response["Content-Type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == expected
+    assert "Accept" in response["Vary"]
+    # json and msgpack responses don't share an ETag
+    assert response["ETag"] != _get(api_rf, CoffeeListView, "/api/user/coffees/?page_size=1", user)["ETag"]
+
+
+def test_coffee_list_view_msgpack_upsert(db, api_rf):
+    msgpack = pytest.importorskip("msgpack")
+    user = UserFactory.create()
+    request = api_rf.post(
+        "/api/user/coffees/",
+        msgpack.packb([_coffee_data()]),
+        content_type="application/msgpack",
+        HTTP_ACCEPT="application/msgpack",
+    )
+    force_authenticate(request, user=user)
+
+    response = CoffeeListView.as_view()(request)
+    assert msgpack.unpackb(response.content) == [{"index": 0, "status": "created", "id": user.coffee_set.get().pk}]
+
+    request = api_rf.post("/api/user/coffees/", b"\xc1", content_type="application/msgpack")
+    force_authenticate(request, user=user)
+    assert CoffeeListView.as_view()(request).status_code == 400
+
+
+def test_stats_views_msgpack(db, api_rf):
+    msgpack = pytest.importorskip("msgpack")
+    user = _create_coffees(1)
+    refresh_site_stats(full=True)
+
+    for view_class, url in [(UserStatsView, "/api/user/stats/"), (PublicStatsView, "/api/stats/")]:
+        expected = json.loads(_get(api_rf, view_class, url, user).content)
+        request = api_rf.get(url, HTTP_ACCEPT="application/msgpack")
+        force_authenticate(request, user=user)
+
+        data = msgpack.unpackb(view_class.as_view()(request).content)
+        assert data["top_roasters"] == expected["top_roasters"] == [{"name": "A roaster", "count": 1}]
+
+
+def test_user_timeseries_view(db, api_rf):
+    user = _create_coffees(2)
+    url = "/api/user/stats/timeseries/?bucket=week&roasted_after=2022-03-14&roasted_before=2022-03-28&group_by=roaster"
+
+    response = _get(api_rf, UserTimeseriesView, url, user)
+    assert response.status_code == 200
+    assert json.loads(response.content) == {
+        "bucket": "week",
+        "metric": "count",
+        "group_by": "roaster",
+        "periods": ["2022-03-14", "2022-03-21", "2022-03-28"],
+        "series": [{"name": "A roaster", "values": [0, 2, 0]}],
+    }
+    assert _get(api_rf, UserTimeseriesView, "/api/user/stats/timeseries/?metric=avg_rating", user).status_code == 200
+
+
+def test_user_timeseries_view_last_supported_date(db, api_rf):
+    url = "/api/user/stats/timeseries/?bucket=week&roasted_after=9999-01-01&roasted_before=9999-12-31"
+
+    response = _get(api_rf, UserTimeseriesView, url, _create_coffees(1))
+    assert response.status_code == 200
+    assert len(json.loads(response.content)["periods"]) == 53
+
+
+@pytest.mark.parametrize(
+    "query", ["bucket=day", "metric=sum", "group_by=processing", "roasted_after=nope", "bucket=week&roasted_after=1900-01-01"]
+)
+def test_user_timeseries_view_invalid(db, api_rf, query):
+    response = _get(api_rf, UserTimeseriesView, f"/api/user/stats/timeseries/?{query}", _create_coffees(1))
+
+    assert response.status_code == 400
+
+
+def test_changes_view(db, api_rf):
+    user = _create_coffees(2)
+    data = json.loads(_get(api_rf, ChangesView, "/api/user/changes/", user).content)
+    assert len(data["coffees"]) == 2
+
+    deleted = user.coffee_set.first()
+    deleted_pk = deleted.pk
+    deleted.delete()
+
+    data = json.loads(_get(api_rf, ChangesView, f"/api/user/changes/?since={data['token']}", user).content)
+    assert data["deleted"]["coffees"] == [deleted_pk]
+
+
+def test_changes_view_invalid_token(db, api_rf):
+    assert _get(api_rf, ChangesView, "/api/user/changes/?since=nope", UserFactory.create()).status_code == 400
+
+
+def test_token_cache_stats_view(db, api_rf):
+    assert _get(api_rf, TokenCacheStatsView, "/api/auth/cache/", UserFactory.create()).status_code == 403
+
+    admin = UserFactory.create(email="admin@example.com", is_staff=True)
+    data = json.loads(_get(api_rf, TokenCacheStatsView, "/api/auth/cache/", admin).content)
+    assert data.keys() == {"hits", "misses", "size"}
+
+
+def test_batch_view(db, api_rf):
+    user = _create_coffees(2)
+    token = Token.objects.create(user=user)
+    token_cache.clear()
+    paths = ["/api/user/coffees/?page_size=1", "/api/user/roasters/", "/api/user/stats/?limit=1", "/api/stats/", "/nope/"]
+    request = api_rf.post(
+        "/api/batch/",
+        {"requests": [{"path": path} for path in paths]},
+        format="json",
+        HTTP_AUTHORIZATION=f"Bearer {token.key}",
+        HTTP_IF_NONE_MATCH="*",
+    )
+
+    response = BatchView.as_view()(request)
+    responses = json.loads(response.content)["responses"]
+    assert [item["status"] for item in responses] == [200, 200, 200, 404, 404]
+    assert [item["path"] for item in responses] == paths
+    assert len(responses[0]["body"]["results"]) == 1
+    assert responses[0]["body"]["next"].startswith("http://testserver/api/user/coffees/?cursor=")
+    assert responses[1]["body"][0]["name"] == "A roaster"
+    assert responses[2]["body"]["total_coffees"] == 2
+    # the token is authenticated once for the whole batch
+    assert token_cache.get_stats()["misses"] == 1
+
+
+def test_batch_view_sub_request_error(db, api_rf):
+    request = api_rf.post("/api/batch/", {"requests": [{"path": "/api/user/coffees/?fields=password"}]}, format="json")
+    force_authenticate(request, user=UserFactory.create())
+
+    responses = json.loads(BatchView.as_view()(request).content)["responses"]
+    assert responses[0]["status"] == 400
+    assert responses[0]["body"] == {"detail": "unknown fields: password"}
+
+
+def test_batch_view_msgpack(db, api_rf):
+    msgpack = pytest.importorskip("msgpack")
+    user = _create_coffees(1)
+    request = api_rf.post(
+        "/api/batch/",
+        msgpack.packb({"requests": [{"path": "/api/user/roasters/"}, {"path": "/nope/"}]}),
+        content_type="application/msgpack",
+        HTTP_ACCEPT="application/msgpack",
+    )
+    force_authenticate(request, user=user)
+
+    responses = msgpack.unpackb(BatchView.as_view()(request).content)["responses"]
+    assert [item["status"] for item in responses] == [200, 404]
+    assert responses[0]["body"][0]["name"] == "A roaster"
+
+
+def test_batch_view_bad_request(db, api_rf):
+    request = api_rf.post("/api/batch/", {"requests": []}, format="json")
+    force_authenticate(request, user=UserFactory.create())
+
+    assert BatchView.as_view()(request).status_code == 400
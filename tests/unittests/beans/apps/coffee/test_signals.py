@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from beans.apps.coffee.models import Coffee, DeletionCounter, Tombstone
+from tests.factories.model_factories import CoffeeFactory, RoasterFactory, TastingNoteFactory, UserFactory
+
+
+def test_increment_deletion_counter(db):
+    user = UserFactory.create()
+    counter = DeletionCounter.objects.create(user=user, resource="coffee")
+    CoffeeFactory.create(user=user).delete()
+    CoffeeFactory.create(user=user).delete()
+
+    counter.refresh_from_db()
+    assert counter.count == 2
+    assert not DeletionCounter.objects.filter(resource="roaster").exists()
+
+
+def test_increment_deletion_counter_user_deleted(db):
+    user = UserFactory.create()
+    DeletionCounter.objects.create(user=user, resource="coffee")
+    CoffeeFactory.create(user=user)
+
+    user.delete()
+    assert not DeletionCounter.objects.exists()
+
+
+def test_create_tombstone(db):
+    user = UserFactory.create()
+    roaster = RoasterFactory.create(user=user)
+    coffee = CoffeeFactory.create(user=user, roaster=roaster)
+    roaster_pk = roaster.pk
+
+    roaster.delete()
+    assert list(Tombstone.objects.filter(user=user).values_list("resource", "object_id")) == [("roaster", roaster_pk)]
+
+    coffee_pk = coffee.pk
+    coffee.delete()
+    assert Tombstone.objects.filter(user=user, resource="coffee", object_id=coffee_pk).exists()
+
+
+def test_create_tombstone_user_deleted(db):
+    user = UserFactory.create()
+    CoffeeFactory.create(user=user)
+
+    user.delete()
+    assert not Tombstone.objects.exists()
+
+
+def test_touch_coffee(db):
+    user = UserFactory.create()
+    coffee = CoffeeFactory.create(user=user)
+    tasting_note = TastingNoteFactory.create(user=user, name="Cherry")
+
+    def touch():
+        past = coffee.updated_at - timedelta(days=1)
+        Coffee.objects.filter(pk=coffee.pk).update(updated_at=past)
+        return past
+
+    past = touch()
+    coffee.tasting_notes.add(tasting_note)
+    assert Coffee.objects.get(pk=coffee.pk).updated_at > past
+
+    past = touch()
+    tasting_note.coffee_set.remove(coffee)
+    assert Coffee.objects.get(pk=coffee.pk).updated_at > past
+
+    tasting_note.coffee_set.add(coffee)
+    past = touch()
+    tasting_note.coffee_set.clear()
+    assert Coffee.objects.get(pk=coffee.pk).updated_at > past
+
+
+def test_touch_related_coffees(db):
+    user = UserFactory.create()
+    roaster = RoasterFactory.create(user=user)
+    coffee = CoffeeFactory.create(user=user, roaster=roaster)
+    past = coffee.updated_at - timedelta(days=1)
+    Coffee.objects.filter(pk=coffee.pk).update(updated_at=past)
+
+    roaster.delete()
+    coffee = Coffee.objects.get(pk=coffee.pk)
+    assert coffee.roaster is None
+    assert coffee.updated_at > past
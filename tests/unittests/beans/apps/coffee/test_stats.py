@@ -0,0 +1,244 @@
+from datetime import date
+
+import pytest
+
+from django.core.management import call_command
+
+from beans.apps.coffee.models import (
+    Coffee,
+    SiteStats,
+    SiteStatsStaleKey,
+    UserOriginCount,
+    UserRoasterCount,
+    UserStats,
+)
+from beans.apps.coffee.stats import get_site_stats, get_timeseries, get_user_stats, refresh_site_stats
+from beans.apps.impex.bulk import bulk_create_coffees
+from tests.factories.model_factories import CoffeeFactory, RoasterFactory, UserFactory
+
+
+def _create_coffee(user, name, country, roaster):
+    return CoffeeFactory.create(user=user, name=name, country=country, roaster=roaster)
+
+
+def _top(limit=5):
+    stats = get_site_stats(limit)
+    return stats["top_origins"], stats["top_roasters"]
+
+
+def test_refresh_site_stats_full(db):
+    user, other_user = UserFactory.create(), UserFactory.create(email="other@example.com")
+    roaster, other_roaster = RoasterFactory.create(user=user), RoasterFactory.create(user=other_user)
+    _create_coffee(user, "A", "Kenya", roaster)
+    _create_coffee(user, "B", "Kenya", roaster)
+    _create_coffee(other_user, "C", "Peru", other_roaster)
+
+    stats = refresh_site_stats()
+    assert (stats.total_coffees, stats.total_origins, stats.total_roasters) == (3, 2, 2)
+    assert stats.watermark < stats.refreshed_at
+    assert _top() == (
+        [{"origin": "Kenya", "count": 2}, {"origin": "Peru", "count": 1}],
+        [{"name": "A roaster", "count": 3}],
+    )
+    assert _top(limit=1)[0] == [{"origin": "Kenya", "count": 2}]
+
+
+def test_refresh_site_stats_incremental(db, settings):
+    user = UserFactory.create()
+    roaster = RoasterFactory.create(user=user)
+    _create_coffee(user, "A", "Kenya", roaster)
+    changed = _create_coffee(user, "B", "Kenya", roaster)
+    deleted = _create_coffee(user, "C", "Peru", roaster)
+    refresh_site_stats()
+
+    # rows created with bulk_create don't send signals, they are found by their updated_at
+    Coffee.objects.bulk_create([Coffee(user=user, name="D", country="Brazil", roaster=roaster, roasting_date="2022-03-23")])
+    changed = Coffee.objects.get(pk=changed.pk)
+    changed.country = "Burundi"
+    changed.save()
+    deleted.delete()
+    assert SiteStatsStaleKey.objects.count() == 3
+
+    stats = refresh_site_stats()
+    assert (stats.total_coffees, stats.total_origins, stats.total_roasters) == (3, 3, 1)
+    assert _top() == (
+        [{"origin": "Brazil", "count": 1}, {"origin": "Burundi", "count": 1}, {"origin": "Kenya", "count": 1}],
+        [{"name": "A roaster", "count": 3}],
+    )
+    assert not SiteStatsStaleKey.objects.exists()
+
+
+def test_refresh_site_stats_roaster_changes(db):
+    user = UserFactory.create()
+    roaster, deleted_roaster = RoasterFactory.create(user=user), RoasterFactory.create(user=user, name="Gone")
+    _create_coffee(user, "A", "Kenya", roaster)
+    _create_coffee(user, "B", "Kenya", deleted_roaster)
+    refresh_site_stats()
+
+    roaster = type(roaster).objects.get(pk=roaster.pk)
+    roaster.name = "Renamed"
+    roaster.save()
+    deleted_roaster.delete()
+
+    refresh_site_stats()
+    assert _top()[1] == [{"name": "Renamed", "count": 1}]
+    assert SiteStats.objects.get().total_roasters == 1
+
+
+def test_refresh_site_stats_command(db):
+    user = UserFactory.create()
+    _create_coffee(user, "A", "Kenya", RoasterFactory.create(user=user))
+
+    call_command("refresh_site_stats", "--full")
+    assert SiteStats.objects.get().total_coffees == 1
+
+
+def _user_stats(user):
+    stats = get_user_stats(user, 5)
+    return stats["total_coffees"], stats["total_origins"], stats["total_roasters"], stats["top_origins"], stats["top_roasters"]
+
+
+def test_get_user_stats_builds_stats(db, user_with_one_coffee):
+    assert not UserStats.objects.exists()
+    assert _user_stats(user_with_one_coffee)[:3] == (1, 1, 1)
+    assert UserStats.objects.get().rebuilt_at is not None
+
+
+def test_user_stats_updated_on_write(db):
+    user = UserFactory.create()
+    roaster = RoasterFactory.create(user=user)
+    get_user_stats(user, 5)
+
+    coffee = _create_coffee(user, "A", "Kenya", roaster)
+    _create_coffee(user, "B", "Kenya", roaster)
+    other_roaster = RoasterFactory.create(user=user, name="B roaster")
+    assert _user_stats(user) == (2, 1, 2, [{"origin": "Kenya", "count": 2}], [{"name": "A roaster", "count": 2}])
+
+    coffee = Coffee.objects.get(pk=coffee.pk)
+    coffee.country = "Peru"
+    coffee.roaster = other_roaster
+    coffee.save()
+    # saving again without changes doesn't move the counts twice
+    coffee.save()
+    assert _user_stats(user) == (
+        2,
+        2,
+        2,
+        [{"origin": "Kenya", "count": 1}, {"origin": "Peru", "count": 1}],
+        [{"name": "A roaster", "count": 1}, {"name": "B roaster", "count": 1}],
+    )
+
+    coffee.delete()
+    other_roaster.delete()
+    assert _user_stats(user) == (1, 1, 1, [{"origin": "Kenya", "count": 1}], [{"name": "A roaster", "count": 1}])
+    assert UserOriginCount.objects.count() == 1
+    assert UserRoasterCount.objects.count() == 1
+
+
+def test_user_stats_updated_on_bulk_import(db):
+    user = UserFactory.create()
+    get_user_stats(user, 5)
+    row = {"processing": "Natural", "roasting_date": date(2022, 3, 23), "rating": 4, "variety": None, "tasting_notes": []}
+
+    bulk_create_coffees(
+        user,
+        [
+            {**row, "name": "A", "country": "Kenya", "roaster": "A roaster"},
+            {**row, "name": "B", "country": "Peru", "roaster": "A roaster"},
+            {**row, "name": "A", "country": "Kenya", "roaster": "A roaster"},
+        ],
+    )
+    assert _user_stats(user) == (
+        2,
+        2,
+        1,
+        [{"origin": "Kenya", "count": 1}, {"origin": "Peru", "count": 1}],
+        [{"name": "A roaster", "count": 2}],
+    )
+
+
+def test_rebuild_user_stats_command(db, user_with_one_coffee, secondary_user_with_one_coffee):
+    get_user_stats(user_with_one_coffee, 5)
+    UserStats.objects.update(total_coffees=10)
+    UserOriginCount.objects.all().delete()
+
+    call_command("rebuild_user_stats", user_with_one_coffee.email)
+    assert _user_stats(user_with_one_coffee)[:3] == (1, 1, 1)
+    assert not UserStats.objects.filter(user=secondary_user_with_one_coffee).exists()
+
+    call_command("rebuild_user_stats")
+    assert UserStats.objects.count() == 2
+
+
+def _create_dated_coffees(user):
+    roaster = RoasterFactory.create(user=user, name="A roaster")
+    coffees = [
+        ("A", "Kenya", date(2022, 1, 3), 4),
+        ("B", "Kenya", date(2022, 1, 31), 2),
+        ("C", "Peru", date(2022, 3, 15), None),
+        ("D", "Peru", date(2022, 3, 16), 5),
+        ("E", "Brazil", date(2022, 3, 17), 1),
+    ]
+
+    for name, country, roasting_date, rating in coffees:
+        CoffeeFactory.create(
+            user=user, name=name, country=country, roaster=roaster, roasting_date=roasting_date, rating=rating
+        )
+
+
+def test_get_timeseries_month(db, django_assert_num_queries):
+    user = UserFactory.create()
+    _create_dated_coffees(user)
+
+    with django_assert_num_queries(1):
+        timeseries = get_timeseries(user.coffee_set.all(), "month", "count")
+
+    assert timeseries["periods"] == ["2022-01-01", "2022-02-01", "2022-03-01"]
+    assert timeseries["series"] == [{"name": "all", "values": [2, 0, 3]}]
+
+    timeseries = get_timeseries(user.coffee_set.all(), "month", "avg_rating")
+    assert timeseries["series"] == [{"name": "all", "values": [3, None, 3]}]
+
+
+def test_get_timeseries_week(db):
+    user = UserFactory.create()
+    _create_dated_coffees(user)
+
+    timeseries = get_timeseries(user.coffee_set.all(), "week", "count", first=date(2021, 12, 29), last=date(2022, 1, 12))
+
+    # weeks start on monday, the range is extended to whole weeks
+    assert timeseries["periods"] == ["2021-12-27", "2022-01-03", "2022-01-10"]
+    assert timeseries["series"] == [{"name": "all", "values": [0, 1, 0]}]
+
+
+@pytest.mark.parametrize(["bucket", "expected"], [("week", "9999-12-27"), ("month", "9999-12-01")])
+def test_get_timeseries_last_supported_date(db, bucket, expected):
+    user = UserFactory.create()
+
+    timeseries = get_timeseries(user.coffee_set.all(), bucket, "count", first=date(9999, 11, 1), last=date.max)
+
+    # the bucket after the one of date.max can't be represented, the series ends with the bucket of date.max
+    assert timeseries["periods"][-1] == expected
+
+
+def test_get_timeseries_grouped(db):
+    user = UserFactory.create()
+    _create_dated_coffees(user)
+
+    timeseries = get_timeseries(user.coffee_set.all(), "month", "avg_rating", group_by="origin", limit=2)
+    assert timeseries["series"] == [
+        {"name": "Kenya", "values": [3, None, None]},
+        {"name": "Peru", "values": [None, None, 5]},
+    ]
+
+    timeseries = get_timeseries(user.coffee_set.all(), "month", "count", group_by="roaster")
+    assert timeseries["series"] == [{"name": "A roaster", "values": [2, 0, 3]}]
+
+
+def test_get_timeseries_empty(db):
+    user = UserFactory.create()
+
+    assert get_timeseries(user.coffee_set.all(), "week", "count")["series"] == [{"name": "all", "values": []}]
+
+    with pytest.raises(ValueError):
+        get_timeseries(user.coffee_set.all(), "week", "count", first=date(2000, 1, 1), last=date(2022, 1, 1))
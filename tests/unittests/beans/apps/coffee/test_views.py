@@ -1,10 +1,14 @@
 import datetime
+import html
+import re
 
 import pytest
+from django.core.exceptions import BadRequest
 from django.http import Http404
 from django.shortcuts import render, redirect
 from pytest_mock import MockFixture
 
+from beans.apps.base.pagination import encode_cursor
 from beans.apps.coffee.exceptions import CoffeeException
 from beans.apps.coffee.forms import AddCoffeeForm
 from beans.apps.coffee.models import Coffee
@@ -91,7 +95,8 @@ def test_coffee_list_view(rf, user_with_one_coffee, mocker: MockFixture):
     # Doing it this way to be able to compare the coffee list
     assert mock_render.mock_calls[0].kwargs["context"]["page"] == "coffee-list"
     assert mock_render.mock_calls[0].kwargs["context"]["query"] is None
-    assert mock_render.mock_calls[0].kwargs["context"]["coffee_list"].count() == user_with_one_coffee.coffee_set.count()
+    assert len(mock_render.mock_calls[0].kwargs["context"]["coffee_list"]) == user_with_one_coffee.coffee_set.count()
+    assert mock_render.mock_calls[0].kwargs["context"]["next_url"] is None
 
 
 @pytest.mark.django_db
@@ -126,7 +131,59 @@ def test_coffee_list_view_with_query(client, rf, django_user_model, mocker: Mock
     # Doing it this way to be able to compare the coffee list
     assert mock_render.mock_calls[0].kwargs["context"]["page"] == "coffee-list"
     assert mock_render.mock_calls[0].kwargs["context"]["query"] == "Ethiopia"
-    assert mock_render.mock_calls[0].kwargs["context"]["coffee_list"].count() == 1
+    assert len(mock_render.mock_calls[0].kwargs["context"]["coffee_list"]) == 1
+
+
+@pytest.mark.django_db
+def test_coffee_list_view_pages(rf, django_user_model, settings, django_assert_num_queries):
+    settings.COFFEE_LIST_PAGE_SIZE = 2
+    user = django_user_model.objects.create(email="test@email.com", password="test")
+    roaster = user.roaster_set.create(name="La Cabra")
+
+    for name, roasting_date in [("B", "2022-03-23"), ("A", "2022-03-23"), ("C", "2022-03-01"), ("D", "2022-04-01")]:
+        user.coffee_set.create(name=name, country="Kenya", roaster=roaster, roasting_date=roasting_date)
+
+    request = rf.get("/coffees/")
+    request.user = user
+
+    with django_assert_num_queries(1):
+        response = coffee_list_view(request)
+
+    content = response.content.decode()
+    assert "La Cabra" in content
+    assert content.index(">D<") < content.index(">A<")
+    assert ">B<" not in content
+
+    request = rf.get(_next_url(content))
+    request.user = user
+    content = coffee_list_view(request).content.decode()
+    assert content.index(">B<") < content.index(">C<")
+    assert ">D<" not in content
+    assert "Older" not in content
+    assert "Newest" in content
+
+
+def _next_url(content):
+    return html.unescape(re.search(r'href="([^"]+)">Older<', content).group(1))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "nope",
+        encode_cursor(["x", "y", "z"]),
+        encode_cursor(["-roasting_date,name,id", "x", "y", "z"]),
+        encode_cursor(["-roasting_date,name,id", "2022-01-01", "y", "z"]),
+        encode_cursor(["name,id", "y", 1]),
+    ],
+)
+def test_coffee_list_view_invalid_cursor(rf, user_with_one_coffee, cursor):
+    request = rf.get("/coffees/", data={"cursor": cursor})
+    request.user = user_with_one_coffee
+
+    with pytest.raises(BadRequest):
+        coffee_list_view(request)
 
 
 def test_add_coffee_view(rf, django_user_model, mocker: MockFixture):
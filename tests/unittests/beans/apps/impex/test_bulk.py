@@ -0,0 +1,81 @@
+from datetime import date
+
+import pytest
+
+from beans.apps.coffee.models import Coffee, Processing, Roaster, TastingNote
+from beans.apps.coffee.stats import get_user_stats, rebuild_user_stats
+from beans.apps.impex.bulk import bulk_create_coffees, resolve_names
+from tests.factories.model_factories import ProcessingFactory, UserFactory
+
+
+def _make_rows(amount: int) -> list[dict]:
+    return [
+        {
+            "name": f"Coffee {number}",
+            "country": "Ethiopia",
+            "processing": f"Processing {number % 3}",
+            "roaster": f"Roaster {number % 5}",
+            "roasting_date": date(2022, 3, 23),
+            "rating": 4,
+            "variety": None,
+            "tasting_notes": [f"Note {number % 7}", "Floral"],
+        }
+        for number in range(amount)
+    ]
+
+
+def test_resolve_names(db):
+    user = UserFactory.create()
+    existing = ProcessingFactory.create(user=user, name="Natural")
+
+    processing = resolve_names(Processing, user, ["Natural", "Washed", "Washed"])
+
+    assert {"Natural", "Washed"} == set(processing)
+    assert existing.pk == processing["Natural"].pk
+    assert processing["Washed"].pk is not None
+    assert user.processing_set.count() == 2
+
+
+def test_resolve_names_empty(db, django_assert_num_queries):
+    user = UserFactory.create()
+
+    with django_assert_num_queries(0):
+        assert {} == resolve_names(Roaster, user, [])
+
+
+def test_bulk_create_coffees(db):
+    user = UserFactory.create()
+
+    coffees = bulk_create_coffees(user, _make_rows(10))
+
+    assert len(coffees) == 10
+    assert user.coffee_set.count() == 10
+    assert user.processing_set.count() == 3
+    assert user.roaster_set.count() == 5
+    assert TastingNote.objects.filter(user=user).count() == 8
+    assert sorted(coffees[1].tasting_notes_list) == ["Floral", "Note 1"]
+
+
+def test_bulk_create_coffees_existing_coffees(db):
+    user = UserFactory.create()
+    rows = _make_rows(5)
+
+    first = bulk_create_coffees(user, rows)
+    second = bulk_create_coffees(user, rows + rows)
+
+    assert user.coffee_set.count() == 5
+    assert [coffee.pk for coffee in first] * 2 == [coffee.pk for coffee in second]
+    assert Coffee.tasting_notes.through.objects.count() == 10
+
+
+@pytest.mark.parametrize("amount", [1, 50])
+def test_bulk_create_coffees_constant_queries(db, django_assert_num_queries, amount):
+    user = UserFactory.create()
+    rebuild_user_stats(user)
+
+    # 3 queries per named model, 3 for the coffees, 1 for the tasting notes
+    # and 11 to update the stats totals, origin and roaster counts inside a savepoint
+    with django_assert_num_queries(24):
+        bulk_create_coffees(user, _make_rows(amount))
+
+    assert get_user_stats(user, 5)["total_coffees"] == amount
@@ -0,0 +1,227 @@
+import os
+from datetime import timedelta
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from pytest_mock import MockFixture
+
+from beans.apps.impex.jobs import (
+    claim_import_job,
+    create_import_job,
+    fail_stale_import_jobs,
+    get_pending_job_ids,
+    run_import_job,
+    submit_import_job,
+)
+from beans.apps.impex.models import ImportJob
+from tests.factories.model_factories import UserFactory
+
+
+@pytest.fixture()
+def csv_upload(settings, tmp_path, test_data_dir) -> SimpleUploadedFile:
+    settings.MEDIA_ROOT = tmp_path
+
+    with open(os.path.join(test_data_dir, "csv_example.csv"), "rb") as csv_file:
+        return SimpleUploadedFile("coffees.csv", csv_file.read(), content_type="text/csv")
+
+
+def test_create_import_job(db, csv_upload, django_capture_on_commit_callbacks, mocker: MockFixture):
+    mock_submit = mocker.patch("beans.apps.impex.jobs.submit_import_job")
+    user = UserFactory.create()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        job = create_import_job(user, csv_upload)
+
+    assert ImportJob.Status.PENDING == job.status
+    assert user.coffee_set.count() == 0
+    mock_submit.assert_called_once_with(job.pk)
+
+
+def test_submit_import_job_without_threads(settings, mocker: MockFixture):
+    settings.IMPEX_JOB_THREADS = 0
+    mock_executor = mocker.patch("beans.apps.impex.jobs.ThreadPoolExecutor")
+
+    submit_import_job(1)
+
+    mock_executor.assert_not_called()
+
+
+def test_claim_import_job(db, csv_upload):
+    job = create_import_job(UserFactory.create(), csv_upload)
+
+    assert claim_import_job(job.pk)
+    assert not claim_import_job(job.pk)
+    assert [] == get_pending_job_ids()
+
+
+def test_run_import_job(db, csv_upload):
+    user = UserFactory.create()
+    job = create_import_job(user, csv_upload)
+
+    job = run_import_job(job.pk, chunk_size=2)
+
+    assert ImportJob.Status.DONE == job.status
+    assert 3 == job.rows_done
+    assert 0 == job.rows_failed
+    assert job.finished_at is not None
+    assert user.coffee_set.count() == 3
+    assert run_import_job(job.pk) is None
+
+
+def test_run_import_job_parallel(db, csv_upload):
+    user = UserFactory.create()
+    job = create_import_job(user, csv_upload)
+
+    job = run_import_job(job.pk, workers=2)
+
+    assert ImportJob.Status.DONE == job.status
+    assert 3 == job.rows_done
+    assert user.coffee_set.count() == 3
+
+
+def test_run_import_job_invalid_rows(db, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    user = UserFactory.create()
+    content = (
+        b"coffee_name;country;processing;roaster;roasting_date;rating;variety;tasting_notes\n"
+        b"Gitwe;Burundi;Washed;La Cabra;16-03-2022;;;\n"
+        b"Finca Santa Rosa;El Salvador;Natural;La Cabra;2022-02-16;5;Pacamara;Fruity\n"
+    )
+    job = create_import_job(user, SimpleUploadedFile("coffees.csv", content))
+
+    job = run_import_job(job.pk, chunk_size=1)
+
+    assert ImportJob.Status.DONE == job.status
+    assert 1 == job.rows_done
+    assert 1 == job.rows_failed
+    assert "roasting_date is invalid in row 0" == job.error
+    assert ["Finca Santa Rosa"] == [coffee.name for coffee in user.coffee_set.all()]
+
+
+def test_run_import_job_ndjson(db, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    user = UserFactory.create()
+    content = (
+        b'{"coffee_name": "Gitwe", "country": "Burundi", "processing": "Washed", "roaster": "La Cabra",'
+        b' "roasting_date": "2022-03-16", "rating": null, "variety": null, "tasting_notes": ["Black tea"]}\n'
+    )
+    job = create_import_job(user, SimpleUploadedFile("coffees.ndjson", content), ImportJob.FileFormat.NDJSON)
+
+    job = run_import_job(job.pk)
+
+    assert ImportJob.Status.DONE == job.status
+    assert 1 == job.rows_done
+    assert ["Black tea"] == user.coffee_set.get(name="Gitwe").tasting_notes_list
+
+
+def test_run_import_job_ndjson_invalid_line(db, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.IMPEX_PARSE_WORKERS = 1
+    user = UserFactory.create()
+    lines = [
+        f'{{"coffee_name": "Coffee {number}", "processing": "Washed", "roaster": "La Cabra", "roasting_date": "2022-03-16"}}'
+        for number in range(3)
+    ]
+    lines.insert(1, '{"coffee_name": ')
+    content = "\n".join(lines).encode()
+    job = create_import_job(user, SimpleUploadedFile("coffees.ndjson", content), ImportJob.FileFormat.NDJSON)
+
+    job = run_import_job(job.pk)
+
+    assert ImportJob.Status.DONE == job.status
+    assert (3, 1) == (job.rows_done, job.rows_failed)
+    assert "invalid json in row 1" == job.error
+    assert ["Coffee 0", "Coffee 1", "Coffee 2"] == sorted(coffee.name for coffee in user.coffee_set.all())
+
+
+def test_create_import_job_duplicate_file(db, csv_upload, mocker: MockFixture):
+    user = UserFactory.create()
+    run_import_job(create_import_job(user, csv_upload).pk)
+    mock_submit = mocker.patch("beans.apps.impex.jobs.submit_import_job")
+
+    job = create_import_job(user, csv_upload)
+
+    assert ImportJob.Status.DUPLICATE == job.status
+    assert [] == get_pending_job_ids()
+    mock_submit.assert_not_called()
+    assert ImportJob.Status.PENDING == create_import_job(UserFactory.create(), csv_upload).status
+
+
+def test_run_import_job_skips_imported_rows(db, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    user = UserFactory.create()
+    header = b"coffee_name;country;processing;roaster;roasting_date;rating;variety;tasting_notes\n"
+    gitwe = b"Gitwe;Burundi;Washed;La Cabra;2022-03-16;;;\n"
+    kiambu = b"Kiambu;Kenya;Washed;La Cabra;2022-03-20;4;SL28;Blackcurrant\n"
+    run_import_job(create_import_job(user, SimpleUploadedFile("first.csv", header + gitwe)).pk)
+
+    job = create_import_job(user, SimpleUploadedFile("second.csv", header + gitwe + kiambu + kiambu))
+    job = run_import_job(job.pk)
+
+    assert 1 == job.rows_done
+    assert 2 == job.rows_skipped
+    assert 2 == user.coffee_set.count()
+
+
+def test_run_import_job_after_deleting_coffee(db, settings, tmp_path, mocker: MockFixture):
+    settings.MEDIA_ROOT = tmp_path
+    mocker.patch("beans.apps.impex.jobs.submit_import_job")
+    user = UserFactory.create()
+    content = (
+        b"coffee_name;country;processing;roaster;roasting_date;rating;variety;tasting_notes\n"
+        b"Gitwe;Burundi;Washed;La Cabra;2022-03-16;;;\n"
+        b"Kiambu;Kenya;Washed;La Cabra;2022-03-20;4;SL28;Blackcurrant\n"
+    )
+    run_import_job(create_import_job(user, SimpleUploadedFile("coffees.csv", content)).pk)
+    user.coffee_set.get(name="Gitwe").delete()
+
+    # the same file isn't a duplicate anymore and the row of the deleted coffee isn't skipped
+    job = create_import_job(user, SimpleUploadedFile("coffees.csv", content))
+    assert ImportJob.Status.PENDING == job.status
+
+    job = run_import_job(job.pk)
+    assert (1, 1) == (job.rows_done, job.rows_skipped)
+    assert ["Gitwe", "Kiambu"] == sorted(user.coffee_set.values_list("name", flat=True))
+    assert ImportJob.Status.DUPLICATE == create_import_job(user, SimpleUploadedFile("coffees.csv", content)).status
+
+
+def test_import_job_rows_per_second():
+    job = ImportJob(rows_done=80, rows_failed=10, rows_skipped=10)
+    assert job.rows_per_second is None
+
+    job.started_at = timezone.now()
+    job.finished_at = job.started_at + timedelta(seconds=4)
+    assert 25.0 == job.rows_per_second
+
+
+def test_process_import_jobs_command(db, csv_upload):
+    user = UserFactory.create()
+    job = create_import_job(user, csv_upload)
+
+    call_command("process_import_jobs")
+
+    job.refresh_from_db()
+    assert ImportJob.Status.DONE == job.status
+    assert user.coffee_set.count() == 3
+
+
+def test_fail_stale_import_jobs(db, csv_upload, settings):
+    settings.IMPEX_JOB_TIMEOUT = 60
+    user = UserFactory.create()
+    long_ago = timezone.now() - timedelta(minutes=5)
+    stale, progressing, recent = (create_import_job(user, csv_upload) for _ in range(3))
+
+    for job in (stale, progressing, recent):
+        claim_import_job(job.pk)
+
+    ImportJob.objects.filter(pk=stale.pk).update(started_at=long_ago, updated_at=long_ago)
+    # a long running job that committed a chunk within the timeout isn't stale
+    ImportJob.objects.filter(pk=progressing.pk).update(started_at=long_ago)
+
+    assert 1 == fail_stale_import_jobs()
+    assert ["failed", "running", "running"] == [
+        ImportJob.objects.get(pk=job.pk).status for job in (stale, progressing, recent)
+    ]
+    assert ImportJob.objects.get(pk=stale.pk).finished_at is not None
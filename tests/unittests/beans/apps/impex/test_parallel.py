@@ -0,0 +1,109 @@
+import os
+
+from beans.apps.impex.parallel import (
+    VALUE_KEYS,
+    get_byte_ranges,
+    iter_parallel_import_results,
+    parse_byte_range,
+    parse_file_parallel,
+    read_csv_header,
+)
+from beans.apps.impex.utils import get_row_values, read_csv_rows
+from tests.factories.model_factories import UserFactory
+
+HEADER = "coffee_name;country;processing;roaster;roasting_date;rating;variety;tasting_notes\n"
+
+
+def _write_csv_file(path, rows: int) -> str:
+    with open(path, "w") as csv_file:
+        csv_file.write(HEADER)
+
+        for number in range(rows):
+            roasting_date = "16-03-2022" if number % 50 == 7 else f"2022-03-{number % 28 + 1:02d}"
+            csv_file.write(f"Coffee {number};Kenya;Washed;Roaster {number % 10};{roasting_date};4;SL28;Floral, Café\n")
+
+    return str(path)
+
+
+def test_read_csv_header(tmp_path):
+    path = _write_csv_file(tmp_path / "coffees.csv", 1)
+    fieldnames, start = read_csv_header(path)
+
+    assert HEADER.strip().split(";") == fieldnames
+    assert len(HEADER) == start
+
+
+def test_get_byte_ranges(tmp_path):
+    path = _write_csv_file(tmp_path / "coffees.csv", 100)
+    _, start = read_csv_header(path)
+
+    ranges = get_byte_ranges(path, start, range_size=500)
+
+    assert ranges[0][0] == start
+    assert ranges[-1][1] == os.path.getsize(path)
+
+    with open(path, "rb") as csv_file:
+        content = csv_file.read()
+
+    row_number = 0
+
+    for (range_start, range_end, first_row_number), next_range in zip(ranges, ranges[1:] + [None]):
+        assert content[range_end - 1:range_end] == b"\n"
+        assert first_row_number == row_number
+        row_number += content[range_start:range_end].count(b"\n")
+
+        if next_range is not None:
+            assert next_range[0] == range_end
+
+
+def test_parse_byte_range_ndjson(tmp_path):
+    path = tmp_path / "coffees.ndjson"
+    path.write_text(
+        '{"coffee_name": "Gitwe", "processing": "Washed", "roaster": "La Cabra", "roasting_date": "2022-03-16"}\n'
+        "\n"
+        "not json\n"
+    )
+
+    parsed = parse_byte_range(str(path), (0, os.path.getsize(path), 0), "ndjson")
+
+    assert [0, 2] == [number for number, _, _ in parsed]
+    assert "Gitwe" == dict(zip(VALUE_KEYS, parsed[0][1]))["name"]
+    assert [{"row": 2, "field": "json", "message": "invalid json in row 2"}] == parsed[1][2]
+
+
+def test_parse_file_parallel_ndjson_bom(tmp_path):
+    path = tmp_path / "coffees.ndjson"
+    row = '{"coffee_name": "Gitwe", "processing": "Washed", "roaster": "La Cabra", "roasting_date": "2022-03-16"}\n'
+    path.write_bytes(b"\xef\xbb\xbf" + (row * 20).encode())
+
+    parsed = list(parse_file_parallel(str(path), "ndjson", workers=2, range_size=500))
+
+    assert list(range(20)) == [number for number, _, _ in parsed]
+    assert all(values is not None and not errors for _, values, errors in parsed)
+
+
+def test_parse_file_parallel_matches_serial(tmp_path):
+    path = _write_csv_file(tmp_path / "coffees.csv", 500)
+
+    with open(path) as csv_file:
+        expected = [get_row_values(row, number) for number, row in enumerate(read_csv_rows(csv_file))]
+
+    parsed = list(parse_file_parallel(path, "csv", workers=2, range_size=1000))
+
+    assert len(expected) == len(parsed)
+
+    for (values, errors), (number, parsed_values, parsed_errors) in zip(expected, parsed):
+        assert (None if errors else values) == (parsed_values and dict(zip(VALUE_KEYS, parsed_values)))
+        assert [error.as_dict() for error in errors] == parsed_errors
+
+
+def test_iter_parallel_import_results(db, tmp_path):
+    user = UserFactory.create()
+    path = _write_csv_file(tmp_path / "coffees.csv", 200)
+
+    results = list(iter_parallel_import_results(user, path, "csv", workers=2, chunk_size=100, range_size=1000))
+
+    assert [100, 100] == [result["rows"] for result in results]
+    assert 4 == sum(result["failed"] for result in results)
+    assert "roasting_date is invalid in row 7" == results[0]["errors"][0]["message"]
+    assert 196 == user.coffee_set.count()
@@ -1,19 +1,47 @@
 import copy
+import csv
+import io
+import json
 import os
+import tracemalloc
 from datetime import datetime
 
 import pytest
+from django.db import IntegrityError
+from pytest_mock import MockFixture
 
 from beans.apps.coffee.models import Coffee
+from beans.apps.impex.bulk import bulk_create_coffees
+from beans.apps.impex.models import ImportedRow
 from beans.apps.impex.utils import (
     csv_to_coffees,
     add_tasting_notes_to_coffee,
+    chunk_rows,
+    clean_row,
+    coffee_to_row,
+    coffees_to_csv,
+    iter_coffees,
     parse_row,
     parse_roasting_date,
     get_tasting_notes,
     get_csv_headers,
+    get_row_values,
+    coffees_to_ndjson,
+    filter_imported_rows,
+    get_row_hash,
+    import_chunk,
+    import_chunk_isolated,
+    iter_import_results,
+    iter_csv_to_coffees,
+    iter_lines,
+    iter_ndjson_to_coffees,
+    InvalidRow,
+    read_ndjson_rows,
+    read_rows,
+    validate_csv,
+    validate_rows,
 )
-from tests.factories.model_factories import UserFactory
+from tests.factories.model_factories import UserFactory, CoffeeFactory, ProcessingFactory, RoasterFactory
 
 
 DUMMY_ROW = {
@@ -52,6 +80,115 @@ def test_csv_to_coffees(db, test_data_dir):
     assert user.coffee_set.count() == 3
 
 
+def test_csv_to_coffees_chunked(db, test_data_dir):
+    user = UserFactory.create()
+    file_path = os.path.join(test_data_dir, "csv_example.csv")
+
+    with open(file_path) as csv_file:
+        coffees = csv_to_coffees(user, csv_file, chunk_size=2)  # noqa
+
+    assert [coffee.name for coffee in coffees] == ["Finca Santa Rosa", "Gitwe", "Ethiopian Shantawene"]
+    assert user.coffee_set.get(name="Gitwe").country == "Burundi"
+    assert user.roaster_set.count() == 2
+    assert sorted(user.coffee_set.get(name="Ethiopian Shantawene").tasting_notes_list) == [
+        "Floral",
+        "Milk chocolate",
+        "Tropical",
+    ]
+
+
+def test_csv_to_coffees_invalid_row_in_chunk(db, test_data_dir):
+    user = UserFactory.create()
+    file_path = os.path.join(test_data_dir, "csv_example.csv")
+
+    with open(file_path) as csv_file:
+        lines = csv_file.readlines()
+
+    lines[2] = lines[2].replace("2022-03-16", "16-03-2022")
+
+    with pytest.raises(ValueError) as exc_info:
+        csv_to_coffees(user, lines)  # noqa
+
+    assert "roasting_date is invalid in row 1" == str(exc_info.value)
+    assert user.coffee_set.count() == 0
+
+
+def test_chunk_rows():
+    assert [[0, 1], [2, 3], [4]] == list(chunk_rows(range(5), 2))
+    assert [] == list(chunk_rows([], 2))
+
+    with pytest.raises(ValueError) as exc_info:
+        list(chunk_rows(range(5), 0))
+
+    assert "chunk_size must be at least 1" == str(exc_info.value)
+
+
+def test_clean_row():
+    assert clean_row(DUMMY_ROW, 1) == {
+        "name": "Good coffee",
+        "country": "El Salvador",
+        "processing": "Natural",
+        "roaster": "La Cabra",
+        "roasting_date": datetime(2022, 3, 23).date(),
+        "rating": 4,
+        "variety": "Pacamara",
+        "tasting_notes": ["Fruity", "Rich", "Milk chocolate"],
+    }
+
+
+def test_clean_row_invalid_rating():
+    row = copy.deepcopy(DUMMY_ROW)
+    row["rating"] = "good"
+
+    with pytest.raises(ValueError) as exc_info:
+        clean_row(row, 1)
+
+    assert "rating is invalid in row 1" == str(exc_info.value)
+
+
+def test_get_row_values_collects_all_errors():
+    row = copy.deepcopy(DUMMY_ROW)
+    del row["coffee_name"]
+    row["roasting_date"] = "2022.03.03"
+    row["rating"] = "good"
+
+    values, errors = get_row_values(row, 7)
+
+    assert ["coffee_name", "roasting_date", "rating"] == [error.field for error in errors]
+    assert "roasting_date is invalid in row 7" == str(errors[1])
+    assert "La Cabra" == values["roaster"]
+
+
+def test_validate_csv(db, django_assert_num_queries):
+    lines = [
+        "coffee_name;country;processing;roaster;roasting_date;rating;variety;tasting_notes\n",
+        "Gitwe;Burundi;Washed;La Cabra;16-03-2022;;;\n",
+        "Finca Santa Rosa;El Salvador;Natural;La Cabra;2022-02-16;5;Pacamara;Fruity\n",
+        ";Ethiopia;;Friedhats;2022-03-10;3;;Floral\n",
+    ]
+
+    with django_assert_num_queries(0):
+        report = validate_csv(lines)
+
+    assert report == {
+        "valid": False,
+        "rows": 3,
+        "valid_rows": 1,
+        "errors": [
+            {"row": 0, "field": "roasting_date", "message": "roasting_date is invalid in row 0"},
+            {"row": 2, "field": "coffee_name", "message": "coffee_name is a required field in row 2"},
+            {"row": 2, "field": "processing", "message": "processing is a required field in row 2"},
+        ],
+    }
+
+
+def test_validate_csv_valid_file(test_data_dir):
+    with open(os.path.join(test_data_dir, "csv_example.csv")) as csv_file:
+        report = validate_csv(csv_file)
+
+    assert report == {"valid": True, "rows": 3, "valid_rows": 3, "errors": []}
+
+
 def test_parse_row(db):
     user = UserFactory.create()
     assert user.coffee_set.count() == 0
@@ -126,6 +263,14 @@ def test_parse_roasting_date():
     assert "expected date format to be YYYY-MM-DD" == str(exc_info.value)
 
 
+@pytest.mark.parametrize("date_str", ["2022-3-3", "20220303", "2022-13-01", "2022-02-30", ""])
+def test_parse_roasting_date_invalid(date_str):
+    with pytest.raises(ValueError) as exc_info:
+        parse_roasting_date(date_str)
+
+    assert "expected date format to be YYYY-MM-DD" == str(exc_info.value)
+
+
 @pytest.mark.parametrize(
     ["notes_str", "expected"],
     [
@@ -145,3 +290,269 @@ def test_add_tasting_notes_to_coffee(db, setup_one_coffee):
     add_tasting_notes_to_coffee(coffee, ["Dark chocolate", "Floral", "Fruity", "Sweet"])
 
     assert coffee.tasting_notes.count() == 4
+
+
+def test_coffee_to_row(db, user_with_one_coffee):
+    coffee = user_with_one_coffee.coffee_set.first()
+    assert [
+        "Coffee",
+        "Ethiopia",
+        "Natural",
+        "La Cabra",
+        "2022-03-23",
+        "4",
+        "",
+        "Dark chocolate, Floral",
+    ] == coffee_to_row(coffee)
+
+
+def test_iter_coffees(db, django_assert_num_queries):
+    user = UserFactory.create()
+    processing = ProcessingFactory.create(user=user)
+    roaster = RoasterFactory.create(user=user)
+
+    for number in range(5):
+        CoffeeFactory.create(user=user, name=f"Coffee {number}", processing=processing, roaster=roaster)
+
+    # two queries per chunk of coffees and one for the empty chunk at the end
+    with django_assert_num_queries(7):
+        rows = [coffee_to_row(coffee) for coffee in iter_coffees(user, chunk_size=2)]
+
+    assert [f"Coffee {number}" for number in range(5)] == [row[0] for row in rows]
+
+
+def test_coffees_to_csv_round_trip(db, test_data_dir):
+    user = UserFactory.create()
+    file_path = os.path.join(test_data_dir, "csv_example.csv")
+
+    with open(file_path) as csv_file:
+        csv_to_coffees(user, csv_file)  # noqa
+
+    lines = list(coffees_to_csv(user))
+    assert "coffee_name;country;processing;roaster;roasting_date;rating;variety;tasting_notes\r\n" == lines[0]
+
+    other_user = UserFactory.create()
+    csv_to_coffees(other_user, lines)  # noqa
+
+    assert lines == list(coffees_to_csv(other_user))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 1024])
+def test_iter_lines(chunk_size):
+    content = "\ufeffname;notes\r\nCafé Ñuñoa;\"Floral,\nfruity\"\r\nlast line without newline".encode("utf-8")
+
+    lines = list(iter_lines(io.BytesIO(content), chunk_size=chunk_size))
+
+    assert ["name;notes\r\n", "Café Ñuñoa;\"Floral,\n", "fruity\"\r\n", "last line without newline"] == lines
+    assert ["Café Ñuñoa", "Floral,\nfruity"] == list(csv.reader(lines, delimiter=";"))[1]
+
+
+def test_iter_lines_invalid_bytes():
+    assert ["caf\ufffd\n"] == list(iter_lines(io.BytesIO(b"caf\xe9\n")))
+
+
+def _write_csv_file(path, rows: int) -> None:
+    with open(path, "w") as csv_file:
+        csv_file.write(";".join(get_csv_headers()) + "\n")
+
+        for number in range(rows):
+            csv_file.write(f"Coffee {number};Kenya;Washed;Roaster {number % 10};2022-03-{number % 28 + 1:02d};4;SL28;Floral\n")
+
+
+def _get_peak_memory(user, path) -> int:
+    tracemalloc.start()
+
+    try:
+        with open(path, "rb") as csv_file:
+            for _ in iter_csv_to_coffees(user, iter_lines(csv_file), chunk_size=250):
+                pass
+
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_iter_csv_to_coffees_bounded_memory(db, tmp_path):
+    small_file, large_file = tmp_path / "small.csv", tmp_path / "large.csv"
+    _write_csv_file(small_file, 1000)
+    _write_csv_file(large_file, 5000)
+
+    small_peak = _get_peak_memory(UserFactory.create(), small_file)
+    large_peak = _get_peak_memory(UserFactory.create(), large_file)
+
+    assert Coffee.objects.count() == 6000
+    # five times as many rows should not need noticeably more memory
+    assert large_peak < small_peak * 1.5
+
+
+def test_coffees_to_ndjson(db, user_with_one_coffee):
+    assert [
+        '{"coffee_name": "Coffee", "country": "Ethiopia", "processing": "Natural", "roaster": "La Cabra", '
+        '"roasting_date": "2022-03-23", "rating": 4, "variety": null, "tasting_notes": ["Dark chocolate", "Floral"]}\n'
+    ] == list(coffees_to_ndjson(user_with_one_coffee))
+
+
+def test_ndjson_round_trip(db, user_with_one_coffee):
+    coffee = user_with_one_coffee.coffee_set.first()
+    coffee.tasting_notes.create(user=user_with_one_coffee, name="Red apple, sweet")
+    lines = list(coffees_to_ndjson(user_with_one_coffee))
+
+    other_user = UserFactory.create()
+    list(iter_ndjson_to_coffees(other_user, lines))
+
+    assert ["Dark chocolate", "Floral", "Red apple, sweet"] == sorted(other_user.coffee_set.get().tasting_notes_list)
+    assert len(lines) == len(list(coffees_to_ndjson(other_user)))
+
+
+def test_read_ndjson_rows():
+    lines = ['{"coffee_name": "Gitwe"}\n', "\n", '{"coffee_name": "Kiambu"}']
+    assert [{"coffee_name": "Gitwe"}, {"coffee_name": "Kiambu"}] == list(read_ndjson_rows(lines))
+
+
+@pytest.mark.parametrize(
+    ["line", "message"],
+    [
+        ('{"coffee_name": ', "invalid json in row 1"),
+        ('["Gitwe"]', "expected a json object in row 1"),
+    ],
+)
+def test_read_ndjson_rows_invalid(line, message):
+    rows = list(read_ndjson_rows(['{"coffee_name": "Gitwe"}', line, '{"coffee_name": "Kiambu"}']))
+
+    assert [{"coffee_name": "Gitwe"}, {}, {"coffee_name": "Kiambu"}] == rows
+    assert isinstance(rows[1], InvalidRow)
+    assert [{"row": 1, "field": "json", "message": message}] == [error.as_dict() for error in get_row_values(rows[1], 1)[1]]
+
+
+def test_read_rows_unsupported_format():
+    with pytest.raises(ValueError) as exc_info:
+        read_rows([], "xml")
+
+    assert "unsupported file format xml" == str(exc_info.value)
+
+
+def test_validate_rows_invalid_ndjson():
+    valid = '{"coffee_name": "Gitwe", "processing": "Washed", "roaster": "La Cabra", "roasting_date": "2022-03-16"}'
+    lines = [valid, "not json", valid, '{"coffee_name": "Kiambu"}']
+
+    report = validate_rows(read_ndjson_rows(lines))
+
+    assert {"valid": False, "rows": 4, "valid_rows": 2} == {key: report[key] for key in ("valid", "rows", "valid_rows")}
+    assert {"row": 1, "field": "json", "message": "invalid json in row 1"} == report["errors"][0]
+    assert {(3, "processing"), (3, "roaster"), (3, "roasting_date")} == {
+        (error["row"], error["field"]) for error in report["errors"][1:]
+    }
+
+
+@pytest.mark.parametrize(
+    ["field", "value"],
+    [
+        ("coffee_name", 5),
+        ("processing", ["Washed"]),
+        ("roaster", {"name": "La Cabra"}),
+        ("roasting_date", 20220323),
+        ("roasting_date", ["2022-03-23"]),
+        ("rating", 4.7),
+        ("rating", True),
+        ("rating", [4]),
+        ("country", 31),
+        ("variety", {"name": "SL28"}),
+        ("tasting_notes", [1]),
+        ("tasting_notes", 1),
+    ],
+)
+def test_validate_rows_ndjson_types(db, field, value):
+    row = dict(DUMMY_ROW, **{field: value})
+    lines = [json.dumps(DUMMY_ROW), json.dumps(row)]
+
+    report = validate_rows(read_ndjson_rows(lines))
+    assert report["valid_rows"] == 1
+    assert [error["field"] for error in report["errors"]] == [field]
+
+    result = import_chunk_isolated(UserFactory.create(), list(enumerate(read_ndjson_rows(lines))))
+    assert [error["row"] for error in result["errors"]] == [1]
+
+
+def test_get_row_hash():
+    values = clean_row(DUMMY_ROW, 1)
+    reordered_notes = dict(values, tasting_notes=list(reversed(values["tasting_notes"])))
+
+    assert 32 == len(get_row_hash(values))
+    assert get_row_hash(values) == get_row_hash(reordered_notes)
+    assert get_row_hash(values) != get_row_hash(dict(values, rating=5))
+
+
+def test_filter_imported_rows(db, django_assert_num_queries):
+    user = UserFactory.create()
+    values = clean_row(DUMMY_ROW, 1)
+    other_values = dict(values, name="Other coffee")
+    import_chunk(user, [(1, DUMMY_ROW)])
+
+    with django_assert_num_queries(1):
+        rows = filter_imported_rows(user, [(1, values), (2, other_values), (3, other_values)])
+
+    assert [(2, other_values)] == list(rows.values())
+
+
+def test_import_chunk_skips_imported_rows(db):
+    user = UserFactory.create()
+
+    assert 1 == len(import_chunk(user, [(1, DUMMY_ROW)]))
+    assert [] == import_chunk(user, [(1, DUMMY_ROW)])
+    assert 1 == user.coffee_set.count()
+
+
+def test_import_chunk_isolated(db):
+    user = UserFactory.create()
+    invalid_row = dict(DUMMY_ROW, roasting_date="23-03-2022")
+    other_row = dict(DUMMY_ROW, coffee_name="Other coffee")
+    import_chunk(user, [(0, DUMMY_ROW)])
+
+    result = import_chunk_isolated(user, [(0, DUMMY_ROW), (1, invalid_row), (2, other_row), (3, other_row)])
+
+    assert result == {
+        "rows": 4,
+        "committed": 1,
+        "skipped": 2,
+        "failed": 1,
+        "errors": [{"row": 1, "field": "roasting_date", "message": "roasting_date is invalid in row 1"}],
+    }
+    assert 2 == user.coffee_set.count()
+
+
+def test_import_chunk_isolated_retries_rows(db, mocker: MockFixture):
+    user = UserFactory.create()
+    bad_row = dict(DUMMY_ROW, coffee_name="Bad coffee")
+    chunk = [(number, dict(DUMMY_ROW, coffee_name=f"Coffee {number}")) for number in range(3)] + [(3, bad_row)]
+
+    def failing_bulk_create(user, rows):
+        if any(row["name"] == "Bad coffee" for row in rows):
+            # the write is partially done before the database raises, it should be rolled back
+            bulk_create_coffees(user, [row for row in rows if row["name"] != "Bad coffee"])
+            raise IntegrityError("bad coffee")
+
+        return bulk_create_coffees(user, rows)
+
+    mocker.patch("beans.apps.impex.utils.bulk_create_coffees", side_effect=failing_bulk_create)
+
+    result = import_chunk_isolated(user, chunk)
+
+    assert result == {
+        "rows": 4,
+        "committed": 3,
+        "skipped": 0,
+        "failed": 1,
+        "errors": [{"row": 3, "field": None, "message": "could not save row 3: bad coffee"}],
+    }
+    assert ["Coffee 0", "Coffee 1", "Coffee 2"] == sorted(user.coffee_set.values_list("name", flat=True))
+    assert 3 == ImportedRow.objects.filter(user=user).count()
+
+
+def test_iter_import_results(db):
+    user = UserFactory.create()
+    rows = [dict(DUMMY_ROW, coffee_name=f"Coffee {number}") for number in range(5)]
+
+    results = list(iter_import_results(user, rows, chunk_size=2))
+
+    assert [2, 2, 1] == [result["committed"] for result in results]
+    assert 5 == user.coffee_set.count()
@@ -1,6 +1,15 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import Http404
+from django.urls import reverse
+from django.utils import timezone
 from pytest_mock import MockFixture
 
-from beans.apps.impex.views import download_template_view, UploadCsvView
+from beans.apps.impex.models import ImportJob
+from beans.apps.impex.views import download_template_view, export_view, import_job_status_view, UploadCsvView
 from tests.factories.model_factories import UserFactory
 
 
@@ -13,9 +22,7 @@ def test_download_template_view(rf):
 
 
 def test_upload_csv_view_form_process_data(db, rf, mocker: MockFixture):
-    mock_csv_to_coffees = mocker.patch("beans.apps.impex.views.csv_to_coffees")
-    mock_file = mocker.MagicMock()
-    mock_text_io_wrapper = mocker.patch("beans.apps.impex.views.TextIOWrapper", return_value=mock_file)
+    mock_create_import_job = mocker.patch("beans.apps.impex.views.create_import_job")
 
     request = rf.post("upload")
     request.user = UserFactory.create()
@@ -23,9 +30,133 @@ def test_upload_csv_view_form_process_data(db, rf, mocker: MockFixture):
     view = UploadCsvView()
     view.request = request
 
-    valid_data = {"file": "in memory file"}
+    valid_data = {"file": "in memory file", "file_format": "ndjson"}
+
+    assert mock_create_import_job.return_value == view.process_data(valid_data)
+    mock_create_import_job.assert_called_once_with(request.user, valid_data["file"], "ndjson")
+
+
+def test_upload_csv_view_dry_run(db, rf, mocker: MockFixture):
+    mock_create_import_job = mocker.patch("beans.apps.impex.views.create_import_job")
+    content = (
+        b"coffee_name;country;processing;roaster;roasting_date;rating;variety;tasting_notes\n"
+        b"Gitwe;Burundi;Washed;La Cabra;16-03-2022;;;\n"
+    )
+    data = {"file": SimpleUploadedFile("coffees.csv", content), "file_format": "csv", "dry_run": "on"}
+    request = rf.post("upload", data=data)
+    request.user = UserFactory.create()
+
+    response = UploadCsvView.as_view()(request)
+
+    assert 200 == response.status_code
+    assert {
+        "valid": False,
+        "rows": 1,
+        "valid_rows": 0,
+        "errors": [{"row": 0, "field": "roasting_date", "message": "roasting_date is invalid in row 0"}],
+    } == response.context_data["report"]
+    mock_create_import_job.assert_not_called()
+    assert request.user.coffee_set.count() == 0
+
+
+def test_import_job_status_view(db, rf):
+    user = UserFactory.create()
+    job = ImportJob.objects.create(user=user, file="imports/coffees.csv", rows_done=10, rows_failed=2)
+    request = rf.request()
+    request.user = user
+
+    response = import_job_status_view(request, job.pk)
+
+    assert 200 == response.status_code
+    assert {
+        "id": job.pk,
+        "status": "pending",
+        "rows_done": 10,
+        "rows_failed": 2,
+        "rows_skipped": 0,
+        "rows_per_second": None,
+        "error": "",
+        "started_at": None,
+        "finished_at": None,
+    } == json.loads(response.content)
+
+
+def test_upload_csv_view_redirects_to_job(db, rf, settings, tmp_path, mocker: MockFixture):
+    settings.MEDIA_ROOT = tmp_path
+    mocker.patch("beans.apps.impex.jobs.submit_import_job")
+    mocker.patch("beans.apps.impex.views.messages")
+    content = b"coffee_name;country;processing;roaster;roasting_date;rating;variety;tasting_notes\n"
+    request = rf.post("upload", data={"file": SimpleUploadedFile("coffees.csv", content), "file_format": "csv"})
+    request.user = UserFactory.create()
+
+    response = UploadCsvView.as_view()(request)
+
+    job = request.user.importjob_set.get()
+    assert 302 == response.status_code
+    assert reverse("import-job-status", args=[job.pk]) == response.url
+
+
+def test_import_job_status_view_html(db, rf):
+    user = UserFactory.create()
+    job = ImportJob.objects.create(user=user, file="imports/coffees.csv", rows_done=10)
+    request = rf.get("/", HTTP_ACCEPT="text/html,application/xhtml+xml")
+    request.user = user
+
+    response = import_job_status_view(request, job.pk)
+
+    assert 200 == response.status_code
+    assert "Pending" in response.content.decode()
+
+
+def test_import_job_status_view_stale_job(db, rf, settings):
+    settings.IMPEX_JOB_TIMEOUT = 60
+    user = UserFactory.create()
+    started_at = timezone.now() - timedelta(minutes=5)
+    job = ImportJob.objects.create(user=user, file="imports/coffees.csv", status=ImportJob.Status.RUNNING)
+    ImportJob.objects.filter(pk=job.pk).update(started_at=started_at, updated_at=started_at)
+    request = rf.request()
+    request.user = user
+
+    data = json.loads(import_job_status_view(request, job.pk).content)
+    assert "failed" == data["status"]
+    assert data["error"].startswith("the import job stopped")
+
+
+def test_import_job_status_view_other_user(db, rf):
+    job = ImportJob.objects.create(user=UserFactory.create(), file="imports/coffees.csv")
+    request = rf.request()
+    request.user = UserFactory.create()
+
+    with pytest.raises(Http404):
+        import_job_status_view(request, job.pk)
+
+
+def test_export_view(rf, user_with_one_coffee):
+    request = rf.request()
+    request.user = user_with_one_coffee
+    response = export_view(request)
+    assert 200 == response.status_code
+    assert response.streaming
+    assert 'attachment; filename="beans_export.csv"' == response.headers["Content-Disposition"]
+    assert (
+        b"coffee_name;country;processing;roaster;roasting_date;rating;variety;tasting_notes\r\n"
+        b"Coffee;Ethiopia;Natural;La Cabra;2022-03-23;4;;Dark chocolate, Floral\r\n"
+    ) == b"".join(response.streaming_content)
+
+
+def test_export_view_ndjson(rf, user_with_one_coffee):
+    request = rf.get("export", data={"format": "ndjson"})
+    request.user = user_with_one_coffee
+    response = export_view(request)
+    assert 200 == response.status_code
+    assert "application/x-ndjson" == response.headers["Content-Type"]
+    assert 'attachment; filename="beans_export.ndjson"' == response.headers["Content-Disposition"]
+    assert 1 == len(b"".join(response.streaming_content).splitlines())
+
 
-    view.process_data(valid_data)
+def test_export_view_unsupported_format(rf, user_with_one_coffee):
+    request = rf.get("export", data={"format": "xml"})
+    request.user = user_with_one_coffee
 
-    mock_text_io_wrapper.assert_called_once_with(valid_data["file"], encoding="ascii", errors="replace")
-    mock_csv_to_coffees.assert_called_once_with(request.user, mock_file)
+    with pytest.raises(Http404):
+        export_view(request)